@@ -0,0 +1,203 @@
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+# Edit operations emitted by AnsiParser; the renderer applies them in order
+OP_TEXT = 0        # (OP_TEXT, text, tagset_id)
+OP_CR = 1          # (OP_CR,) carriage return: the cursor goes back to the start of the line
+OP_BACKSPACE = 2   # (OP_BACKSPACE, count)
+OP_ERASE_LINE = 3  # (OP_ERASE_LINE, mode) ESC[K -> 0 cursor to end, ESC[1K -> 1 start to cursor, ESC[2K -> 2 whole line
+
+# One alternative per token: CSI sequence, SGR written as a literal "\x1b[...m"
+# (escaped form), any other escape, CR, run of backspaces, run of unprintable characters
+_TOKEN = re.compile(r'\x1b\[([0-9;?]*)([ -/]*[@-~])'
+                    r'|\\x1b\[([0-9;]*)m'
+                    r'|\x1b(?:[ -/]*[0-~])?'
+                    r'|\r'
+                    r'|\x08+'
+                    r'|[\x00-\x07\x0b\x0c\x0e-\x1a\x1c-\x1f\x7f-\x9f]+')
+
+_ALNUM = re.compile(r'[a-zA-Z0-9]')
+
+_SIMPLE_SGR = {
+    '1': 'bold',
+    '2': 'dim',
+    '3': 'italic',
+    '4': 'underline',
+    '5': 'blink',
+    '7': 'reverse',
+    '8': 'hidden',
+    '9': 'strike'
+}
+
+# Interned tag sets: every distinct set gets a small integer id, shared by all parsers
+PLAIN = 0
+_tagsets: List[FrozenSet[str]] = [frozenset()]
+_tagset_ids: Dict[FrozenSet[str], int] = {frozenset(): PLAIN}
+_intern_lock = threading.Lock()
+
+
+def intern_tagset(tags: Iterable[str]) -> int:
+    """
+    Id of a tag set, registering it the first time it is seen.
+    """
+    tags = frozenset(tags)
+    tagset_id = _tagset_ids.get(tags)
+    if tagset_id is None:
+        with _intern_lock:
+            tagset_id = _tagset_ids.get(tags)
+            if tagset_id is None:
+                tagset_id = len(_tagsets)
+                _tagsets.append(tags)
+                _tagset_ids[tags] = tagset_id
+    return tagset_id
+
+
+def tagset(tagset_id: int) -> FrozenSet[str]:
+    """Tag names of an interned tag set."""
+    return _tagsets[tagset_id]
+
+
+def sgr_code_tags(code: str) -> Tuple[str, ...]:
+    """
+    Tag names set by a single SGR parameter (empty for reset or unsupported codes).
+    """
+    if code in _SIMPLE_SGR:
+        return (_SIMPLE_SGR[code],)
+
+    try:
+        code_num = int(code)
+    except ValueError:
+        return ()
+
+    if 30 <= code_num <= 37:  # Standard foreground colors
+        return (f'fg_{code_num - 30}',)
+    elif 40 <= code_num <= 47:  # Standard background colors
+        return (f'bg_{code_num - 40}',)
+    elif 90 <= code_num <= 97:  # Bright foreground colors
+        return (f'fg_{code_num - 82}',)  # Maps 90-97 to 8-15
+    elif 100 <= code_num <= 107:  # Bright background colors
+        return (f'bg_{code_num - 92}',)  # Maps 100-107 to 8-15
+    return ()
+
+
+def apply_sgr(params: str, tags: FrozenSet[str]) -> FrozenSet[str]:
+    """
+    Apply the parameters of an SGR sequence (ESC[...m) to a tag set.
+
+    Args:
+        params: Parameters between ESC[ and m, e.g. '0;31'
+        tags: Current tag set
+
+    Returns:
+        The new tag set
+    """
+    current = set(tags)
+    for code in (params.split(';') if params else ['0']):
+        if code in ('0', ''):
+            current.clear()
+            continue
+
+        new_tags = sgr_code_tags(code)
+        for tag in new_tags:
+            # A new color replaces the previous one of the same kind
+            if tag.startswith('fg_') or tag.startswith('bg_'):
+                prefix = tag[:3]
+                current = {t for t in current if not t.startswith(prefix)}
+            current.add(tag)
+
+    return frozenset(current)
+
+
+class AnsiParser:
+    """
+    Single-pass tokenizer for the VT100 subset used by ESP-IDF logs and build tools.
+
+    The text is scanned once with a compiled token pattern that also covers
+    the escaped "\\x1b[...m" form and the unprintable characters, so there
+    is no separate normalize/sanitize pass. SGR sequences move the current
+    style between interned tag sets (the transitions are cached, so a known
+    sequence costs a dict lookup), the control characters and erase sequences
+    become edit operations. Nothing touches the Gtk.TextBuffer here: the
+    renderer applies the operations in order, after the text before them.
+    """
+
+    def __init__(self):
+        self.tagset_id = PLAIN
+        self._transitions: Dict[Tuple[int, str], int] = {}
+
+    def _apply_sgr(self, params: str, tagset_id: int) -> int:
+        key = (tagset_id, params)
+        new_id = self._transitions.get(key)
+        if new_id is None:
+            new_id = intern_tagset(apply_sgr(params, _tagsets[tagset_id]))
+            self._transitions[key] = new_id
+        return new_id
+
+    def parse(self, text: str, reset_style: bool = True) -> List[tuple]:
+        """
+        Converte il testo in una lista di operazioni di modifica.
+
+        Args:
+            text: Text possibly containing ANSI sequences and control characters
+            reset_style: Start with no style instead of the one left by the previous call
+
+        Returns:
+            List of OP_* tuples; empty if the text has no alphanumeric
+            character outside the escape sequences and no erase operation
+        """
+        ops = []
+        append = ops.append
+        tagset_id = PLAIN if reset_style else self.tagset_id
+        visible = False
+        pos = 0
+
+        for match in _TOKEN.finditer(text):
+            start = match.start()
+            if start > pos:
+                run = text[pos:start]
+                if not visible and _ALNUM.search(run):
+                    visible = True
+                # Unprintable characters split a run: merge it with the previous one
+                if ops and ops[-1][0] == OP_TEXT and ops[-1][2] == tagset_id:
+                    ops[-1] = (OP_TEXT, ops[-1][1] + run, tagset_id)
+                else:
+                    append((OP_TEXT, run, tagset_id))
+            pos = match.end()
+
+            final = match.group(2)
+            if final is not None:
+                if final == 'm':
+                    tagset_id = self._apply_sgr(match.group(1), tagset_id)
+                elif final == 'K':
+                    mode = match.group(1) or '0'
+                    if mode in ('0', '1', '2'):
+                        append((OP_ERASE_LINE, int(mode)))
+                        visible = True
+                # Other CSI sequences (cursor movement, ...) are dropped
+                continue
+
+            escaped = match.group(3)
+            if escaped is not None:
+                tagset_id = self._apply_sgr(escaped, tagset_id)
+                continue
+
+            first = text[start]
+            if first == '\r':
+                append((OP_CR,))
+            elif first == '\x08':
+                append((OP_BACKSPACE, pos - start))
+                visible = True
+            # Other escape sequences and unprintable characters are dropped
+
+        if pos < len(text):
+            run = text[pos:]
+            if not visible and _ALNUM.search(run):
+                visible = True
+            if ops and ops[-1][0] == OP_TEXT and ops[-1][2] == tagset_id:
+                ops[-1] = (OP_TEXT, ops[-1][1] + run, tagset_id)
+            else:
+                append((OP_TEXT, run, tagset_id))
+
+        self.tagset_id = tagset_id
+        return ops if visible else []
@@ -0,0 +1,135 @@
+import hashlib
+import math
+from typing import Dict, List, Sequence, Tuple, Union
+
+# Bytes of md5 (hex digits) compared after a weak checksum match; the whole
+# file md5 is verified by the device at the end anyway
+STRONG_DIGITS = 16
+
+# Reconstruction script: ('copy', first block, block count) of the old file,
+# or ('data', literal bytes)
+DeltaOp = Union[Tuple[str, int, int], Tuple[str, bytes]]
+
+
+def block_size_for(size: int) -> int:
+    """Block size of the checksums: ~sqrt(size), as rsync (multiple of 8, 512 to 16 KB)"""
+    return max(512, min(16384, int(math.sqrt(size)) // 8 * 8))
+
+
+def weak_checksum(block: bytes) -> int:
+    """
+    Checksum rolling di rsync: a = somma dei byte, b = somma delle somme parziali (mod 2^16).
+
+    Returns:
+        (b << 16) | a
+    """
+    n = len(block)
+    a = sum(block) & 0xFFFF
+    b = sum((n - i) * x for i, x in enumerate(block)) & 0xFFFF
+    return (b << 16) | a
+
+
+def strong_checksum(block: bytes) -> str:
+    return hashlib.md5(block).hexdigest()[:STRONG_DIGITS]
+
+
+def block_sums(data: bytes, block_size: int) -> List[Tuple[int, str]]:
+    """(weak, strong) of every block of data (the last one may be shorter)"""
+    return [(weak_checksum(data[i:i + block_size]), strong_checksum(data[i:i + block_size]))
+            for i in range(0, len(data), block_size)]
+
+
+def compute_delta(data: bytes, sums: Sequence[Tuple[int, str]], block_size: int) -> List[DeltaOp]:
+    """
+    Script that rebuilds data from the old file whose block sums are sums.
+
+    Blocks are first looked up where they were (an edit that doesn't change
+    the size keeps every other block in place): a dictionary lookup per
+    block. Only the stretches that don't match there are scanned byte by
+    byte with the rolling checksum, to find blocks that moved.
+    """
+    by_weak: Dict[int, List[int]] = {}
+    for index, (weak, strong) in enumerate(sums):
+        by_weak.setdefault(weak, []).append(index)
+
+    ops: List[DeltaOp] = []
+    literal_start = 0
+
+    def copy(index, start):
+        nonlocal literal_start
+        if start > literal_start:
+            ops.append(('data', data[literal_start:start]))
+        last = ops[-1] if ops else None
+        if last is not None and last[0] == 'copy' and last[1] + last[2] == index:
+            ops[-1] = ('copy', last[1], last[2] + 1)
+        else:
+            ops.append(('copy', index, 1))
+        literal_start = start + block_size
+
+    position = 0
+    size = len(data)
+    while position + block_size <= size:
+        # Aligned: the block at the same place in the old file
+        index = position // block_size
+        if position % block_size == 0 and index < len(sums) \
+                and strong_checksum(data[position:position + block_size]) == sums[index][1]:
+            copy(index, position)
+            position += block_size
+        else:
+            position = _scan(data, position, block_size, sums, by_weak, copy)
+
+    # Tail shorter than a block: may be the (short) last block of the old file
+    if position < size and sums and strong_checksum(data[position:]) == sums[-1][1]:
+        copy(len(sums) - 1, position)
+    if literal_start < size:
+        ops.append(('data', data[literal_start:]))
+    return ops
+
+
+def _scan(data: bytes, position: int, block_size: int, sums, by_weak, copy) -> int:
+    """
+    Roll the weak checksum from position until a block matches, the data
+    ends or the next block boundary (where the aligned lookup takes over).
+
+    Returns:
+        Position to continue from
+    """
+    size = len(data)
+    block = data[position:position + block_size]
+    a = sum(block) & 0xFFFF
+    b = sum((block_size - i) * x for i, x in enumerate(block)) & 0xFFFF
+
+    while True:
+        candidates = by_weak.get((b << 16) | a)
+        if candidates:
+            strong = strong_checksum(data[position:position + block_size])
+            for index in candidates:
+                if sums[index][1] == strong:
+                    copy(index, position)
+                    return position + block_size
+
+        if position + block_size >= size:
+            return size
+        out_byte = data[position]
+        a = (a - out_byte + data[position + block_size]) & 0xFFFF
+        b = (b - block_size * out_byte + a) & 0xFFFF
+        position += 1
+
+        if position % block_size == 0:
+            return position
+
+
+def delta_size(ops: Sequence[DeltaOp]) -> int:
+    """Literal bytes of a script"""
+    return sum(len(op[1]) for op in ops if op[0] == 'data')
+
+
+def apply_delta(old: bytes, ops: Sequence[DeltaOp], block_size: int) -> bytes:
+    """Rebuild the new file (what the device does, here for checks)"""
+    out = bytearray()
+    for op in ops:
+        if op[0] == 'copy':
+            out += old[op[1] * block_size:(op[1] + op[2]) * block_size]
+        else:
+            out += op[1]
+    return bytes(out)
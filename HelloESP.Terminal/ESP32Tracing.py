@@ -6,6 +6,8 @@ import re
 import logging
 from typing import List, Dict, Optional
 
+from UiEvents import TERMINAL_TEXT
+
 
 class ESP32BacktraceParser:
     def __init__(self, port: str = None, baudrate: int = 115200, serial : serial.Serial = None):
@@ -264,7 +266,7 @@ class ESP32BacktraceParser:
         threading.Thread(target=self.read_line_thread, args=(input,)).start()
 
     def read_line_thread(self, input):
-        lines = (input+"\n").split('\n')
+        lines = (input.replace('\r', '')+"\n").split('\n')
 
         self.results = ""
         for line in lines:
@@ -393,7 +395,7 @@ class ESP32BacktraceParser:
 
     def log(self, what):
         print(what)
-        self.serialInterface.main_thread_queue.put(("terminal_append_notrace", "\x1b[31m"+what+"\x1b[0m\n"))
+        self.serialInterface.ui_events.post(TERMINAL_TEXT, "\x1b[31m"+what+"\x1b[0m\n")
         self.results += what + '\n'
         #logger.error(what)
 
@@ -1,12 +1,9 @@
-import re
 from gi.repository import Gtk, Gdk, GObject, Pango
 
 
 class SearchBar:
     def __init__(self, terminal_handler):
         self.terminal_handler = terminal_handler
-        self.search_highlights = []
-        self.current_match_index = -1
 
         # Create search bar container
         self.search_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
@@ -32,17 +29,8 @@ class SearchBar:
         # Hide by default
         self.search_box.hide()
 
-        # Add search highlight tag to terminal buffer
-        self.search_tag = Gtk.TextTag.new('search-highlight')
-        self.search_tag.set_property('background', '#FFE066')  # Yellow background
-        self.search_tag.set_property('foreground', '#000000')  # Black text
-
-        self.current_match_tag = Gtk.TextTag.new('current-match')
-        self.current_match_tag.set_property('background', '#FF9933')  # Orange background
-        self.current_match_tag.set_property('foreground', '#000000')  # Black text
-
-        self.terminal_handler.tag_table.add(self.search_tag)
-        self.terminal_handler.tag_table.add(self.current_match_tag)
+        # Matching and highlighting are done by the search engine of the terminal handler
+        # (incremental index over the scrollback, tags only on the visible matches)
 
         # Setup keyboard shortcuts
         self.terminal_handler.terminal.connect('key-press-event', self.on_key_press)
@@ -69,58 +57,11 @@ class SearchBar:
         self.terminal_handler.terminal.grab_focus()
 
     def clear_highlights(self):
-        buffer = self.terminal_handler.terminal_buffer
-        start = buffer.get_start_iter()
-        end = buffer.get_end_iter()
-        buffer.remove_tag(self.search_tag, start, end)
-        buffer.remove_tag(self.current_match_tag, start, end)
-        self.search_highlights = []
-        self.current_match_index = -1
+        self.terminal_handler.cancel_search()
+        self.terminal_handler.clear_highlights()
 
     def on_search_changed(self, entry):
-        self.clear_highlights()
-        search_text = entry.get_text()
-
-        if not search_text:
-            return
-
-        buffer = self.terminal_handler.terminal_buffer
-        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
-
-        # Find all matches
-        for match in re.finditer(re.escape(search_text), text, re.IGNORECASE):
-            start_iter = buffer.get_iter_at_offset(match.start())
-            end_iter = buffer.get_iter_at_offset(match.end())
-            buffer.apply_tag(self.search_tag, start_iter, end_iter)
-            self.search_highlights.append((start_iter.get_offset(), end_iter.get_offset()))
-
-        if self.search_highlights:
-            self.current_match_index = 0
-            self.highlight_current_match()
-
-    def highlight_current_match(self):
-        if not self.search_highlights:
-            return
-
-        buffer = self.terminal_handler.terminal_buffer
-
-        # Remove current match highlighting
-        start = buffer.get_start_iter()
-        end = buffer.get_end_iter()
-        buffer.remove_tag(self.current_match_tag, start, end)
-
-        # Highlight current match
-        start_offset, end_offset = self.search_highlights[self.current_match_index]
-        start_iter = buffer.get_iter_at_offset(start_offset)
-        end_iter = buffer.get_iter_at_offset(end_offset)
-        buffer.apply_tag(self.current_match_tag, start_iter, end_iter)
-
-        # Scroll to current match
-        self.terminal_handler.terminal.scroll_to_iter(start_iter, 0.0, True, 0.0, 0.5)
+        self.terminal_handler.on_search_changed(entry)
 
     def on_search_next(self, *args):
-        if not self.search_highlights:
-            return
-
-        self.current_match_index = (self.current_match_index + 1) % len(self.search_highlights)
-        self.highlight_current_match()
+        self.terminal_handler.on_search_next()
@@ -12,7 +12,7 @@ class MonitorWidget:
 
         if self.use_terminal:
             # Create the monitor view
-            self.terminal_handler = TerminalHandler()
+            self.terminal_handler = TerminalHandler(name='monitor', scrollback=False)
             self.terminal_handler.do_scroll_down = False
             self.terminal_box = self.terminal_handler.get_widget()
             self.monitor_view = self.terminal_handler.terminal
@@ -0,0 +1,193 @@
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Histogram buckets: four per octave of microseconds, from 1 us to ~70 min
+_BUCKETS_PER_OCTAVE = 4
+_BUCKET_COUNT = 32 * _BUCKETS_PER_OCTAVE
+
+
+class Histogram:
+    """
+    Log-scale histogram of durations.
+
+    Recording is a log2 and an increment; percentiles are accurate to a
+    quarter of an octave (~19%), which is plenty to tell 1 ms from 10 ms.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        us = seconds * 1000000
+        index = int(math.log2(us) * _BUCKETS_PER_OCTAVE) if us > 1 else 0
+        self.counts[min(index, _BUCKET_COUNT - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket of the p-th percentile (0-100), in seconds."""
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.max, 2 ** ((index + 1) / _BUCKETS_PER_OCTAVE) / 1000000)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class StageStats:
+    """
+    Counters of one stage of the serial -> screen path.
+
+    latency is the time items wait in the queue in front of the stage,
+    work the time the stage spends on a batch; items and bytes count what
+    goes through, depth the queue occupation seen at each put.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = Histogram()
+        self.work = Histogram()
+        self.items = 0
+        self.bytes = 0
+        self.depth_items = 0
+        self.depth_bytes = 0
+        self.peak_depth_bytes = 0
+
+        # Rate over the last report interval
+        self._rate_time = time.monotonic()
+        self._rate_bytes = 0
+        self.bytes_per_s = 0.0
+
+    def record_put(self, size: int, depth_items: int, depth_bytes: int):
+        self.items += 1
+        self.bytes += size
+        self.depth_items = depth_items
+        self.depth_bytes = depth_bytes
+        if depth_bytes > self.peak_depth_bytes:
+            self.peak_depth_bytes = depth_bytes
+
+    def record_work(self, seconds: float, size: int = 0, items: int = 0):
+        """A batch processed by a stage without an input queue of its own."""
+        self.work.record(seconds)
+        self.items += items
+        self.bytes += size
+
+    def update_rate(self, now: float):
+        elapsed = now - self._rate_time
+        if elapsed > 0:
+            self.bytes_per_s = (self.bytes - self._rate_bytes) / elapsed
+        self._rate_bytes = self.bytes
+        self._rate_time = now
+
+    def to_dict(self) -> dict:
+        return {
+            'items': self.items,
+            'bytes': self.bytes,
+            'bytes_per_s': self.bytes_per_s,
+            'depth_items': self.depth_items,
+            'depth_bytes': self.depth_bytes,
+            'peak_depth_bytes': self.peak_depth_bytes,
+            'latency': self.latency.to_dict(),
+            'work': self.work.to_dict(),
+        }
+
+
+class PipelineStats:
+    """
+    Registry of the stage statistics, off by default.
+
+    Instrumented code checks the enabled flag before taking any timestamp,
+    so the cost when disabled is one attribute lookup per chunk. Histograms
+    are updated without locking: a lost increment now and then is an
+    acceptable price for not contending the pipeline threads.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self._stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> StageStats:
+        stage = self._stages.get(name)
+        if stage is None:
+            with self._lock:
+                stage = self._stages.setdefault(name, StageStats(name))
+        return stage
+
+    def stages(self) -> List[StageStats]:
+        return [self._stages[name] for name in sorted(self._stages)]
+
+    def enable(self, enabled: bool = True):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+        self.started = time.time()
+
+    def update_rates(self):
+        now = time.monotonic()
+        for stage in self.stages():
+            stage.update_rate(now)
+
+    def summary(self) -> str:
+        """One line per stage, for the statistics overlay."""
+        lines = [f"{'stage':<18}{'KB/s':>9}{'wait p50':>10}{'p99':>9}{'work p50':>10}{'p99':>9}{'queued':>10}"]
+        for stage in self.stages():
+            lines.append(f"{stage.name:<18}{stage.bytes_per_s / 1024:>9.1f}"
+                         f"{stage.latency.percentile(50) * 1000:>8.2f}ms{stage.latency.percentile(99) * 1000:>7.2f}ms"
+                         f"{stage.work.percentile(50) * 1000:>8.2f}ms{stage.work.percentile(99) * 1000:>7.2f}ms"
+                         f"{stage.depth_bytes / 1024:>8.1f}KB")
+        return '\n'.join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            'started': self.started,
+            'duration_s': time.time() - self.started,
+            'stages': {stage.name: stage.to_dict() for stage in self.stages()},
+        }
+
+    def dump(self, filepath: Optional[str] = None) -> str:
+        """
+        Salva le statistiche in JSON (per confrontare le prestazioni tra versioni).
+
+        Args:
+            filepath: Output file (default: only return the JSON)
+
+        Returns:
+            The JSON text
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if filepath is not None:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+
+# Statistics of the running application
+pipeline = PipelineStats()
@@ -0,0 +1,287 @@
+import threading
+import time
+import weakref
+from collections import deque
+from queue import Empty
+from typing import Any, Callable, List, Optional
+
+from PipelineStats import pipeline
+
+# Overflow policies
+BLOCK = 'block'              # Producer waits for the consumer (drops oldest only after block_timeout)
+DROP_OLDEST = 'drop_oldest'  # Drop the oldest non-priority items
+SUMMARIZE = 'summarize'      # Like DROP_OLDEST, then hand a single "N items suppressed" item to the consumer
+
+# Stage configuration of the serial -> screen pipeline.
+# 'stream' is fed from the GTK main loop, which must never wait: its backpressure
+# is read_serial leaving the data in 'serial' while it is backlogged.
+PIPELINE_CONFIG = {
+    'serial': {'capacity': 4 * 1024 * 1024, 'policy': BLOCK, 'block_timeout': None},
+    'ui': {'capacity': 2 * 1024 * 1024, 'policy': SUMMARIZE},
+    'stream': {'capacity': 2 * 1024 * 1024, 'policy': DROP_OLDEST},
+    'render': {'capacity': 1024 * 1024, 'policy': SUMMARIZE},
+}
+
+_buffers = weakref.WeakSet()
+
+
+def all_buffers() -> List['RingBuffer']:
+    """Every live RingBuffer, sorted by name."""
+    return sorted(list(_buffers), key=lambda b: b.name)
+
+
+def is_error_text(text: Any) -> bool:
+    """
+    Check if a text looks like an ESP-IDF error/warning line, which should survive overflows.
+    """
+    if not isinstance(text, str):
+        return False
+    return text.startswith(('E (', 'W (')) or '\x1b[0;31m' in text or 'Backtrace:' in text
+
+
+class RingBuffer:
+    """
+    Bounded, thread-safe FIFO between two stages of the text pipeline.
+
+    The size is accounted in bytes (via size_of). When it goes over the high
+    watermark the overflow policy kicks in and frees space down to the low
+    watermark, so a device spamming logs can't grow the memory without limit.
+    Drop counters are kept per buffer and shown in the UI.
+
+    The API is compatible with queue.Queue (put, get, get_nowait, empty, qsize).
+    """
+
+    def __init__(self, name: str, capacity: int = 1024 * 1024,
+                 high_watermark: float = 0.9, low_watermark: float = 0.5,
+                 policy: str = DROP_OLDEST,
+                 size_of: Optional[Callable[[Any], int]] = None,
+                 is_priority: Optional[Callable[[Any], bool]] = None,
+                 summarize: Optional[Callable[[int, int], Any]] = None,
+                 block_timeout: Optional[float] = None):
+        """
+        Args:
+            name: Stage name, used in statistics
+            capacity: Capacity in bytes
+            high_watermark: Fraction of capacity that triggers the overflow policy
+            low_watermark: Fraction of capacity to go back to after an overflow
+            policy: BLOCK, DROP_OLDEST or SUMMARIZE
+            size_of: Size in bytes of an item (default: len, 0 for None)
+            is_priority: Returns True for items that must never be dropped
+            summarize: Builds the item that replaces the suppressed ones (SUMMARIZE)
+            block_timeout: Max wait of a producer with BLOCK policy (None: forever)
+        """
+        self.name = name
+        self.capacity = capacity
+        self.high_bytes = int(capacity * high_watermark)
+        self.low_bytes = int(capacity * low_watermark)
+        self.policy = policy
+        self.size_of = size_of or (lambda item: len(item) if item is not None else 0)
+        self.is_priority = is_priority or (lambda item: False)
+        self.summarize = summarize
+        self.block_timeout = block_timeout
+
+        self._items = deque()
+        self._times = deque()  # Put time of each item while the pipeline statistics are enabled, else None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        # Pending summary (SUMMARIZE policy)
+        self._suppressed_items = 0
+        self._suppressed_bytes = 0
+
+        # Statistics
+        self.put_items = 0
+        self.put_bytes = 0
+        self.dropped_items = 0
+        self.dropped_bytes = 0
+        self.peak_bytes = 0
+
+        _buffers.add(self)
+
+    @classmethod
+    def for_stage(cls, stage: str, name: Optional[str] = None, **kwargs) -> 'RingBuffer':
+        """
+        Create the buffer of a pipeline stage using PIPELINE_CONFIG.
+
+        Args:
+            stage: Key of PIPELINE_CONFIG
+            name: Name shown in statistics (default: stage)
+            **kwargs: Overrides of the stage configuration
+        """
+        config = dict(PIPELINE_CONFIG[stage])
+        config.update(kwargs)
+        return cls(name or stage, **config)
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Accoda un elemento applicando la politica di overflow.
+
+        Returns:
+            True if the item was queued, False if the overflow policy dropped it
+            right away (it was the oldest non-priority item left)
+        """
+        size = self.size_of(item)
+        queued = True
+
+        with self._lock:
+            if self.policy == BLOCK and block and self._bytes + size > self.high_bytes:
+                wait = timeout if timeout is not None else self.block_timeout
+                deadline = None if wait is None else time.monotonic() + wait
+
+                while self._bytes + size > self.low_bytes and self._items:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._not_full.wait(remaining)
+
+            self._items.append(item)
+            self._bytes += size
+            self.put_items += 1
+            self.put_bytes += size
+
+            if pipeline.enabled:
+                self._times.append(time.monotonic())
+                pipeline.stage(self.name).record_put(size, len(self._items), self._bytes)
+            else:
+                self._times.append(None)
+
+            if self._bytes > self.high_bytes:
+                queued = not self._evict()
+
+            if self._bytes > self.peak_bytes:
+                self.peak_bytes = self._bytes
+
+            self._not_empty.notify()
+
+        return queued
+
+    def put_nowait(self, item: Any) -> bool:
+        return self.put(item, block=False)
+
+    def _evict(self) -> bool:
+        """
+        Drop the oldest non-priority items down to the low watermark (lock held).
+
+        Returns:
+            True if the newest item (the one just put) was dropped too
+        """
+        newest_dropped = False
+        kept = deque()
+        kept_times = deque()
+        while self._items and self._bytes > self.low_bytes:
+            item = self._items.popleft()
+            put_time = self._times.popleft()
+            if self.is_priority(item):
+                kept.append(item)
+                kept_times.append(put_time)
+                continue
+
+            size = self.size_of(item)
+            self._bytes -= size
+            self.dropped_items += 1
+            self.dropped_bytes += size
+            newest_dropped = not self._items
+
+            if self.policy == SUMMARIZE:
+                self._suppressed_items += 1
+                self._suppressed_bytes += size
+
+        kept.extend(self._items)
+        kept_times.extend(self._times)
+        self._items = kept
+        self._times = kept_times
+        return newest_dropped
+
+    def _pop(self) -> Any:
+        """Pop the next item (lock held, queue not empty)."""
+        if self._suppressed_items and self.summarize is not None:
+            item = self.summarize(self._suppressed_items, self._suppressed_bytes)
+            self._suppressed_items = 0
+            self._suppressed_bytes = 0
+            return item
+
+        item = self._items.popleft()
+        put_time = self._times.popleft()
+        self._bytes -= self.size_of(item)
+
+        if put_time is not None and pipeline.enabled:
+            stage = pipeline.stage(self.name)
+            stage.latency.record(time.monotonic() - put_time)
+            stage.depth_items = len(self._items)
+            stage.depth_bytes = self._bytes
+
+        if self._bytes <= self.low_bytes:
+            self._not_full.notify_all()
+
+        return item
+
+    def _has_items(self) -> bool:
+        return bool(self._items) or (self._suppressed_items > 0 and self.summarize is not None)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """
+        Preleva il prossimo elemento.
+
+        Raises:
+            queue.Empty: If no item is available (non blocking or timeout expired)
+        """
+        with self._lock:
+            if not block:
+                if not self._has_items():
+                    raise Empty
+            elif timeout is None:
+                while not self._has_items():
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while not self._has_items():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    self._not_empty.wait(remaining)
+
+            return self._pop()
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def drain(self, max_items: Optional[int] = None) -> List[Any]:
+        """
+        Preleva tutti gli elementi disponibili (al massimo max_items) senza bloccare.
+        """
+        items = []
+        with self._lock:
+            while self._has_items() and (max_items is None or len(items) < max_items):
+                items.append(self._pop())
+        return items
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._times.clear()
+            self._bytes = 0
+            self._suppressed_items = 0
+            self._suppressed_bytes = 0
+            self._not_full.notify_all()
+
+    def empty(self) -> bool:
+        with self._lock:
+            return not self._has_items()
+
+    def is_backlogged(self) -> bool:
+        """More is queued than the low watermark: a producer that can wait should hold off."""
+        with self._lock:
+            return self._bytes > self.low_bytes
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def bytes(self) -> int:
+        """Bytes currently queued."""
+        return self._bytes
@@ -0,0 +1,281 @@
+import mmap
+import tempfile
+import threading
+from array import array
+from typing import List, Optional, Tuple
+
+from AnsiParser import OP_TEXT, OP_CR, OP_BACKSPACE, OP_ERASE_LINE, PLAIN
+
+# A line: plain text (without the newline) and its style runs as (start char, tagset_id)
+Line = Tuple[str, List[Tuple[int, int]]]
+
+
+class _MappedFile:
+    """Append-only temporary file, read back through a memory map grown on demand."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.file = tempfile.TemporaryFile(prefix='helloesp-scrollback-', dir=directory)
+        self.size = 0
+        self._map = None
+        self._map_size = 0
+        self._dirty = False
+
+    def append(self, data: bytes) -> int:
+        """Write data at the end of the file and return its offset."""
+        offset = self.size
+        self.file.write(data)
+        self.size += len(data)
+        self._dirty = True
+        return offset
+
+    def read(self, start: int, end: int) -> bytes:
+        if end <= start:
+            return b''
+        if self._dirty:
+            self.file.flush()
+            self._dirty = False
+        if end > self._map_size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+            self._map_size = self.size
+        return self._map[start:end]
+
+    def truncate(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._map_size = 0
+        self.file.seek(0)
+        self.file.truncate()
+        self.size = 0
+        self._dirty = False
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.close()
+
+
+class ScrollbackStore:
+    """
+    Append-only on-disk log of the terminal session.
+
+    Completed lines are written to a temporary file as plain UTF-8 text, with
+    their style runs (interned tagset ids) in a second file; two arrays keep
+    the offset of every line in both, so any range of lines is read back with
+    a single slice of the memory map. RAM usage is 16 bytes per line whatever
+    the line length. The line being written (last line of the terminal) is
+    kept in memory and edited by the same operations the renderer applies
+    (CR, backspace, erase line), so the stored text matches what was on screen.
+
+    Lines are written by the main loop; reads may come from other threads
+    (background search), so file access is serialized by a lock.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: Where to create the temporary files (default: system temp dir)
+        """
+        self._text = _MappedFile(directory)
+        self._styles = _MappedFile(directory)
+        self.line_offsets = array('Q', [0])   # Start of line i in the text file, plus the end
+        self.style_offsets = array('Q', [0])  # Same for the style file
+
+        # Line being written: list of [text, tagset_id] runs
+        self.current: List[list] = []
+        self.cr_pending = False
+
+        self._pending_text: List[bytes] = []
+        self._pending_styles: List[bytes] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of completed lines."""
+        return len(self.line_offsets) - 1
+
+    @property
+    def bytes(self) -> int:
+        """Size of the stored text in bytes."""
+        return self._text.size + sum(len(data) for data in self._pending_text)
+
+    ###
+    ### Writing
+    ###
+
+    def append_line(self, text: str, runs: List[Tuple[int, int]]):
+        """
+        Aggiunge una riga completa.
+
+        Args:
+            text: Line text without the newline
+            runs: Style runs as (start char, tagset_id), sorted by start
+        """
+        data = text.encode('utf-8', 'replace') + b'\n'
+
+        if runs and not (len(runs) == 1 and runs[0][1] == PLAIN):
+            styles = array('I')
+            for start, tagset_id in runs:
+                styles.append(start)
+                styles.append(tagset_id)
+            styles = styles.tobytes()
+        else:
+            styles = b''
+
+        with self._lock:
+            self._pending_text.append(data)
+            self._pending_styles.append(styles)
+            self.line_offsets.append(self.line_offsets[-1] + len(data))
+            self.style_offsets.append(self.style_offsets[-1] + len(styles))
+
+    def _commit_current(self):
+        runs = []
+        parts = []
+        pos = 0
+        for text, tagset_id in self.current:
+            if not text:
+                continue
+            if not runs or runs[-1][1] != tagset_id:
+                runs.append((pos, tagset_id))
+            parts.append(text)
+            pos += len(text)
+        self.append_line(''.join(parts), runs)
+        self.current = []
+
+    def _erase_current_tail(self, count: int):
+        """Remove the last count characters of the current line."""
+        while count > 0 and self.current:
+            run = self.current[-1]
+            if len(run[0]) <= count:
+                count -= len(run[0])
+                self.current.pop()
+            else:
+                run[0] = run[0][:-count]
+                count = 0
+
+    def apply_op(self, op: tuple):
+        """
+        Applica un'operazione di modifica (AnsiParser OP_*) alla fine del log.
+        """
+        kind = op[0]
+
+        if kind == OP_TEXT:
+            text, tagset_id = op[1], op[2]
+            if self.cr_pending:
+                self.cr_pending = False
+                if not text.startswith('\n'):
+                    self.current = []  # Text after a bare CR overwrites the line
+
+            lines = text.split('\n')
+            for i, part in enumerate(lines):
+                if i:
+                    self._commit_current()
+                if part:
+                    self.current.append([part, tagset_id])
+        elif kind == OP_CR:
+            self.cr_pending = True
+        elif kind == OP_BACKSPACE:
+            self._erase_current_tail(op[1])
+        elif kind == OP_ERASE_LINE:
+            mode = op[1]
+            if mode == 2 or (mode == 0 and self.cr_pending) or (mode == 1 and not self.cr_pending):
+                self.current = []
+
+    def flush(self):
+        """Write the lines completed since the last call (once per render batch)."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._pending_text:
+            self._text.append(b''.join(self._pending_text))
+            self._pending_text = []
+        if self._pending_styles:
+            styles = b''.join(self._pending_styles)
+            if styles:
+                self._styles.append(styles)
+            self._pending_styles = []
+
+    ###
+    ### Reading
+    ###
+
+    def _decode_runs(self, data: bytes) -> List[Tuple[int, int]]:
+        if not data:
+            return [(0, PLAIN)]
+        values = array('I')
+        values.frombytes(data)
+        return [(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+
+    def get_lines(self, start: int, end: int) -> List[Line]:
+        """
+        Legge le righe [start, end) dal disco.
+
+        Returns:
+            List of (text, runs)
+        """
+        with self._lock:
+            self._flush()
+            start = max(0, start)
+            end = min(end, len(self))
+            if start >= end:
+                return []
+
+            offsets = self.line_offsets
+            style_offsets = self.style_offsets
+            text = self._text.read(offsets[start], offsets[end])
+            styles = self._styles.read(style_offsets[start], style_offsets[end])
+        text_base = offsets[start]
+        style_base = style_offsets[start]
+
+        lines = []
+        for i in range(start, end):
+            line = text[offsets[i] - text_base:offsets[i + 1] - text_base - 1].decode('utf-8', 'replace')
+            runs = self._decode_runs(styles[style_offsets[i] - style_base:style_offsets[i + 1] - style_base])
+            lines.append((line, runs))
+        return lines
+
+    def get_text(self, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Testo semplice delle righe [start, end), ognuna terminata da newline.
+        """
+        with self._lock:
+            self._flush()
+            end = len(self) if end is None else min(end, len(self))
+            start = max(0, start)
+            if start >= end:
+                return ''
+            data = self._text.read(self.line_offsets[start], self.line_offsets[end])
+        return data.decode('utf-8', 'replace')
+
+    def get_current(self) -> Line:
+        """The line being written, as (text, runs)."""
+        runs = []
+        pos = 0
+        for text, tagset_id in self.current:
+            runs.append((pos, tagset_id))
+            pos += len(text)
+        return ''.join(run[0] for run in self.current), runs
+
+    ###
+    ### Lifecycle
+    ###
+
+    def clear(self):
+        """Forget the whole session."""
+        with self._lock:
+            self._pending_text = []
+            self._pending_styles = []
+            self._text.truncate()
+            self._styles.truncate()
+            self.line_offsets = array('Q', [0])
+            self.style_offsets = array('Q', [0])
+        self.current = []
+        self.cr_pending = False
+
+    def close(self):
+        """Close (and delete) the temporary files."""
+        self._text.close()
+        self._styles.close()
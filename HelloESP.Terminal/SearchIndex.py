@@ -0,0 +1,345 @@
+import functools
+import re
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# A match: (line number, start column, end column)
+Match = Tuple[int, int, int]
+
+# Start of an ESP-IDF log line up to the tag: "I (1234) " or "I (12:34:56.789) "
+ESP_LOG_PREFIX = r'^[EWIDV] \([0-9:.]+\) '
+
+
+def trigrams(text: str) -> set:
+    """Distinct lowercase trigrams of a text."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _escape_end(expr: str, i: int) -> int:
+    """End of the escape sequence starting at expr[i] (a backslash)."""
+    kind = expr[i + 1:i + 2]
+    if kind == 'x':
+        return i + 4
+    if kind == 'u':
+        return i + 6
+    if kind == 'U':
+        return i + 10
+    if kind == 'N':
+        close = expr.find('}', i)
+        return len(expr) if close < 0 else close + 1
+    if kind.isdigit():
+        # Octal code or group reference: up to three digits
+        end = i + 2
+        while end < min(len(expr), i + 4) and expr[end].isdigit():
+            end += 1
+        return end
+    return i + 2
+
+
+def _class_end(expr: str, i: int) -> int:
+    """End of the character class starting at expr[i] (an open bracket)."""
+    j = i + 1
+    if expr[j:j + 1] == '^':
+        j += 1
+    if expr[j:j + 1] == ']':
+        j += 1  # A bracket right after the opening one is a member, not the end
+    while j < len(expr):
+        if expr[j] == '\\':
+            j += 2
+        elif expr[j] == ']':
+            return j + 1
+        else:
+            j += 1
+    return len(expr)
+
+
+def required_literal(expr: str) -> str:
+    """
+    Longest run of literal characters that every match of a regular expression contains.
+
+    Conservative: expressions with groups or alternatives return '' (unknown),
+    in which case the index can't skip any block. Escapes other than escaped
+    punctuation (classes, anchors, character codes) end the run.
+    """
+    if '|' in expr or '(' in expr:
+        return ''
+
+    best = ''
+    run = []
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if c == '\\':
+            nxt = expr[i + 1:i + 2]
+            if nxt and not nxt.isalnum():
+                run.append(nxt)  # Escaped punctuation is a literal
+                i += 2
+            else:
+                best = max(best, ''.join(run), key=len)
+                run = []
+                i = _escape_end(expr, i)
+            continue
+
+        if c in '.^$[]{}?*+':
+            if c in '?*{' and run:
+                run.pop()  # The previous character is optional
+            best = max(best, ''.join(run), key=len)
+            run = []
+            if c == '[':
+                i = _class_end(expr, i)
+            elif c == '{':
+                close = expr.find('}', i + 1)
+                i = len(expr) if close < 0 else close + 1
+            else:
+                i += 1
+            continue
+
+        run.append(c)
+        i += 1
+
+    return max(best, ''.join(run), key=len)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_query(query: str, regex: bool = False, whole_word: bool = False,
+                  case_sensitive: bool = False):
+    """
+    Compila una query di ricerca (cache LRU: riscrivere la stessa query non ricompila).
+
+    A query "tag:NAME" matches the ESP-IDF log lines of tag NAME, whatever the
+    level and timestamp format.
+
+    Args:
+        query: Text typed by the user
+        regex: The query is a regular expression
+        whole_word: Match only whole words
+        case_sensitive: Match the case
+
+    Returns:
+        Tuple of (compiled pattern, literal text every match contains, '' if unknown)
+
+    Raises:
+        re.error: If the regular expression is invalid
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+
+    if query.startswith('tag:') and not regex:
+        tag = query[4:].strip()
+        return re.compile(ESP_LOG_PREFIX + re.escape(tag) + ':', flags), tag + ':'
+
+    if regex:
+        expr = query
+        literal = required_literal(query)
+    else:
+        expr = re.escape(query)
+        literal = query
+
+    if whole_word:
+        expr = r'\b(?:' + expr + r')\b'
+
+    return re.compile(expr, flags), literal
+
+
+class _Block:
+    __slots__ = ('first_line', 'count', 'bloom')
+
+    def __init__(self, first_line: int, bloom_bytes: int):
+        self.first_line = first_line
+        self.count = 0
+        self.bloom = bytearray(bloom_bytes)
+
+
+class SearchIndex:
+    """
+    Incremental search index over the lines of the scrollback.
+
+    Lines are grouped in blocks; each block keeps a bloom filter of the
+    lowercase trigrams of its text, updated as new lines are appended. A query
+    only reads (from the scrollback) and scans the blocks whose filter
+    contains all of its trigrams, so on a long session most of the text is
+    never touched. Queries shorter than three characters scan every block.
+    Results are produced block by block by a generator, so the caller decides
+    how much work to do per main loop iteration.
+    """
+
+    def __init__(self, read_text: Callable[[int, int], str],
+                 block_lines: int = 256, bloom_bits: int = 16384):
+        """
+        Args:
+            read_text: Returns the text of lines [start, end), one per line with newline
+            block_lines: Lines per block
+            bloom_bits: Size of the filter of a block (power of two)
+        """
+        self.read_text = read_text
+        self.block_lines = block_lines
+        self.bloom_mask = bloom_bits - 1
+        self.bloom_bytes = bloom_bits // 8
+
+        self.first_line = 0    # First line still indexed
+        self.line_count = 0    # Lines indexed so far (absolute count)
+        self._blocks: List[_Block] = []
+
+    def _set_bits(self, bloom: bytearray, grams: set):
+        mask = self.bloom_mask
+        for gram in grams:
+            h = hash(gram) & mask
+            bloom[h >> 3] |= 1 << (h & 7)
+
+    def _has_bits(self, bloom: bytearray, hashes: List[int]) -> bool:
+        for h in hashes:
+            if not bloom[h >> 3] & (1 << (h & 7)):
+                return False
+        return True
+
+    def update(self, line_count: int):
+        """
+        Indicizza le righe aggiunte fino a line_count.
+
+        Args:
+            line_count: Number of lines now available from read_text
+        """
+        while self.line_count < line_count:
+            if not self._blocks or self._blocks[-1].count >= self.block_lines:
+                self._blocks.append(_Block(self.line_count, self.bloom_bytes))
+
+            block = self._blocks[-1]
+            end = min(line_count, self.line_count + self.block_lines - block.count)
+            self._set_bits(block.bloom, trigrams(self.read_text(self.line_count, end)))
+
+            block.count += end - self.line_count
+            self.line_count = end
+
+    def trim(self, first_line: int):
+        """Forget the blocks that end before first_line (lines no longer available)."""
+        self.first_line = max(self.first_line, first_line)
+        while self._blocks and self._blocks[0].first_line + self._blocks[0].count <= self.first_line:
+            self._blocks.pop(0)
+
+    def clear(self):
+        self.first_line = 0
+        self.line_count = 0
+        self._blocks = []
+
+    def search(self, pattern, query: str = '', start_line: int = 0,
+               end_line: Optional[int] = None) -> Iterator[List[Match]]:
+        """
+        Cerca pattern nelle righe indicizzate, un blocco alla volta.
+
+        Args:
+            pattern: Compiled regular expression, matched on each line
+            query: Literal text every match contains, used to skip blocks
+                   (empty: no filtering)
+            start_line: First line to search
+            end_line: Line after the last one to search (default: all indexed lines)
+
+        Yields:
+            List of matches of a block (possibly empty, so the caller can
+            check its time budget between blocks)
+        """
+        mask = self.bloom_mask
+        hashes = [hash(gram) & mask for gram in trigrams(query)] if query else []
+        end_line = self.line_count if end_line is None else min(end_line, self.line_count)
+        start_line = max(start_line, self.first_line)
+
+        for block in list(self._blocks):
+            first = max(block.first_line, start_line)
+            last = min(block.first_line + block.count, end_line)
+            if first >= last:
+                if block.first_line >= end_line:
+                    break
+                continue
+
+            if hashes and not self._has_bits(block.bloom, hashes):
+                yield []
+                continue
+
+            yield self.match_lines(pattern, first, self.read_text(first, last)[:-1].split('\n'))
+
+    @staticmethod
+    def match_lines(pattern, first_line: int, lines: List[str]) -> List[Match]:
+        """Matches of pattern in consecutive lines, the first one being first_line."""
+        matches = []
+        search = pattern.search
+        for i, line in enumerate(lines):
+            if not search(line):
+                continue
+            for m in pattern.finditer(line):
+                if m.end() > m.start():
+                    matches.append((first_line + i, m.start(), m.end()))
+        return matches
+
+
+
+class SearchWorker:
+    """
+    Runs one search at a time in a background thread.
+
+    A job is an iterable of match batches (e.g. SearchIndex.search). Between
+    batches the worker checks whether the job was cancelled or superseded by a
+    newer one, and hands the matches found so far to on_results at most every
+    report_interval seconds, so the consumer gets a steady stream of small
+    updates instead of one big result at the end.
+    """
+
+    def __init__(self, on_results: Callable[[int, List[Match], bool], None],
+                 report_interval: float = 0.05):
+        """
+        Args:
+            on_results: Called from the worker thread with (generation, matches, done)
+            report_interval: Minimum time between two partial results (s)
+        """
+        self.on_results = on_results
+        self.report_interval = report_interval
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job: Iterable[list], on_results: Optional[Callable[[int, list, bool], None]] = None) -> int:
+        """
+        Avvia una ricerca, annullando quella in corso.
+
+        Args:
+            job: Iterable of result batches
+            on_results: Results callback of this job (default: the worker one)
+
+        Returns:
+            Generation of the job, passed back to on_results
+        """
+        with self._lock:
+            self.generation += 1
+            generation = self.generation
+
+        thread = threading.Thread(target=self._run, args=(job, generation, on_results or self.on_results),
+                                  name="SearchWorker")
+        thread.daemon = True
+        thread.start()
+        return generation
+
+    def cancel(self):
+        """Stop the running job at its next batch; its results are discarded."""
+        with self._lock:
+            self.generation += 1
+
+    def _run(self, job, generation, on_results):
+        pending = []
+        last_report = time.monotonic()
+        try:
+            for batch in job:
+                if generation != self.generation:
+                    return
+                pending.extend(batch)
+
+                now = time.monotonic()
+                if pending and now - last_report >= self.report_interval:
+                    on_results(generation, pending, False)
+                    pending = []
+                    last_report = now
+        except Exception as e:
+            print("SearchWorker exception: ", e)
+            traceback.print_exc(file=sys.stdout)
+
+        if generation == self.generation:
+            on_results(generation, pending, True)
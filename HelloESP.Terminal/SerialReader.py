@@ -0,0 +1,193 @@
+import os
+import select
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, List, Optional, Tuple
+
+import serial
+
+from RingBuffer import RingBuffer
+
+
+class SerialReader:
+    """
+    Dedicated reader thread for an open serial port.
+
+    The thread sleeps on the port file descriptor (select) and wakes up only
+    when bytes are available, so there is no polling latency and no wakeups
+    while the device is quiet. Raw chunks are handed to the consumer through
+    a bounded RingBuffer ('serial' stage): when the consumer falls behind, the
+    reader blocks and the backlog stays in the OS/driver buffer instead of
+    growing without limit.
+    """
+
+    def __init__(self, serial_conn: serial.Serial,
+                 on_data: Optional[Callable[[], None]] = None,
+                 is_paused: Optional[Callable[[], bool]] = None,
+                 read_size: int = 4096):
+        """
+        Args:
+            serial_conn: Open serial connection to read from
+            on_data: Called from the reader thread when the queue goes from
+                     drained to non-empty (or on error); used to wake the consumer
+            is_paused: Returns True while another component owns the port
+                       (e.g. SerialCommandHandler.wait_for_response)
+            read_size: Maximum number of bytes read at once
+        """
+        self.serial_conn = serial_conn
+        self.on_data = on_data
+        self.is_paused = is_paused or (lambda: False)
+        self.read_size = read_size
+
+        self.queue = RingBuffer.for_stage('serial')
+        self.error: Optional[Exception] = None
+        self.capture = None  # Optional CaptureWriter, fed with every chunk at read time
+
+        # Statistics
+        self.bytes_read = 0
+        self._rate_bytes = 0
+        self._rate_time = time.monotonic()
+
+        self._wake_pending = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._fd = self._get_fileno()
+        self._stop_r, self._stop_w = (os.pipe() if self._fd is not None else (None, None))
+
+    def _get_fileno(self) -> Optional[int]:
+        if os.name == 'nt':
+            return None
+        try:
+            return self.serial_conn.fileno()
+        except Exception:
+            return None
+
+    def start(self):
+        """
+        Avvia il thread di lettura.
+        """
+        if self._thread is None:
+            self._stop_event.clear()
+
+            if self._fd is None:
+                # No selectable descriptor (Windows): rely on a blocking read with timeout
+                self.serial_conn.timeout = 0.1
+
+            self._thread = threading.Thread(target=self._read_loop, name="SerialReader")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Ferma il thread di lettura e scarta i dati non consumati.
+        """
+        self._stop_event.set()
+        self.queue.clear()  # Wakes up a reader blocked on a full queue
+        if self._stop_w is not None:
+            try:
+                os.write(self._stop_w, b'x')
+            except OSError:
+                pass
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+        for fd in (self._stop_r, self._stop_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._stop_r = self._stop_w = None
+
+    def _wait_readable(self) -> bool:
+        """Block until the port has data; returns False if woken up for stop."""
+        if self._fd is None:
+            return True
+
+        ready, _, _ = select.select([self._fd, self._stop_r], [], [])
+        return self._stop_r not in ready
+
+    def _read_chunk(self) -> bytes:
+        if self._fd is None:
+            data = self.serial_conn.read(1)
+            if data and self.serial_conn.in_waiting:
+                data += self.serial_conn.read(min(self.serial_conn.in_waiting, self.read_size))
+            return data
+
+        return self.serial_conn.read(min(max(self.serial_conn.in_waiting, 1), self.read_size))
+
+    def _read_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.is_paused():
+                    time.sleep(0.01)
+                    continue
+
+                if not self._wait_readable():
+                    break
+
+                if self.is_paused():
+                    continue
+
+                data = self._read_chunk()
+                if data:
+                    self._put(data)
+
+            except (serial.SerialException, OSError) as e:
+                if not self._stop_event.is_set():
+                    self.error = e
+                    self._notify()
+                break
+            except Exception as e:
+                print("SerialReader exception: ", e)
+                traceback.print_exc(file=sys.stdout)
+
+    def _put(self, data: bytes):
+        if self.capture is not None:
+            self.capture.write(data)
+
+        # Blocks while the consumer is behind, holding the data (and the port)
+        self.queue.put(data)
+
+        self.bytes_read += len(data)
+        self._rate_bytes += len(data)
+        self._notify()
+
+    def _notify(self):
+        if not self._wake_pending:
+            self._wake_pending = True
+            if self.on_data is not None:
+                self.on_data()
+
+    def drain(self, max_items: Optional[int] = None) -> List[bytes]:
+        """
+        Preleva i chunk in coda (al massimo max_items).
+
+        Returns:
+            List of raw chunks in arrival order
+        """
+        # Reset before emptying the queue, so a chunk queued meanwhile triggers a new wakeup
+        self._wake_pending = False
+        return self.queue.drain(max_items)
+
+    def get_stats(self) -> Tuple[float, int]:
+        """
+        Returns:
+            Tuple of (read rate in bytes/s since the last call, queued bytes)
+        """
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        rate = self._rate_bytes / elapsed if elapsed > 0 else 0.0
+
+        self._rate_bytes = 0
+        self._rate_time = now
+
+        return rate, self.queue.bytes
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,298 @@
+import gzip
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from typing import Callable, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Output formats
+FORMAT_ANSI = 'ansi'  # The bytes as received, escape sequences included
+FORMAT_TEXT = 'text'  # Escape sequences and control characters removed
+
+COMPRESSIONS = (None, 'gzip', 'zstd')
+
+# Escape sequences (CSI, and the two byte ones), also as echoed by some scripts ("\x1b[0;32m")
+_ESCAPE = re.compile(rb'\x1b(?:\[[0-9;?]*[ -/]*[@-~]|[ -/]*[0-~])|\\x1b\[[0-9;]*m')
+# Control characters dropped from plain text (newline and tab are kept)
+_CONTROL = re.compile(rb'[\x00-\x08\x0b-\x1f\x7f]')
+# A sequence cut at the end of a chunk, completed by the next one
+_PARTIAL_ESCAPE = re.compile(rb'(?:\x1b(?:\[[0-9;?]*[ -/]*|[ -/]*)|\\(?:x(?:1(?:b(?:\[[0-9;]*)?)?)?)?)$')
+
+
+def format_from_filename(filepath: str):
+    """
+    Formato e compressione di un file dal nome.
+
+    "*.txt" is plain text, anything else keeps the ANSI sequences; a ".gz" or
+    ".zst" suffix selects the compression ("session.txt.gz", "session.log.zst").
+
+    Returns:
+        Tuple of (format, compression)
+    """
+    name = filepath.lower()
+    compression = None
+    if name.endswith('.gz'):
+        compression = 'gzip'
+        name = name[:-3]
+    elif name.endswith('.zst'):
+        compression = 'zstd'
+        name = name[:-4]
+
+    fmt = FORMAT_TEXT if name.endswith('.txt') else FORMAT_ANSI
+    return fmt, compression
+
+
+class SessionLog:
+    """
+    Append-only on-disk copy of the raw bytes received during the session.
+
+    The terminal scrollback keeps what was rendered; this keeps what came in,
+    so exports are not limited by the trimmed history and keep the original
+    escape sequences. Appends come from the main loop, reads from the export
+    threads, serialized by a lock.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: Where to create the temporary file (default: system temp dir)
+        """
+        self.file = tempfile.TemporaryFile(prefix='helloesp-session-', dir=directory)
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def append(self, data: bytes):
+        with self._lock:
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(data)
+            self.size += len(data)
+
+    def read(self, start: int, length: int) -> bytes:
+        """Read up to length bytes from offset start."""
+        with self._lock:
+            self.file.seek(start)
+            return self.file.read(min(length, self.size - start))
+
+    def chunks(self, start: int = 0, end: Optional[int] = None, chunk_size: int = 1024 * 1024):
+        """
+        Legge il log a blocchi, senza caricarlo in memoria.
+
+        Args:
+            start: First byte
+            end: Byte after the last one (default: the size at the time of the call)
+            chunk_size: Bytes per chunk
+
+        Yields:
+            Chunks of bytes
+        """
+        end = self.size if end is None else min(end, self.size)
+        while start < end:
+            data = self.read(start, min(chunk_size, end - start))
+            if not data:
+                break
+            start += len(data)
+            yield data
+
+    def clear(self):
+        with self._lock:
+            self.file.seek(0)
+            self.file.truncate()
+            self.size = 0
+
+    def close(self):
+        self.file.close()
+
+
+class SessionWriter:
+    """
+    Writes a byte stream to a file in one of the export formats.
+
+    Text is converted chunk by chunk; an escape sequence split across two
+    chunks is held back until the rest of it arrives.
+    """
+
+    def __init__(self, filepath: str, fmt: str = FORMAT_ANSI, compression: Optional[str] = None):
+        """
+        Args:
+            filepath: Output file
+            fmt: FORMAT_ANSI or FORMAT_TEXT
+            compression: None, 'gzip' or 'zstd'
+
+        Raises:
+            ValueError: If the format or the compression is unknown
+            RuntimeError: If zstd is requested and the zstandard module is missing
+            OSError: If the file can't be created
+        """
+        if fmt not in (FORMAT_ANSI, FORMAT_TEXT):
+            raise ValueError(f"Unknown format: {fmt}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard module (pip install zstandard)")
+
+        self.filepath = filepath
+        self.fmt = fmt
+        self.compression = compression
+        self.bytes_in = 0
+        self._tail = b''
+
+        raw = open(filepath, 'wb', buffering=1024 * 1024)
+        try:
+            if compression == 'gzip':
+                self.file = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+                self._raw = raw
+            elif compression == 'zstd':
+                self.file = zstandard.ZstdCompressor(level=3).stream_writer(raw)
+                self._raw = None  # Closed by the stream writer
+            else:
+                self.file = raw
+                self._raw = None
+        except Exception:
+            raw.close()
+            raise
+
+    def _to_text(self, data: bytes) -> bytes:
+        data = self._tail + data
+        partial = _PARTIAL_ESCAPE.search(data, max(0, len(data) - 64))
+        if partial is not None and partial.start() < len(data):
+            self._tail = data[partial.start():]
+            data = data[:partial.start()]
+        else:
+            self._tail = b''
+        return _CONTROL.sub(b'', _ESCAPE.sub(b'', data))
+
+    def write(self, data: bytes):
+        self.bytes_in += len(data)
+        if self.fmt == FORMAT_TEXT:
+            data = self._to_text(data)
+        if data:
+            self.file.write(data)
+
+    def close(self):
+        if self._tail:
+            # The stream ended inside a sequence: keep what isn't one
+            tail, self._tail = self._tail, b''
+            self.file.write(_CONTROL.sub(b'', tail))
+        self.file.close()
+        if self._raw is not None:
+            self._raw.close()
+
+
+def export_session(log: SessionLog, filepath: str, fmt: str = FORMAT_ANSI,
+                   compression: Optional[str] = None,
+                   progress: Optional[Callable[[float], None]] = None,
+                   chunk_size: int = 1024 * 1024):
+    """
+    Esporta il log della sessione (da chiamare in un thread in background).
+
+    Only the bytes received before the call are exported; the session can
+    keep growing meanwhile.
+
+    Args:
+        log: Session to export
+        filepath: Output file
+        fmt: FORMAT_ANSI or FORMAT_TEXT
+        compression: None, 'gzip' or 'zstd'
+        progress: Called with the fraction done, at most every 0.1 s
+        chunk_size: Bytes read at once
+    """
+    end = log.size
+    writer = SessionWriter(filepath, fmt, compression)
+    last_report = 0.0
+    try:
+        for data in log.chunks(0, end, chunk_size):
+            writer.write(data)
+
+            now = time.monotonic()
+            if progress is not None and now - last_report > 0.1:
+                last_report = now
+                progress(writer.bytes_in / end)
+    finally:
+        writer.close()
+
+
+class SessionRecorder:
+    """
+    Continuous recording of the session to file, with rotation.
+
+    Each file is named after base_path plus the time it was opened
+    ("capture.log.gz" -> "capture-20240131-154500.log.gz"). A new file is
+    started when the current one reaches max_bytes of input or is older than
+    max_seconds (0 disables either limit).
+    """
+
+    def __init__(self, base_path: str, fmt: str = FORMAT_ANSI, compression: Optional[str] = None,
+                 max_bytes: int = 0, max_seconds: float = 0):
+        """
+        Args:
+            base_path: Name of the files, before the timestamp
+            fmt: FORMAT_ANSI or FORMAT_TEXT
+            compression: None, 'gzip' or 'zstd'
+            max_bytes: Rotate after this many bytes received
+            max_seconds: Rotate after this many seconds
+        """
+        self.base_path = base_path
+        self.fmt = fmt
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.files = []  # Files written so far
+        self.writer = None
+        self.opened_at = 0.0
+        self._open()
+
+    def _next_path(self) -> str:
+        directory, name = os.path.split(self.base_path)
+        stem, dot, suffix = name.partition('.')
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(directory, f"{stem}-{stamp}{dot}{suffix}")
+
+        n = 1
+        while os.path.exists(path) or path in self.files:
+            path = os.path.join(directory, f"{stem}-{stamp}-{n}{dot}{suffix}")
+            n += 1
+        return path
+
+    def _open(self):
+        path = self._next_path()
+        self.writer = SessionWriter(path, self.fmt, self.compression)
+        self.files.append(path)
+        self.opened_at = time.monotonic()
+
+    def rotate(self):
+        """Close the current file and start a new one."""
+        self.writer.close()
+        self._open()
+
+    def write(self, data: bytes):
+        if self.writer is None:
+            return
+
+        if ((self.max_bytes and self.writer.bytes_in >= self.max_bytes) or
+                (self.max_seconds and time.monotonic() - self.opened_at >= self.max_seconds)):
+            try:
+                self.rotate()
+            except Exception as e:
+                print("SessionRecorder rotation error: ", e)
+                traceback.print_exc(file=sys.stdout)
+                self.writer = None
+                return
+
+        self.writer.write(data)
+
+    @property
+    def current_path(self) -> Optional[str]:
+        return self.files[-1] if self.writer is not None else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
@@ -0,0 +1,223 @@
+import struct
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from RingBuffer import RingBuffer
+
+# Capture file: magic, start time (epoch s), then frames of (us since the previous frame, length) + bytes
+CAPTURE_MAGIC = b'HESPCAP1'
+CAPTURE_EXTENSION = '.hcap'
+_HEADER = struct.Struct('<8sd')
+_FRAME = struct.Struct('<II')
+_MAX_DELTA = 0xFFFFFFFF  # ~71 minutes of silence in a single frame
+
+
+class CaptureWriter:
+    """
+    Records the serial stream as timestamped frames in a compact binary file.
+
+    Each chunk read from the port becomes a frame with 8 bytes of overhead:
+    the time since the previous frame in microseconds and the length.
+    Writes may come from the serial reader thread, so they are serialized.
+    """
+
+    def __init__(self, filepath: str):
+        """
+        Args:
+            filepath: Output file
+
+        Raises:
+            OSError: If the file can't be created
+        """
+        self.filepath = filepath
+        self.file = open(filepath, 'wb', buffering=256 * 1024)
+        self.file.write(_HEADER.pack(CAPTURE_MAGIC, time.time()))
+        self.frames = 0
+        self.bytes = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes, timestamp: Optional[float] = None):
+        """
+        Aggiunge un frame.
+
+        Args:
+            data: Bytes received
+            timestamp: time.monotonic() of the reception (default: now)
+        """
+        if not data:
+            return
+        now = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            if self.file is None:
+                return
+            delta = min(_MAX_DELTA, max(0, int((now - self._last) * 1000000)))
+            self._last = now
+            self.file.write(_FRAME.pack(delta, len(data)))
+            self.file.write(data)
+            self.frames += 1
+            self.bytes += len(data)
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_capture(filepath: str) -> Iterator[Tuple[float, bytes]]:
+    """
+    Legge un file di cattura frame per frame (streaming).
+
+    A frame cut by an interrupted recording ends the capture.
+
+    Yields:
+        Tuple of (seconds since the start of the recording, bytes)
+
+    Raises:
+        ValueError: If the file is not a capture
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != CAPTURE_MAGIC:
+            raise ValueError(f"Not a HelloESP capture: {filepath}")
+
+        elapsed = 0
+        while True:
+            frame = f.read(_FRAME.size)
+            if len(frame) < _FRAME.size:
+                return
+            delta, length = _FRAME.unpack(frame)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            elapsed += delta
+            yield elapsed / 1000000, data
+
+
+class ReplayReader:
+    """
+    Plays a capture file back as if it came from the serial port.
+
+    It has the interface of SerialReader (start, stop, drain, get_stats,
+    error), so the consumer feeds the frames to the same pipeline as live
+    data: StreamHandler, tracer, terminal and monitor. Frames are queued on
+    the 'serial' stage RingBuffer, whose BLOCK policy throttles the replay
+    to the speed of the consumer.
+
+    speed is a multiplier of the recorded timing (1.0 real time, 10.0 ten
+    times faster); 0 replays as fast as the pipeline accepts the data.
+    """
+
+    def __init__(self, filepath: str, speed: float = 1.0,
+                 on_data: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            filepath: Capture file to play
+            speed: Timing multiplier, 0 for as fast as possible
+            on_data: Called from the replay thread when the queue goes from
+                     drained to non-empty, and once at the end
+        """
+        self.filepath = filepath
+        self.speed = speed
+        self.on_data = on_data
+
+        self.queue = RingBuffer.for_stage('serial', name='replay')
+        self.error: Optional[Exception] = None
+        self.finished = False
+
+        # Statistics
+        self.bytes_read = 0
+        self.frames_read = 0
+        self._rate_bytes = 0
+        self._rate_time = time.monotonic()
+
+        self._wake_pending = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._replay_loop, name="ReplayReader")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Ferma la riproduzione e scarta i dati non consumati.
+        """
+        self._stop_event.set()
+        self.queue.clear()  # Wakes up the thread blocked on a full queue
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _replay_loop(self):
+        start = time.monotonic()
+        try:
+            for elapsed, data in read_capture(self.filepath):
+                if self._stop_event.is_set():
+                    return
+
+                if self.speed > 0:
+                    wait = start + elapsed / self.speed - time.monotonic()
+                    if wait > 0 and self._stop_event.wait(wait):
+                        return
+
+                self.queue.put(data)
+                self.bytes_read += len(data)
+                self.frames_read += 1
+                self._rate_bytes += len(data)
+                self._notify()
+        except (OSError, ValueError) as e:
+            self.error = e
+        except Exception as e:
+            print("ReplayReader exception: ", e)
+            traceback.print_exc(file=sys.stdout)
+            self.error = e
+
+        self.finished = True
+        self._wake_pending = False
+        self._notify()
+
+    def _notify(self):
+        if not self._wake_pending:
+            self._wake_pending = True
+            if self.on_data is not None:
+                self.on_data()
+
+    def drain(self, max_items: Optional[int] = None) -> List[bytes]:
+        """
+        Preleva i frame in coda (al massimo max_items).
+
+        Returns:
+            List of raw chunks in recorded order
+        """
+        self._wake_pending = False
+        return self.queue.drain(max_items)
+
+    def is_done(self) -> bool:
+        """The whole capture was played and consumed."""
+        return self.finished and self.queue.empty()
+
+    def get_stats(self) -> Tuple[float, int]:
+        """
+        Returns:
+            Tuple of (replay rate in bytes/s since the last call, queued bytes)
+        """
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        rate = self._rate_bytes / elapsed if elapsed > 0 else 0.0
+
+        self._rate_bytes = 0
+        self._rate_time = now
+
+        return rate, self.queue.bytes
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
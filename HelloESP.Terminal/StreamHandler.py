@@ -4,20 +4,27 @@ import traceback
 from typing import Callable, Optional, List, Tuple
 import time
 import threading
-from queue import Queue
+from queue import Empty
 from concurrent.futures import ThreadPoolExecutor
 
 from generalFunctions import contains_alphanumeric
+from PipelineStats import pipeline
+from RingBuffer import RingBuffer
+from TagScanner import TagScanner
 
 
 class StreamHandler:
-    def __init__(self, default_callback: Optional[Callable] = None):
+    def __init__(self, default_callback: Optional[Callable] = None, binary: bool = False,
+                 encoding: str = 'utf-8'):
         """
         Inizializza il processore di stringhe con buffer temporizzato.
 
         Args:
             default_callback: La funzione di callback predefinita per le stringhe
                             al di fuori dei contesti definiti.
+            binary: Se True il buffer è un bytearray e i tag sono cercati come bytes;
+                    ogni segmento viene decodificato una sola volta, prima della callback.
+            encoding: Encoding usato in modalità binary
         """
 
         def justPrint(out: str) -> None:
@@ -26,11 +33,14 @@ class StreamHandler:
         self.default_callback = default_callback or justPrint
         self.contexts: List[Tuple[str, str, Callable]] = []
         self.current_context: Optional[Tuple[str, Callable]] = None
-        self.buffer = ""
+        self.binary = binary
+        self.encoding = encoding
+        self.buffer = bytearray() if binary else ""
+        self._newline = b'\n' if binary else '\n'
         self.last_input_time = 0
         self.buffer_timeout = 0.2  # 200ms timeout
         self.processing = False
-        self.input_queue = Queue()
+        self.input_queue = RingBuffer.for_stage('stream')
         self._stop_event = threading.Event()
         self._processor_thread = None
         self._executor = ThreadPoolExecutor(max_workers=1)
@@ -40,6 +50,13 @@ class StreamHandler:
 
         self.end_by_start = {}
         self.start_by_end = {}
+        self.callback_by_start = {}
+
+        # Incremental matcher over all start/end tags: _scan_pos is the index of
+        # self.buffer up to which the scanner has already looked
+        self._scanner = TagScanner()
+        self._scan_pos = 0
+        self._tag_by_bytes = {}
 
     def start(self):
         """
@@ -78,6 +95,15 @@ class StreamHandler:
 
         self.end_by_start[start_tag] = end_tag
         self.start_by_end[end_tag] = start_tag
+        self.callback_by_start[start_tag] = callback
+
+        for tag in (start_tag, end_tag):
+            if self.binary:
+                encoded = tag.encode(self.encoding)
+                self._tag_by_bytes[encoded] = tag
+                self._scanner.add(encoded)
+            else:
+                self._scanner.add(tag)
 
     def get_context_by_end(self, _end):
         for context in self.contexts:
@@ -87,156 +113,181 @@ class StreamHandler:
 
         return self.default_callback
 
+    def _decode(self, segment) -> str:
+        """
+        Decode a buffer segment (binary mode); the only decode on the hot path.
+
+        Carriage returns are kept: the terminal uses them to redraw a line
+        (progress bars), the consumers that need plain lines strip them.
+        """
+        if not self.binary:
+            return segment
+        return str(segment, self.encoding, 'replace')
+
+    def _emit(self, segment, callback: Callable) -> None:
+        """
+        Passa alla callback, in una sola chiamata, le righe del segmento che
+        contengono caratteri alfanumerici.
+        """
+        text = self._decode(segment)
+        lines = [line + '\n' for line in text.split('\n') if contains_alphanumeric(line)]
+        if lines:
+            callback(''.join(lines))
+
+    def _current_callback(self) -> Callable:
+        if self.current_context is not None:
+            return self.current_context[1]
+        return self.default_callback
+
+    def _on_tag(self, tag: str, text) -> None:
+        """
+        Gestisce un tag trovato dallo scanner; text è il segmento che lo precede.
+        """
+        if self.current_context is not None and tag == self.current_context[0]:
+            # Fine del contesto corrente
+            self._emit(text, self.current_context[1])
+            self.current_context = None
+        elif tag in self.end_by_start:
+            # Inizio di un contesto (chiude implicitamente quello corrente, se c'è)
+            self._emit(text, self._current_callback())
+            self.current_context = (self.end_by_start[tag], self.callback_by_start[tag])
+        else:
+            # Tag di fine di un contesto mai aperto
+            cbk = self._current_callback() if self.current_context is not None else self.get_context_by_end(tag)
+            self._emit(text, cbk)
+            self.current_context = None
+
     def _process_buffer(self) -> None:
         """
         Processa il buffer internamente, gestendo i contesti e chiamando
         le appropriate callback.
+
+        Only the part of the buffer not scanned yet is fed to the tag scanner;
+        text is consumed up to the last tag or the last complete line, and
+        what is left is at most a partial line (possibly a partial tag).
         """
-        prev_len = len(self.buffer)
-        while len(self.buffer) > 0:
-            try:
-                theres_tag = False
-                if self.current_context is None:
-                    # Cerchiamo il prossimo tag di inizio
-                    for start_tag, end_tag, callback in self.contexts:
-                        remaining_buffer = self.buffer
-
-                        start_pos = self.buffer.find(start_tag)
-                        if start_pos >= 0:
-                            theres_tag = True
-                            res = self.buffer[:start_pos]
-                            if contains_alphanumeric(res):
-                                self.default_callback(res+'\n')
-
-                            self.buffer = self.buffer[start_pos + len(start_tag):]
-                            self.current_context = (end_tag, callback)
-
-                        if end_tag in remaining_buffer:
-                            theres_tag = True
-                            end_pos = self.buffer.find(end_tag)
-
-                            res = self.buffer[:end_pos]
-                            if contains_alphanumeric(res):
-                                callback(res)
-
-                            self.buffer = self.buffer[end_pos + len(end_tag):]
-                            self.current_context = None
-                else:
-                    # Siamo all'interno di un contesto, cerchiamo il tag di fine
-                    end_tag, callback = self.current_context
-                    if end_tag in self.buffer:
-                        theres_tag = True
-
-                        # Troviamo la posizione del tag di fine
-                        end_pos = self.buffer.find(end_tag)
-
-                        # Processiamo il testo nel contesto con la callback appropriata
-                        if end_pos >= 0:
-                            res = self.buffer[:end_pos]
-                            if contains_alphanumeric(res):
-                                callback(res)
-
-                        # Rimuoviamo il testo processato e il tag di fine
-                        self.buffer = self.buffer[end_pos + len(end_tag):]
-                        self.current_context = None
-
-                if not theres_tag:
-                    if '\n' in self.buffer:
-                        spl = self.buffer.split('\n')
-                        self.buffer = spl.pop()
-                        curCtxEndTag, curCtxCbk = self.current_context if self.current_context is not None else (None, None)
-                        cbk = curCtxCbk if self.current_context is not None else self.default_callback
-                        for line in spl:
-                            if contains_alphanumeric(line):
-                                cbk(line+"\n")
-                    else:
-                        break
-            except Exception as e:
-                print(f"_process_buffer error: {e}")
-                print("Exception type : ", type(e).__name__)
-                traceback.print_exc(file=sys.stdout)
-                break
+        buffer = self.buffer
+        # In binary mode segments are memoryview slices: no copy until decode
+        view = memoryview(buffer) if self.binary else buffer
+        consumed = 0
+
+        try:
+            for end, tag in self._scanner.feed(buffer, self._scan_pos):
+                tag_start = max(end - len(tag), consumed)
+                self._on_tag(self._tag_by_bytes.get(tag, tag), view[consumed:tag_start])
+                consumed = end
+
+            # Tags never contain newlines, so complete lines can be emitted right away
+            last_nl = buffer.rfind(self._newline, consumed)
+            if last_nl >= 0:
+                self._emit(view[consumed:last_nl], self._current_callback())
+                consumed = last_nl + 1
+
+        except Exception as e:
+            print(f"_process_buffer error: {e}")
+            print("Exception type : ", type(e).__name__)
+            traceback.print_exc(file=sys.stdout)
+
+        if self.binary:
+            view.release()
+            del buffer[:consumed]
+        else:
+            self.buffer = buffer[consumed:]
+        self._scan_pos = len(self.buffer)
+
+    def _utf8_safe_end(self) -> int:
+        """
+        Length of the buffer prefix that doesn't end inside a UTF-8 multibyte
+        character, so a forced flush never splits one.
+        """
+        buffer = self.buffer
+        n = len(buffer)
+        if not self.binary or self.encoding.replace('-', '').lower() != 'utf8':
+            return n
+
+        for back in range(1, min(4, n) + 1):
+            byte = buffer[n - back]
+            if byte & 0xC0 != 0x80:  # not a continuation byte
+                needed = 2 if byte >> 5 == 0x6 else 3 if byte >> 4 == 0xE else 4 if byte >> 3 == 0x1E else 1
+                return n if needed <= back else n - back
+        return n
+
+    def _take_buffer(self):
+        """Remove and return the whole buffer (up to a safe UTF-8 boundary), decoded."""
+        if self.binary:
+            end = self._utf8_safe_end()
+            text = self._decode(self.buffer[:end])
+            del self.buffer[:end]
+        else:
+            text = self.buffer
+            self.buffer = ''
 
-            if prev_len == len(self.buffer):
-                break
+        self._scanner.reset()
+        self._scan_pos = len(self.buffer)
+        return text
 
     def _flush(self):
+        text = self._take_buffer()
+
         if self.current_context is None:
-            self.default_callback(self.buffer)
+            self.default_callback(text)
         else:
             end_tag, cbk = self.current_context
-            cbk(self.buffer)
-
-        self.buffer = ''
+            cbk(text)
 
     def clear(self):
         self.current_context = None
-        self.buffer = ''
+        self.buffer = bytearray() if self.binary else ''
+        self._scanner.reset()
+        self._scan_pos = 0
 
         while not self.input_queue.empty():
             self.input_queue.get_nowait()
 
+    def _on_buffer_timeout(self):
+        """
+        Nessun nuovo input per buffer_timeout: se la riga parziale rimasta nel
+        buffer è troppo lunga, la forza verso la callback.
+        """
+        if len(self.buffer) > 512:
+            self._flush()
+
     def _process_loop(self):
         """
         Loop principale del thread di processing.
+
+        The thread sleeps on the input queue: it wakes up when a fragment arrives
+        or when the buffer_timeout flush deadline expires, never otherwise.
         """
-        while not self._stop_event.is_set():
-            time.sleep(0.01)
+        flush_armed = False
 
+        while not self._stop_event.is_set():
             try:
-                if self.input_queue.empty():
-                    # Timeout raggiunto, processiamo il buffer
-                    if time.time() - self.last_input_time >= self.buffer_timeout:
-                        self._process_buffer()
-
-                        if len(self.buffer) > 512:
-                            self._flush()
-
-                        self.last_input_time = time.time()
+                timeout = None
+                if flush_armed and self.buffer:
+                    timeout = max(0.0, self.last_input_time + self.buffer_timeout - time.monotonic())
+
+                try:
+                    input_data = self.input_queue.get(timeout=timeout)
+                except Empty:
+                    # Flush deadline expired without new input
+                    flush_armed = False
+                    self._on_buffer_timeout()
                     continue
 
-                # Attendiamo nuovo input o timeout
-                while not self.input_queue.empty():
-                    input_data = self.input_queue.get(timeout=self.buffer_timeout)
-                    if input_data is None:  # Segnale di stop
+                for data in [input_data] + self.input_queue.drain():
+                    if data is None:  # Segnale di stop
                         continue
-                    self.buffer += input_data
-
-                def check_to_process():
-                    toProcess = False
-                    afterProcess = ""
-                    if self.current_context is None:
-                        for tag in self._end_tags:
-                            if tag in self.buffer:
-                                spl = self.buffer.split(tag)
-                                toProcess = True
-                                self.buffer = spl[0] + tag
-                                if len(spl) > 1:
-                                    afterProcess = tag.join(spl[1:])
-                                break
-                    else:
-                        for tag in self._start_tags:
-                            if tag in self.buffer:
-                                spl = self.buffer.split(tag)
-                                toProcess = True
-                                self.buffer = spl[0]
-                                afterProcess = tag
-                                if len(spl) > 1:
-                                    afterProcess += tag.join(spl[1:])
-                                break
-
-                    if toProcess:
-                        self._process_buffer()
-                        self.buffer += afterProcess
-
-                    return toProcess
-
-                update_last_time = False
-                while check_to_process():
-                    update_last_time = True
-
-                if update_last_time:
-                    self.last_input_time = time.time()
+                    self.buffer += data
+
+                self.last_input_time = time.monotonic()
+                flush_armed = True
+
+                if pipeline.enabled:
+                    self._process_buffer()
+                    pipeline.stage('stream:parse').record_work(time.monotonic() - self.last_input_time)
+                else:
+                    self._process_buffer()
 
             except Exception as e:
                 print(f"Errore nel thread di processing: {e}")
@@ -267,7 +318,9 @@ class StreamHandler:
         if self._processor_thread is None:
             self.start()
 
-        input_string = input_string.replace('\r', '')
+        if self.binary:
+            self.input_queue.put(input_string.encode(self.encoding))
+            return
 
         # Ignore end context of un-opened context
         if self.current_context is None and False: # useless (and stupid) operation
@@ -283,6 +336,21 @@ class StreamHandler:
 
         self.input_queue.put(input_string)
 
+    def process_bytes(self, data: bytes) -> None:
+        """
+        Processa dati grezzi (es. letti dalla seriale) senza decodificarli.
+
+        Args:
+            data: I bytes da processare
+        """
+        if self._processor_thread is None:
+            self.start()
+
+        if not self.binary:
+            data = data.decode(self.encoding, errors='replace')
+
+        self.input_queue.put(data)
+
     async def process_string_async(self, input_string: str) -> None:
         """
         Processa una stringa in input in modo asincrono.
@@ -296,8 +364,8 @@ class StreamHandler:
         # Usiamo ThreadPoolExecutor per non bloccare l'event loop
         await asyncio.get_event_loop().run_in_executor(
             self._executor,
-            self.input_queue.put,
-            input_string.replace('\r', '')
+            self.process_string,
+            input_string
         )
 
     def flush(self) -> None:
@@ -305,8 +373,7 @@ class StreamHandler:
         Forza il processing del buffer rimanente con la callback di default.
         """
         if self.buffer:
-            self.default_callback(self.buffer)
-            self.buffer = ""
+            self.default_callback(self._take_buffer())
             self.current_context = None
 
     def __del__(self):
@@ -318,86 +385,3 @@ class StreamHandler:
 
     def exit_context(self):
         self.current_context = None
-
-# Esempio di utilizzo sincrono
-def example_sync():
-    def default_handler(text: str) -> None:
-        print(f"Default: {text}")
-
-    def task_monitor_handler(text: str) -> None:
-        print(f"Task Monitor: {text}")
-
-    # Creazione e configurazione del processore
-    processor = StreamHandler(default_handler)
-    processor.add_context("!!TASKMONITOR!!", "!!TASKMONITOREND!!", task_monitor_handler)
-
-    # Test del processore con input frammentato
-    test_input_parts = [
-        "Questo è un testo normale.\n!!TASK",
-        "MONITOR!!\nQuesto è un task da ",
-        "monitorare\ncon più righe\n!!TASKMONITOR",
-        "END!!\nE questo è di nuovo testo normale."
-    ]
-
-    try:
-        for part in test_input_parts:
-            processor.process_string(part)
-            time.sleep(0.1)  # Simuliamo un ritardo tra i frammenti
-    finally:
-        processor.stop()
-
-
-# Esempio di utilizzo sincrono
-def example_sync():
-    def default_handler(text: str) -> None:
-        print(f"Default: {text}")
-
-    def task_monitor_handler(text: str) -> None:
-        print(f"Task Monitor: {text}")
-
-    # Creazione e configurazione del processore
-    processor = StreamHandler(default_handler)
-    processor.add_context("!!TASKMONITOR!!", "!!TASKMONITOREND!!", task_monitor_handler)
-
-    # Test del processore con input frammentato
-    test_input_parts = [
-        "Questo è un testo normale.\n!!TASK",
-        "MONITOR!!\nQuesto è un task da ",
-        "monitorare\ncon più righe\n!!TASKMONITOR",
-        "END!!\nE questo è di nuovo testo normale."
-    ]
-
-    try:
-        for part in test_input_parts:
-            processor.process_string(part)
-            time.sleep(0.1)  # Simuliamo un ritardo tra i frammenti
-    finally:
-        processor.stop()
-
-
-# Esempio di utilizzo asincrono
-async def example_async():
-    def default_handler(text: str) -> None:
-        print(f"Default: {text}")
-
-    def task_monitor_handler(text: str) -> None:
-        print(f"Task Monitor: {text}")
-
-    # Creazione e configurazione del processore
-    processor = StreamHandler(default_handler)
-    processor.add_context("!!TASKMONITOR!!", "!!TASKMONITOREND!!", task_monitor_handler)
-
-    # Test del processore con input frammentato
-    test_input_parts = [
-        "Questo è un testo normale.\n!!TASK",
-        "MONITOR!!\nQuesto è un task da ",
-        "monitorare\ncon più righe\n!!TASKMONITOR",
-        "END!!\nE questo è di nuovo testo normale."
-    ]
-
-    try:
-        for part in test_input_parts:
-            await processor.process_string_async(part)
-            await asyncio.sleep(0.1)  # Simuliamo un ritardo tra i frammenti
-    finally:
-        processor.stop()
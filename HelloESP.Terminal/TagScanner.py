@@ -0,0 +1,122 @@
+import re
+from collections import deque
+from typing import Iterable, List, Tuple, Union
+
+Tag = Union[str, bytes]
+
+
+class TagScanner:
+    """
+    Streaming multi-pattern matcher (Aho–Corasick) over a set of tags.
+
+    The automaton state is kept between calls to feed(), so a tag split across
+    two fragments is still found, and every symbol is examined once: the cost
+    per fragment doesn't depend on how many tags are registered.
+    Tags and fed text must be of the same type (all str or all bytes).
+    """
+
+    def __init__(self, tags: Iterable[Tag] = ()):
+        self._tags: List[Tag] = []
+        self._goto = None
+        self._fail = None
+        self._out = None
+        self._first = None
+        self.state = 0
+
+        for tag in tags:
+            self.add(tag)
+
+    def add(self, tag: Tag) -> None:
+        """
+        Aggiunge un tag; l'automa viene ricostruito al prossimo feed().
+        """
+        if tag and tag not in self._tags:
+            self._tags.append(tag)
+            self._goto = None
+            self.state = 0
+
+    def reset(self) -> None:
+        """Forget any partial match carried over from previous fragments."""
+        self.state = 0
+
+    def _build(self) -> None:
+        goto = [{}]
+        out = [()]
+
+        for tag in self._tags:
+            state = 0
+            for sym in tag:
+                nxt = goto[state].get(sym)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][sym] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (tag,)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for sym, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and sym not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(sym, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        # From the root state, jump straight to the next symbol that can start a tag
+        first = sorted(set(goto[0].keys()))
+        if self._tags and isinstance(self._tags[0], bytes):
+            self._first = re.compile(b'[' + b''.join(re.escape(bytes([c])) for c in first) + b']')
+        else:
+            self._first = re.compile('[' + ''.join(re.escape(c) for c in first) + ']')
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def feed(self, text: Tag, start: int = 0) -> List[Tuple[int, Tag]]:
+        """
+        Scansiona text[start:] proseguendo dallo stato del frammento precedente.
+
+        Args:
+            text: Fragment to scan
+            start: Index of the first symbol not scanned yet
+
+        Returns:
+            List of (end, tag) in order of occurrence, where end is the index
+            after the last symbol of the tag; end - len(tag) may be lower than
+            start if the tag began in an earlier fragment.
+        """
+        if not self._tags:
+            return []
+        if self._goto is None:
+            self._build()
+
+        goto, fail, out, first = self._goto, self._fail, self._out, self._first
+        state = self.state
+        matches = []
+        i = start
+        n = len(text)
+
+        while i < n:
+            if state == 0:
+                m = first.search(text, i)
+                if m is None:
+                    break
+                i = m.start()
+
+            sym = text[i]
+            while state and sym not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(sym, 0)
+
+            i += 1
+            for tag in out[state]:
+                matches.append((i, tag))
+
+        self.state = state
+        return matches
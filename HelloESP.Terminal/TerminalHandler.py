@@ -1,24 +1,68 @@
 import gc
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Aggiungi la directory corrente al path
 sys.path.append(str(Path(__file__).parent))
 
+import bisect
 import re
 from array import array
 
 from gi.repository import Gtk, Gdk, Pango
-from gi.repository import GObject
+from gi.repository import GObject, GLib
 from generalFunctions import *
+from PipelineStats import pipeline
+from RingBuffer import RingBuffer
+from ScrollbackStore import ScrollbackStore
+from SearchIndex import SearchIndex, SearchWorker, compile_query
+from SessionExport import export_session, format_from_filename
+from AnsiParser import AnsiParser, OP_TEXT, OP_CR, OP_BACKSPACE, OP_ERASE_LINE, intern_tagset, tagset
 from gtkComponents.SmartFileChooserDialog import SmartFileChooserDialog
 
+_HTML_HEADER = """<!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {
+                background-color: #2E3436;
+                color: #FFFFFF;
+                font-family: monospace;
+                font-weight: bold;
+                font-size: 12pt;
+                white-space: pre-wrap;
+                line-height: 1.2;
+                margin: 20px;
+            }
+            .search-highlight {
+                background-color: #FFE066;
+                color: #000000;
+            }
+            .current-match {
+                background-color: #FF9933;
+                color: #000000;
+            }
+        </style>
+    </head>
+    <body>"""
+
+
 class TerminalHandler:
-    def __init__(self, max_lines=10000):
+    def __init__(self, max_lines=10000, name='terminal', scrollback=True):
         # Terminal setup
-        self.max_lines = max_lines  # Maximum number of lines to keep
+        self.name = name
+        self.max_lines = max_lines  # Lines kept in the filter view (and in the TextBuffer without a scrollback)
         self.tag_table = Gtk.TextTagTable()
         self.terminal_buffer = Gtk.TextBuffer(tag_table=self.tag_table)
+
+        # Running size of the buffer, kept up to date on every insert/delete
+        self.buffer_chars = 0
+        self.buffer_bytes = 0
+        self.terminal_buffer.connect('insert-text', self._on_buffer_insert)
+        self.terminal_buffer.connect('delete-range', self._on_buffer_delete)
         self.terminal = Gtk.TextView(buffer=self.terminal_buffer)
         self.scrollDown = True
 
@@ -89,11 +133,45 @@ class TerminalHandler:
 
         # Keep reference to the adjustment
         self.vadj = self.scrolled_window.get_vadjustment()
+        self.vadj.connect('value-changed', self._on_scroll_changed)
+
+        # Virtual scrollback: the whole session is on disk, the TextBuffer holds a window of it,
+        # the lines on screen plus page_lines before and after them
+        self.scrollback = ScrollbackStore() if scrollback else None
+        self.view_start = 0  # Scrollback line shown on the first line of the TextBuffer
+        self.following = True  # The window ends with the live tail, new text is rendered
+        self.page_lines = 500  # Lines loaded at once when scrolling past the window
+        self.paging_pending = False
+
+        # Search over the whole scrollback (or the TextBuffer lines without one)
+        self.search_index = SearchIndex(self._read_lines_text)
+        self.search_worker = SearchWorker(self._post_search_results)
+        self.search_budget = 0.004  # Max main loop time per search step (s), without a scrollback
+        self.search_debounce = 150  # Delay between the last keystroke and the search (ms)
+        self.export_thread = None
+        self.session_log = None  # SessionLog of the raw bytes received, set by the owner
+
+        # Filter view: only the lines matching the search, from the scrollback and then live
+        self.filter_buffer = Gtk.TextBuffer(tag_table=self.tag_table)
+        self.filter_active = False
+        self.filter_lines = 0  # Matching lines found so far
+        self.filter_upto = 0  # Lines of the session already filtered
+        self.filter_state = None
+        self.filter_button.set_sensitive(self.scrollback is not None)
 
         # Rest of the initialization
-        self.pending_updates = []
+        # Edit operations (AnsiParser OP_* tuples) waiting to be rendered
+        self.pending_updates = RingBuffer.for_stage('render', name=f'render:{name}',
+                                                    size_of=lambda op: len(op[1]) if op[0] == OP_TEXT else 0,
+                                                    is_priority=self._is_priority_update,
+                                                    summarize=self._summarize_updates)
         self.update_pending = False
-        self.ansi_pattern = re.compile(r'(?:\\x1b|\x1b)\[([0-9;]*)m')
+        self.scroll_pending = False
+        self.render_budget = 0.008  # Max main loop time per batch (s), keeps the UI above 60 fps
+        self.render_batch_items = 256
+        self.ansi_parser = AnsiParser()
+        self.tagset_tags = {}  # tagset_id -> tuple of Gtk.TextTag
+        self.cr_pending = False  # A carriage return moved the cursor to the start of the last line
 
         # ANSI color definitions (standard colors)
         self.colors = {
@@ -118,9 +196,15 @@ class TerminalHandler:
         self._init_tags()
 
     def setup_search(self):
-        # Search state
-        self.search_highlights = []
+        # Search state: matches as (line, start column, end column), line numbers of the scrollback
+        self.search_matches = []
         self.current_match_index = -1
+        self.search_job = None  # Generator of the search run in the main loop (no scrollback)
+        self.search_generation = 0  # Results of older searches are discarded
+        self.search_running = False
+        self.search_timeout_id = None
+        self.search_pattern = None
+        self.highlight_pending = False
 
         # Create search bar components
         self.search_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
@@ -139,8 +223,21 @@ class TerminalHandler:
         close_button = Gtk.Button.new_from_icon_name('window-close-symbolic', Gtk.IconSize.BUTTON)
         close_button.connect('clicked', self.hide_search)
 
+        # Search modes
+        self.case_button = self._search_toggle("Aa", "Match case")
+        self.word_button = self._search_toggle("W", "Whole words")
+        self.regex_button = self._search_toggle(".*", "Regular expression")
+        self.filter_button = self._search_toggle("Filter", "Show only the matching lines (tag:NAME filters by ESP-IDF tag)")
+
+        # "match i of N" counter
+        self.match_label = Gtk.Label(label="")
+        self.match_label.set_width_chars(16)
+
         # Pack search components
         self.search_box.pack_start(self.search_entry, False, True, 0)
+        for button in (self.case_button, self.word_button, self.regex_button, self.filter_button):
+            self.search_box.pack_start(button, False, True, 0)
+        self.search_box.pack_start(self.match_label, False, True, 0)
         self.search_box.pack_start(close_button, False, True, 0)
         self.search_box.hide()  # Hide by default
 
@@ -160,13 +257,15 @@ class TerminalHandler:
         self.terminal.connect('key-press-event', self.on_key_press)
 
     def check_line_limit(self):
-        """Check if the buffer exceeds the maximum line limit and remove oldest lines if necessary"""
+        """Check if the buffer exceeds its line limit and remove oldest lines if necessary"""
         buffer = self.terminal_buffer
         line_count = buffer.get_line_count()
+        # With a scrollback the removed lines are paged in again when scrolling back
+        limit = self._window_lines() if self.scrollback is not None else self.max_lines
 
-        if line_count > self.max_lines:
+        if line_count > limit:
             # Calculate how many lines to remove
-            lines_to_remove = line_count - self.max_lines
+            lines_to_remove = line_count - limit
 
             # Get iterator for the start of the buffer
             start_iter = buffer.get_start_iter()
@@ -182,9 +281,12 @@ class TerminalHandler:
 
             # Delete the excess lines
             buffer.delete(start_iter, end_iter)
+            self._lines_removed(lines_to_remove)
 
             # Force the TextView to re-render
             def refresh_view():
+                if self.filter_active:
+                    return False  # The view shows the filter buffer
                 # Force a redraw by temporarily changing the buffer
                 temp_mark = buffer.create_mark(None, buffer.get_start_iter(), True)
                 self.terminal.scroll_mark_onscreen(temp_mark)
@@ -219,108 +321,415 @@ class TerminalHandler:
         # Force a redraw of the TextView
         self.terminal.queue_draw()
 
-    def get_buffer_memory_size(self):
-        """
-        Calculate approximate memory usage of the text buffer in bytes.
-        This includes text content and tags.
-        """
-        start_iter = self.terminal_buffer.get_start_iter()
-        end_iter = self.terminal_buffer.get_end_iter()
-        text = self.terminal_buffer.get_text(start_iter, end_iter, True)
+    def _on_buffer_insert(self, buffer, location, text, length):
+        """insert-text handler: length is the size in bytes of the inserted text"""
+        self.buffer_chars += len(text)
+        self.buffer_bytes += length
+
+    def _on_buffer_delete(self, buffer, start, end):
+        """delete-range handler: runs before the deletion, while the iterators are valid"""
+        chars = end.get_offset() - start.get_offset()
+        if chars <= 0:
+            return
 
-        # Base size of text
-        memory_size = sys.getsizeof(text)
+        if chars >= self.buffer_chars:
+            self.buffer_chars = 0
+            self.buffer_bytes = 0
+            return
 
-        # Add approximate size of tags (this is an estimation)
-        memory_size += sys.getsizeof(self.tag_table.get_size())
+        # Bytes of the removed range, estimated with the average bytes per char
+        removed_bytes = chars * self.buffer_bytes // self.buffer_chars
+        self.buffer_chars -= chars
+        self.buffer_bytes -= removed_bytes
 
-        return memory_size
+    def get_buffer_memory_size(self):
+        """
+        Approximate memory usage of the text buffer in bytes.
+        O(1): uses the counters maintained by the insert/delete signal handlers.
+        """
+        return self.buffer_bytes
 
     def trim_buffer_by_memory(self, max_memory_bytes= 128 * 1024 * 1024):  # 128MB default
         """
         Trims the text buffer to keep memory usage below specified limit.
+        Whole oldest lines are removed with a single delete, down to 75% of the limit.
 
         Args:
             max_memory_bytes (int): Maximum memory usage allowed in bytes
         """
-        buffer_size = self.get_buffer_memory_size()
-
-        if buffer_size > max_memory_bytes:
-            # Calculate how much we need to remove (aim to get to 75% of max)
-            target_size = int(max_memory_bytes * 0.75)
+        if self.buffer_bytes <= max_memory_bytes or self.buffer_chars == 0:
+            return
 
-            start_iter = self.terminal_buffer.get_start_iter()
-            end_iter = self.terminal_buffer.get_end_iter()
-            total_size = buffer_size
+        target_bytes = int(max_memory_bytes * 0.75)
+        bytes_per_char = self.buffer_bytes / self.buffer_chars
+        chars_to_remove = self.buffer_chars - int(target_bytes / bytes_per_char)
 
-            # Binary search to find approximately how much text to remove
-            while total_size > target_size:
-                mid_point = total_size // 2
-                mid_iter = self.terminal_buffer.get_iter_at_offset(mid_point)
+        buffer = self.terminal_buffer
+        end_iter = buffer.get_iter_at_offset(chars_to_remove)
+        if not end_iter.starts_line():
+            end_iter.forward_line()
 
-                # Delete first half
-                self.terminal_buffer.delete(start_iter, mid_iter)
+        lines_removed = end_iter.get_line()
+        buffer.delete(buffer.get_start_iter(), end_iter)
+        self._lines_removed(lines_removed)
 
-                # Recalculate size
-                start_iter = self.terminal_buffer.get_start_iter()
-                end_iter = self.terminal_buffer.get_end_iter()
-                total_size = self.get_buffer_memory_size()
+        # Force garbage collection after large deletion
+        gc.collect()
 
-            # Force garbage collection after large deletion
-            gc.collect()
+    @staticmethod
+    def _is_priority_update(op):
+        """Control operations and red segments (errors) are kept when the render queue overflows"""
+        if op[0] != OP_TEXT:
+            return True
+        tags = tagset(op[2])
+        return 'fg_1' in tags or 'fg_9' in tags
+
+    @staticmethod
+    def _summarize_updates(items, size):
+        return OP_TEXT, f"[{items} segments suppressed ({size} bytes)]\n", intern_tagset({'fg_3'})
+
+    @staticmethod
+    def _coalesce_updates(ops):
+        """Merge adjacent text operations with the same tag set into a single run"""
+        runs = []
+        for op in ops:
+            if op[0] == OP_TEXT and runs and runs[-1][0] == OP_TEXT and runs[-1][2] == op[2]:
+                runs[-1][1].append(op[1])
+            elif op[0] == OP_TEXT:
+                runs.append([OP_TEXT, [op[1]], op[2]])
+            else:
+                runs.append(op)
+        return [(OP_TEXT, ''.join(run[1]), run[2]) if run[0] == OP_TEXT else run for run in runs]
 
-    def _process_updates(self):
-        """Process pending text updates in the main loop"""
-        if not self.pending_updates:
-            self.update_pending = False
-            return False
+    def _line_start_iter(self):
+        """Iterator at the start of the last line of the buffer"""
+        line_start = self.terminal_buffer.get_end_iter()
+        line_start.set_line_offset(0)
+        return line_start
 
-        try:
-            while len(self.pending_updates):
-                text, tags = self.pending_updates.pop(0)
+    def _erase_last_line(self):
+        buffer = self.terminal_buffer
+        buffer.delete(self._line_start_iter(), buffer.get_end_iter())
 
-                end_iter = self.terminal_buffer.get_end_iter()
-                mark = self.terminal_buffer.create_mark(None, end_iter, left_gravity=True)
+    def _apply_op(self, op):
+        """Apply one edit operation at the end of the buffer (the cursor)"""
+        buffer = self.terminal_buffer
+        kind = op[0]
+
+        if kind == OP_TEXT:
+            text, tagset_id = op[1], op[2]
+            if self.cr_pending:
+                self.cr_pending = False
+                if not text.startswith('\n'):
+                    # Text after a bare CR overwrites the line (progress bars)
+                    self._erase_last_line()
+
+            end_iter = buffer.get_end_iter()
+            if tagset_id:
+                buffer.insert_with_tags(end_iter, text, *self._get_tagset_tags(tagset_id))
+            else:
+                buffer.insert(end_iter, text)
+        elif kind == OP_CR:
+            self.cr_pending = True
+        elif kind == OP_BACKSPACE:
+            end_iter = buffer.get_end_iter()
+            start_iter = end_iter.copy()
+            start_iter.backward_chars(min(op[1], end_iter.get_line_offset()))
+            buffer.delete(start_iter, end_iter)
+        elif kind == OP_ERASE_LINE:
+            # The cursor is at the end of the line, or at its start after a CR
+            mode = op[1]
+            if mode == 2 or (mode == 0 and self.cr_pending) or (mode == 1 and not self.cr_pending):
+                self._erase_last_line()
+
+    def _scroll_to_end(self):
+        """Scroll to the bottom once per batch (coalesced in a single idle callback)"""
+        adj = self.vadj
+        if not adj or not self.scrollDown or self.scroll_pending:
+            return
 
-                self.terminal_buffer.insert(end_iter, text)
+        def scroll():
+            self.scroll_pending = False
+            adj.set_value(adj.get_upper() - adj.get_page_size())
+            return False
 
-                if tags:
-                    insert_iter = self.terminal_buffer.get_iter_at_mark(mark)
-                    end_iter = self.terminal_buffer.get_end_iter()
-                    for tag_name in tags:
-                        tag = self.tag_table.lookup(tag_name)
-                        if tag:
-                            self.terminal_buffer.apply_tag(tag, insert_iter, end_iter)
+        self.scroll_pending = True
+        GObject.idle_add(scroll, priority=GObject.PRIORITY_LOW)
 
-                self.terminal_buffer.delete_mark(mark)
+    def _process_updates(self):
+        """
+        Process pending text updates in the main loop.
+
+        Edit operations are drained in batches, adjacent text is merged by tag
+        set and everything is applied in a single user action; line/memory
+        limits and scrolling run once per batch. When render_budget is
+        exhausted the callback stays scheduled and the rest is rendered in the
+        next main loop iteration, after GTK had a chance to handle input and
+        redraw. Every operation goes to the scrollback; the TextBuffer is
+        edited only while the view follows the live tail.
+        """
+        buffer = self.terminal_buffer
+        started = time.monotonic()
+        deadline = started + self.render_budget
+        inserted = False
+        rendered = 0
 
-                # Check line limit after each update
+        try:
+            buffer.begin_user_action()
+            try:
+                while time.monotonic() < deadline:
+                    updates = self.pending_updates.drain(max_items=self.render_batch_items)
+                    if not updates:
+                        break
+
+                    for op in self._coalesce_updates(updates):
+                        if self.scrollback is not None:
+                            self.scrollback.apply_op(op)
+                        if self.following:
+                            self._apply_op(op)
+                    inserted = True
+                    rendered += len(updates)
+            finally:
+                buffer.end_user_action()
+
+            if self.scrollback is not None:
+                self.scrollback.flush()
+
+            if inserted and self.following:
                 if self.check_line_limit():
                     self.scrollDown = self.do_scroll_down
-                    pass
 
                 self.trim_buffer_by_memory()
+                self._sync_view_start()
+                if not self.filter_active:
+                    self._scroll_to_end()
 
-                adj = self.vadj
-                if adj and self.scrollDown:
-                    GObject.idle_add(
-                        lambda: adj.set_value(adj.get_upper() - adj.get_page_size()),
-                        priority=GObject.PRIORITY_LOW
-                    )
+            if inserted:
+                self.search_index.update(self._completed_lines())
+                if self.filter_active and not self.search_running:
+                    self._filter_new_lines()
 
         except Exception as e:
             print(f"Error processing updates: {e}")
             print("Exception type : ", type(e).__name__)
             traceback.print_exc(file=sys.stdout)
 
+        if rendered and pipeline.enabled:
+            # TextBuffer insert, scrollback and index of one batch
+            pipeline.stage(f'insert:{self.name}').record_work(time.monotonic() - started, items=rendered)
+
+        if not self.pending_updates.empty():
+            return True  # Budget exhausted, continue in the next iteration
+
         self.update_pending = False
         return False
 
+    ###
+    ### Virtual scrollback
+    ###
+
+    def _viewport_lines(self):
+        """Lines of text that fit in the viewport (wrapped lines take more, so it's an upper bound)"""
+        metrics = self.terminal.get_pango_context().get_metrics(None, None)
+        line_height = (metrics.get_ascent() + metrics.get_descent()) / Pango.SCALE
+        return int(self.vadj.get_page_size() / max(line_height, 1)) + 1
+
+    def _window_lines(self):
+        """Lines kept in the TextBuffer: the viewport plus a page of scrollback above and below it"""
+        return self._viewport_lines() + 2 * self.page_lines
+
+    def _sync_view_start(self):
+        """While following, the TextBuffer holds the last completed lines plus the line being written"""
+        if self.scrollback is not None:
+            self.view_start = max(0, len(self.scrollback) - (self.terminal_buffer.get_line_count() - 1))
+
+    def _lines_removed(self, count):
+        """Lines deleted from the top of the TextBuffer: without a scrollback they are gone for good"""
+        if self.scrollback is None:
+            self.view_start += count
+            self.search_index.trim(self.view_start)
+
+    def _completed_lines(self):
+        """Number of completed lines of the session (the last one being written isn't counted)"""
+        if self.scrollback is not None:
+            return len(self.scrollback)
+        return self.view_start + self.terminal_buffer.get_line_count() - 1
+
+    def _read_lines_text(self, start, end):
+        """Plain text of the session lines [start, end), each terminated by a newline"""
+        if self.scrollback is not None:
+            return self.scrollback.get_text(start, end)
+
+        buffer = self.terminal_buffer
+        start_iter = buffer.get_iter_at_line(start - self.view_start)
+        end_iter = buffer.get_iter_at_line(end - self.view_start)
+        return buffer.get_text(start_iter, end_iter, False)
+
+    def _current_line_text(self):
+        if self.scrollback is not None:
+            return self.scrollback.get_current()[0]
+        buffer = self.terminal_buffer
+        return buffer.get_text(self._line_start_iter(), buffer.get_end_iter(), False)
+
+    def _insert_lines(self, position, lines, newline_after):
+        """Insert stored (text, runs) lines at position: a single insert, then one apply_tag per styled run"""
+        buffer = position.get_buffer()
+        offset = position.get_offset()
+        buffer.insert(position, '\n'.join(line for line, _ in lines) + ('\n' if newline_after else ''))
+
+        for line, runs in lines:
+            for i, (start, tagset_id) in enumerate(runs):
+                if tagset_id:
+                    end = runs[i + 1][0] if i + 1 < len(runs) else len(line)
+                    start_iter = buffer.get_iter_at_offset(offset + start)
+                    end_iter = buffer.get_iter_at_offset(offset + end)
+                    for tag in self._get_tagset_tags(tagset_id):
+                        buffer.apply_tag(tag, start_iter, end_iter)
+            offset += len(line) + 1
+
+    def _on_scroll_changed(self, adj):
+        """Load older/newer lines from the scrollback when the view reaches an edge of the window"""
+        if self.filter_active:
+            return  # The view shows the filter buffer
+
+        if self.search_matches:
+            self._schedule_highlight()
+
+        if self.scrollback is None or self.paging_pending:
+            return
+
+        value = adj.get_value()
+        page_size = adj.get_page_size()
+        near_top = value <= page_size and self.view_start > 0
+        near_bottom = not self.following and value + 2 * page_size >= adj.get_upper()
+
+        if near_top or near_bottom:
+            self.paging_pending = True
+            GObject.idle_add(self._page_view, near_top)
+
+    def _page_view(self, backward):
+        buffer = self.terminal_buffer
+        try:
+            # Keep the line at the top of the viewport in place while lines come and go
+            top_iter, _ = self.terminal.get_line_at_y(int(self.vadj.get_value()))
+            anchor = buffer.create_mark(None, top_iter, True)
+
+            buffer.begin_user_action()
+            try:
+                if backward:
+                    self._page_backward()
+                else:
+                    self._page_forward()
+            finally:
+                buffer.end_user_action()
+
+            self.terminal.scroll_to_mark(anchor, 0.0, True, 0.0, 0.0)
+            buffer.delete_mark(anchor)
+        except Exception as e:
+            print(f"Error paging scrollback: {e}")
+            traceback.print_exc(file=sys.stdout)
+
+        self.paging_pending = False
+        return False
+
+    def _page_backward(self):
+        """Load the page before the window; lines past the window size are dropped from the bottom"""
+        buffer = self.terminal_buffer
+        start = max(0, self.view_start - self.page_lines)
+        lines = self.scrollback.get_lines(start, self.view_start)
+        if not lines:
+            return
+
+        self._insert_lines(buffer.get_start_iter(), lines, newline_after=True)
+        self.view_start = start
+
+        excess = buffer.get_line_count() - self._window_lines()
+        if excess > 0:
+            # Detach from the live tail: the buffer now ends with a completed line, without newline
+            cut = buffer.get_iter_at_line(buffer.get_line_count() - excess)
+            cut.backward_char()
+            buffer.delete(cut, buffer.get_end_iter())
+            self.following = False
+            self.cr_pending = False
+
+    def _page_forward(self):
+        """Load the page after the window (detached view); reaching the tail follows it again"""
+        buffer = self.terminal_buffer
+        view_end = self.view_start + buffer.get_line_count()
+        total = len(self.scrollback)
+        end = min(total, view_end + self.page_lines)
+        lines = self.scrollback.get_lines(view_end, end)
+
+        if end >= total:
+            lines.append(self.scrollback.get_current())
+            self.cr_pending = self.scrollback.cr_pending
+            self.following = True
+
+        if lines:
+            end_iter = buffer.get_end_iter()
+            buffer.insert(end_iter, '\n')
+            self._insert_lines(end_iter, lines, newline_after=False)
+
+        excess = buffer.get_line_count() - self._window_lines()
+        if excess > 0:
+            buffer.delete(buffer.get_start_iter(), buffer.get_iter_at_line(excess))
+            self.view_start += excess
+
+    def _load_window(self, start):
+        """Replace the TextBuffer content with the scrollback lines from start (follows the tail if reached)"""
+        buffer = self.terminal_buffer
+        total = len(self.scrollback)
+        end = min(total, start + self._window_lines())
+        lines = self.scrollback.get_lines(start, end)
+
+        self.following = end >= total
+        if self.following:
+            lines.append(self.scrollback.get_current())
+            self.cr_pending = self.scrollback.cr_pending
+        else:
+            self.cr_pending = False
+
+        buffer.begin_user_action()
+        try:
+            buffer.delete(buffer.get_start_iter(), buffer.get_end_iter())
+            self._insert_lines(buffer.get_start_iter(), lines, newline_after=False)
+        finally:
+            buffer.end_user_action()
+        self.view_start = start
+
+    def scroll_to_tail(self):
+        """Show the live tail again (reloads the last window if the view was detached)"""
+        self.scrollDown = True
+        if self.scrollback is not None and not self.following and not self.filter_active:
+            self._load_window(max(0, len(self.scrollback) - (self._window_lines() - 1)))
+        self._scroll_to_end()
+
+    def clear(self):
+        """Clear the terminal and forget the scrollback"""
+        self.pending_updates.clear()
+        self.cancel_search()
+        self.terminal_buffer.set_text("")
+        self.search_matches = []
+        self.current_match_index = -1
+        self.search_index.clear()
+        if self.scrollback is not None:
+            self.scrollback.clear()
+        if self.filter_active:
+            self.filter_buffer.set_text("")
+            self.filter_lines = 0
+            self.filter_upto = 0
+        self.view_start = 0
+        self.following = True
+        self.cr_pending = False
+
     def on_key_press(self, widget, event):
         if event.state & Gdk.ModifierType.CONTROL_MASK or event.state & Gdk.ModifierType.META_MASK:
             if event.keyval == Gdk.KEY_f:
                 self.show_search()
                 return True
+            if event.keyval == Gdk.KEY_End:
+                self.scroll_to_tail()
+                return True
         elif event.keyval == Gdk.KEY_Escape:
             self.hide_search()
             return True
@@ -332,40 +741,319 @@ class TerminalHandler:
 
     def hide_search(self, *args):
         self.search_box.hide()
+        self.cancel_search()
+        self._stop_filter()
         self.clear_highlights()
         self.terminal.grab_focus()
 
+    def _search_toggle(self, label, tooltip):
+        button = Gtk.ToggleButton(label=label)
+        button.set_tooltip_text(tooltip)
+        button.connect('toggled', lambda *args: self.on_search_changed(self.search_entry))
+        return button
+
     def clear_highlights(self):
         buffer = self.terminal_buffer
         start = buffer.get_start_iter()
         end = buffer.get_end_iter()
         buffer.remove_tag(self.search_tag, start, end)
         buffer.remove_tag(self.current_match_tag, start, end)
-        self.search_highlights = []
+        self.search_matches = []
         self.current_match_index = -1
 
     def on_search_changed(self, entry):
+        """Debounce: the search starts search_debounce ms after the last keystroke"""
+        self.cancel_search()
+        self.search_timeout_id = GLib.timeout_add(self.search_debounce, self._on_search_timeout, entry.get_text())
+
+    def _on_search_timeout(self, query):
+        self.search_timeout_id = None
+        self.start_search(query)
+        return False
+
+    def start_search(self, query):
+        """
+        Start a search of query over the whole session.
+
+        With a scrollback the search runs in a worker thread and the matches
+        are streamed back to the main loop in small batches; otherwise it runs
+        in the main loop in steps of at most search_budget seconds. Only the
+        matches on screen get the highlight tag.
+        """
+        self.cancel_search()
         self.clear_highlights()
-        search_text = entry.get_text()
+        self.search_pattern = None
 
-        if not search_text:
+        if query:
+            try:
+                self.search_pattern, literal = compile_query(query,
+                                                             regex=self.regex_button.get_active(),
+                                                             whole_word=self.word_button.get_active(),
+                                                             case_sensitive=self.case_button.get_active())
+            except re.error:
+                self._stop_filter()
+                self.match_label.set_text("Invalid pattern")
+                return
+
+        if self.search_pattern is None or not self.filter_button.get_active():
+            self._stop_filter()
+        if self.search_pattern is None:
+            self._update_match_label()
             return
 
-        buffer = self.terminal_buffer
-        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
+        self.search_index.update(self._completed_lines())
+        self.search_running = True
+
+        if self.filter_button.get_active() and self.scrollback is not None:
+            self._start_filter(self.search_pattern, literal)
+            self._update_match_label()
+            return
+
+        job = self._search_job(self.search_pattern, literal)
+
+        if self.scrollback is not None:
+            self.search_generation = self.search_worker.submit(job)
+        else:
+            # The lines are read from the TextBuffer, which can't be accessed from another thread
+            self.search_generation += 1
+            self.search_job = job
+            GObject.idle_add(self._search_step, job, self.search_generation,
+                             priority=GObject.PRIORITY_DEFAULT_IDLE)
+        self._update_match_label()
+
+    def cancel_search(self):
+        if self.search_timeout_id is not None:
+            GLib.source_remove(self.search_timeout_id)
+            self.search_timeout_id = None
+        self.search_worker.cancel()
+        self.search_job = None
+        self.search_generation += 1
+        self.search_running = False
+
+    def _search_job(self, pattern, literal):
+        # Only indexed lines are searched: the index is extended by the main loop
+        start = 0
+        while True:
+            end = self.search_index.line_count
+            if start >= end:
+                break
+            yield from self.search_index.search(pattern, literal, start, end)
+            start = end
+
+        # The line being written isn't indexed yet
+        if self._completed_lines() == start:
+            yield SearchIndex.match_lines(pattern, start, [self._current_line_text()])
+
+    def _search_step(self, job, generation):
+        if job is not self.search_job:
+            return False  # Cancelled by a new query
+
+        deadline = time.monotonic() + self.search_budget
+        matches = []
+        done = False
+        try:
+            while time.monotonic() < deadline:
+                matches.extend(next(job))
+        except StopIteration:
+            done = True
+        except Exception as e:
+            print(f"Error searching: {e}")
+            traceback.print_exc(file=sys.stdout)
+            done = True
+
+        if done:
+            self.search_job = None
+        self._on_search_results(generation, matches, done)
+        return not done
+
+    def _post_search_results(self, generation, matches, done):
+        """Worker thread: hand the results over to the main loop"""
+        GObject.idle_add(self._on_search_results, generation, matches, done)
+
+    def _on_search_results(self, generation, matches, done):
+        if generation != self.search_generation:
+            return False  # Results of a cancelled search
+
+        if done:
+            self.search_running = False
+
+        if matches:
+            self.search_matches.extend(matches)
+            if self.current_match_index < 0:
+                self.current_match_index = 0
+                self.highlight_current_match()
+            else:
+                self._schedule_highlight()
+
+        self._update_match_label()
+        return False
+
+    def _update_match_label(self):
+        """Show "i of N", with N growing while the search is running"""
+        total = len(self.search_matches)
+        if self.search_pattern is None:
+            text = ""
+        elif self.filter_active:
+            text = f"{self.filter_lines}{'+' if self.search_running else ''} lines"
+        elif total == 0:
+            text = "Searching..." if self.search_running else "No matches"
+        else:
+            text = f"{self.current_match_index + 1} of {total}{'+' if self.search_running else ''}"
+        self.match_label.set_text(text)
+
+    ###
+    ### Filter view
+    ###
+
+    def _start_filter(self, pattern, literal):
+        """Show only the matching lines: the scrollback is filtered in the worker, then new lines as they come"""
+        self.filter_buffer.set_text("")
+        self.filter_lines = 0
+        self.filter_upto = 0
+        self.filter_state = {'end': 0}
+        if not self.filter_active:
+            self.filter_active = True
+            self.terminal.set_buffer(self.filter_buffer)
+
+        job = self._filter_job(pattern, literal, self.filter_state)
+        self.search_generation = self.search_worker.submit(job, self._post_filter_results)
+
+    def _stop_filter(self):
+        if not self.filter_active:
+            return
+        self.filter_active = False
+        self.terminal.set_buffer(self.terminal_buffer)
+        self.filter_buffer.set_text("")
+        self._scroll_to_end()
+
+    def _filter_job(self, pattern, literal, state):
+        """Worker: the matching lines of the scrollback with their styles, one read per candidate block"""
+        start = 0
+        while True:
+            end = self.search_index.line_count
+            if start >= end:
+                break
+            for matches in self.search_index.search(pattern, literal, start, end):
+                if not matches:
+                    yield []
+                    continue
+                numbers = sorted({match[0] for match in matches})
+                lines = self.scrollback.get_lines(numbers[0], numbers[-1] + 1)
+                yield [lines[number - numbers[0]] for number in numbers]
+            start = end
+        state['end'] = start
+
+    def _post_filter_results(self, generation, lines, done):
+        """Worker thread: hand the filtered lines over to the main loop"""
+        GObject.idle_add(self._on_filter_results, generation, lines, done)
+
+    def _on_filter_results(self, generation, lines, done):
+        if generation != self.search_generation or not self.filter_active:
+            return False  # Results of a cancelled search
+
+        self._append_filter_lines(lines)
+        if done:
+            self.search_running = False
+            self.filter_upto = self.filter_state['end']
+            self._filter_new_lines()  # Lines completed while the worker was running
+
+        self._update_match_label()
+        return False
+
+    def _filter_new_lines(self):
+        """Live filter: match the lines completed since the last call"""
+        end = self.search_index.line_count
+        if self.filter_upto >= end:
+            return
+
+        search = self.search_pattern.search
+        lines = [line for line in self.scrollback.get_lines(self.filter_upto, end) if search(line[0])]
+        self.filter_upto = end
+        if lines:
+            self._append_filter_lines(lines)
+            self._update_match_label()
+
+    def _append_filter_lines(self, lines):
+        """Append (text, runs) lines to the filter view, highlighting the matches; keeps max_lines lines"""
+        if not lines:
+            return
+
+        self.filter_lines += len(lines)
+        lines = lines[-self.max_lines:]
+
+        buffer = self.filter_buffer
+        first_line = 0
+        if buffer.get_char_count():
+            buffer.insert(buffer.get_end_iter(), '\n')
+            first_line = buffer.get_line_count() - 1
+        self._insert_lines(buffer.get_end_iter(), lines, newline_after=False)
+
+        finditer = self.search_pattern.finditer
+        for i, (text, _) in enumerate(lines):
+            for match in finditer(text):
+                if match.end() > match.start():
+                    buffer.apply_tag(self.search_tag,
+                                     buffer.get_iter_at_line_offset(first_line + i, match.start()),
+                                     buffer.get_iter_at_line_offset(first_line + i, match.end()))
 
-        for match in re.finditer(re.escape(search_text), text, re.IGNORECASE):
-            start_iter = buffer.get_iter_at_offset(match.start())
-            end_iter = buffer.get_iter_at_offset(match.end())
-            buffer.apply_tag(self.search_tag, start_iter, end_iter)
-            self.search_highlights.append((start_iter.get_offset(), end_iter.get_offset()))
+        excess = buffer.get_line_count() - self.max_lines
+        if excess > 0:
+            buffer.delete(buffer.get_start_iter(), buffer.get_iter_at_line(excess))
 
-        if self.search_highlights:
-            self.current_match_index = 0
-            self.highlight_current_match()
+        self._scroll_to_end()
+
+    def _match_iters(self, match):
+        """TextBuffer iterators of a match, (None, None) if its line isn't in the buffer"""
+        buffer = self.terminal_buffer
+        line, start, end = match
+        buffer_line = line - self.view_start
+        if buffer_line < 0 or buffer_line >= buffer.get_line_count():
+            return None, None
+
+        line_iter = buffer.get_iter_at_line(buffer_line)
+        if line_iter.get_chars_in_line() < end:
+            return None, None  # The line was edited (CR, backspace) since the search
+        return (buffer.get_iter_at_line_offset(buffer_line, start),
+                buffer.get_iter_at_line_offset(buffer_line, end))
+
+    def _visible_lines(self):
+        """First and last session line on screen"""
+        value = self.vadj.get_value()
+        top, _ = self.terminal.get_line_at_y(int(value))
+        bottom, _ = self.terminal.get_line_at_y(int(value + self.vadj.get_page_size()))
+        return self.view_start + top.get_line(), self.view_start + bottom.get_line()
+
+    def _schedule_highlight(self):
+        if not self.highlight_pending:
+            self.highlight_pending = True
+            GObject.idle_add(self._highlight_viewport)
+
+    def _highlight_viewport(self):
+        """Apply the highlight tag to the matches on screen only"""
+        self.highlight_pending = False
+        buffer = self.terminal_buffer
+        buffer.remove_tag(self.search_tag, buffer.get_start_iter(), buffer.get_end_iter())
+
+        matches = self.search_matches
+        if matches:
+            first, last = self._visible_lines()
+            i = bisect.bisect_left(matches, (first,))
+            while i < len(matches) and matches[i][0] <= last:
+                start_iter, end_iter = self._match_iters(matches[i])
+                if start_iter is not None:
+                    buffer.apply_tag(self.search_tag, start_iter, end_iter)
+                i += 1
+        return False
+
+    def _show_line(self, line):
+        """Make sure a session line is in the TextBuffer, loading its window from the scrollback"""
+        if self.view_start <= line < self.view_start + self.terminal_buffer.get_line_count():
+            return
+        if self.scrollback is not None:
+            self._load_window(max(0, line - self._window_lines() // 2))
 
     def highlight_current_match(self):
-        if not self.search_highlights:
+        if not self.search_matches:
             return
 
         buffer = self.terminal_buffer
@@ -373,17 +1061,21 @@ class TerminalHandler:
         end = buffer.get_end_iter()
         buffer.remove_tag(self.current_match_tag, start, end)
 
-        start_offset, end_offset = self.search_highlights[self.current_match_index]
-        start_iter = buffer.get_iter_at_offset(start_offset)
-        end_iter = buffer.get_iter_at_offset(end_offset)
-        buffer.apply_tag(self.current_match_tag, start_iter, end_iter)
+        match = self.search_matches[self.current_match_index]
+        self._update_match_label()
+        self._show_line(match[0])
+        start_iter, end_iter = self._match_iters(match)
+        if start_iter is None:
+            return
 
+        buffer.apply_tag(self.current_match_tag, start_iter, end_iter)
         self.terminal.scroll_to_iter(start_iter, 0.0, True, 0.0, 0.5)
+        self._schedule_highlight()
 
     def on_search_next(self, *args):
-        if not self.search_highlights:
+        if not self.search_matches:
             return
-        self.current_match_index = (self.current_match_index + 1) % len(self.search_highlights)
+        self.current_match_index = (self.current_match_index + 1) % len(self.search_matches)
         self.highlight_current_match()
 
     def get_widget(self):
@@ -421,94 +1113,44 @@ class TerminalHandler:
             bg_tag.set_property('background', color)
             self.tag_table.add(bg_tag)
 
-    def _parse_ansi_code(self, code):
-        """Parse ANSI code and return corresponding tag names"""
-        tags = set()
-
-        # Handle simple cases first
-        simple_mappings = {
-            '0': set(),  # Reset
-            '1': {'bold'},
-            '2': {'dim'},
-            '3': {'italic'},
-            '4': {'underline'},
-            '5': {'blink'},
-            '7': {'reverse'},
-            '8': {'hidden'},
-            '9': {'strike'}
-        }
-
-        if code in simple_mappings:
-            return simple_mappings[code]
-
-        # Handle colors
-        try:
-            code_num = int(code)
-            if 30 <= code_num <= 37:  # Standard foreground colors
-                tags.add(f'fg_{code_num - 30}')
-            elif 40 <= code_num <= 47:  # Standard background colors
-                tags.add(f'bg_{code_num - 40}')
-            elif 90 <= code_num <= 97:  # Bright foreground colors
-                tags.add(f'fg_{code_num - 82}')  # Maps 90-97 to 8-15
-            elif 100 <= code_num <= 107:  # Bright background colors
-                tags.add(f'bg_{code_num - 92}')  # Maps 100-107 to 8-15
-        except ValueError:
-            pass
-
+    def _get_tagset_tags(self, tagset_id):
+        """Gtk.TextTag objects of an interned tag set, looked up once per set"""
+        tags = self.tagset_tags.get(tagset_id)
+        if tags is None:
+            tags = tuple(tag for tag in (self.tag_table.lookup(name) for name in sorted(tagset(tagset_id)))
+                         if tag is not None)
+            self.tagset_tags[tagset_id] = tags
         return tags
 
-    def _update_tags(self, codes, current_tags):
-        if type(codes) is not list:
-            codes = [codes]
-
-        for code in codes:
-            if code == '0':
-                current_tags.clear()
-            else:
-                new_tags = self._parse_ansi_code(code)
-                if new_tags:
-                    # Remove conflicting tags before adding new ones
-                    if any(tag.startswith('fg_') for tag in new_tags):
-                        # Rimuove solo i tag fg_ esistenti
-                        current_tags = {tag for tag in current_tags if not tag.startswith('fg_')}
-                    if any(tag.startswith('bg_') for tag in new_tags):
-                        # Rimuove solo i tag bg_ esistenti
-                        current_tags = {tag for tag in current_tags if not tag.startswith('bg_')}
-                    current_tags.update(new_tags)
-
-        return current_tags
-
     def _schedule_update(self, text, tags):
         """Schedule a text update to be processed in the main loop"""
-        self.pending_updates.append((text, tags))
+        self._schedule_op((OP_TEXT, text, intern_tagset(tags)))
+
+    def _schedule_op(self, op):
+        """Schedule an edit operation to be applied in the main loop"""
+        self.pending_updates.put(op)
         if not self.update_pending:
             self.update_pending = True
-            GObject.idle_add(self._process_updates, priority=GObject.PRIORITY_HIGH)
-
-    def normalize_ansi(self, text):
-        """
-        Normalizza le sequenze ANSI nel testo, convertendo le versioni escaped
-        nella forma corretta con \x1b.
-
-        Args:
-            text (str): Il testo contenente sequenze ANSI (escaped o non)
-
-        Returns:
-            str: Il testo con tutte le sequenze ANSI normalizzate
-        """
-
-        def replacer(match):
-            # Estrae i codici numerici dal gruppo catturato
-            codes = match.group(1)
-            # Ricostruisce la sequenza ANSI nella forma corretta
-            return f"\x1b[{codes}m"
-
-        # Applica la sostituzione su tutto il testo
-        return self.ansi_pattern.sub(replacer, text)
+            # Below redraw priority, so a flood of updates can't starve drawing
+            GObject.idle_add(self._process_updates, priority=GObject.PRIORITY_DEFAULT_IDLE)
 
     def append_terminal(self, text):
-        if not text or not contains_alphanumeric(text):
+        if not text:
+            return
+        if not isinstance(text, str):
+            try:
+                text = str(text)
+            except:
+                return
+
+        try:
+            # Escaped sequences, unprintable characters and styles are handled in one pass
+            ops = self.ansi_parser.parse(text)
+        except Exception as e:
+            print(f"Error in append_terminal: {e}")
             return
+        if not ops:
+            return  # Nothing visible (no alphanumeric character)
 
         adj = self.vadj
         current_pos = adj.get_value()
@@ -522,161 +1164,12 @@ class TerminalHandler:
             self.scrollDown = False
 
         try:
-            text = self.normalize_ansi(text)
-            text = self._sanitize_text(text)
-            ansi_pattern = self.ansi_pattern  # re.compile(r'(?:\\x1b|\x1b)\[([0-9;]*)m')
-
-            segments = []
-            last_position = 0
-            current_tags = set()
-
-            def add_piece(up_to):
-                segments.append((text[last_position:up_to], current_tags.copy()))
-
-            for match in ansi_pattern.finditer(text):
-                start, end = match.span()
-
-                if last_position == 0 and start > 0:
-                    add_piece(start)
-                elif last_position > 0 and last_position != start:
-                    add_piece(start)
-
-                codes = match.group(1).split(';') if match.group(1) else ['0']
-                current_tags = self._update_tags(codes, current_tags)
-                last_position = end
-
-            if last_position < len(text):
-                add_piece(len(text))
-
-            for content, tags in segments:
-                self._schedule_update(content, tags)
+            for op in ops:
+                self._schedule_op(op)
 
         except Exception as e:
             print(f"Error in append_terminal: {e}")
 
-    def _sanitize_text(self, text):
-        """Sanitize text while preserving ANSI escape sequences"""
-        if not isinstance(text, str):
-            try:
-                text = str(text)
-            except:
-                return ""
-
-        text = self._handle_control_sequences(text)
-
-        # Preserve ANSI escape sequences while cleaning other characters
-        parts = []
-        current_pos = 0
-        for match in re.finditer(r'\x1b\[[0-9;]*m', text):
-            start, end = match.span()
-            # Clean the text between ANSI sequences
-            clean_text = ''.join(
-                char for char in text[current_pos:start]
-                if char in '\n\t' or (ord(char) >= 32 and ord(char) <= 126) or ord(char) > 159
-            )
-            parts.append(clean_text)
-            parts.append(text[start:end])  # Keep the ANSI sequence as-is
-            current_pos = end
-
-        # Clean the remaining text after the last ANSI sequence
-        clean_text = ''.join(
-            char for char in text[current_pos:]
-            if char in '\n\t' or (ord(char) >= 32 and ord(char) <= 126) or ord(char) > 159
-        )
-        parts.append(clean_text)
-
-        return ''.join(parts)
-
-    def _handle_control_sequences(self, text):
-        # Keep ANSI color/style sequences while handling other control chars
-        control_chars = {
-            '\x08': self._handle_backspace,
-            '\r': self._handle_carriage_return,
-            '\x1b[K': self._handle_clear_line,
-            '\x1b[2K': self._handle_clear_entire_line,
-            '\x1b[1K': self._handle_clear_to_start
-        }
-
-        result = []
-        i = 0
-        while i < len(text):
-            handled = False
-            for seq, handler in control_chars.items():
-                if text[i:].startswith(seq):
-                    handler(text, i)
-                    i += len(seq)
-                    handled = True
-                    break
-
-            if not handled:
-                result.append(text[i])
-                i += 1
-
-        return ''.join(result)
-
-    def _handle_backspace(self, text, pos):
-        """Handle backspace character by removing previous character if it exists"""
-        try:
-            end_iter = self.terminal_buffer.get_end_iter()
-            start_iter = end_iter.copy()
-            if start_iter.backward_char():  # If there's a character to delete
-                self.terminal_buffer.delete(start_iter, end_iter)
-        except Exception as e:
-            print(f"Error handling backspace: {e}")
-
-    def _handle_carriage_return(self, text, pos):
-        """Handle carriage return by moving to start of the current line"""
-        try:
-            end_iter = self.terminal_buffer.get_end_iter()
-            line_start = end_iter.copy()
-            line_start.backward_chars(end_iter.get_line_offset())
-            # Delete from line start to current position
-            self.terminal_buffer.delete(line_start, end_iter)
-        except Exception as e:
-            print(f"Error handling carriage return: {e}")
-
-    def _handle_clear_line(self, text, pos):
-        """Clear from cursor to the end of line"""
-        try:
-            end_iter = self.terminal_buffer.get_end_iter()
-            line_end = end_iter.copy()
-            line_end.forward_to_line_end()
-            # Delete from current position to end of line
-            self.terminal_buffer.delete(end_iter, line_end)
-        except Exception as e:
-            print(f"Error handling clear line: {e}")
-
-    def _handle_clear_entire_line(self, text, pos):
-        """Clear the entire current line"""
-        try:
-            end_iter = self.terminal_buffer.get_end_iter()
-            line_start = end_iter.copy()
-            line_end = end_iter.copy()
-
-            # Move to start of line
-            line_start.backward_chars(end_iter.get_line_offset())
-            # Move to end of line
-            line_end.forward_to_line_end()
-
-            # Delete the entire line
-            self.terminal_buffer.delete(line_start, line_end)
-        except Exception as e:
-            print(f"Error handling clear entire line: {e}")
-
-    def _handle_clear_to_start(self, text, pos):
-        """Clear from cursor to the start of line"""
-        try:
-            end_iter = self.terminal_buffer.get_end_iter()
-            line_start = end_iter.copy()
-
-            # Move to start of line
-            line_start.backward_chars(end_iter.get_line_offset())
-
-            # Delete from start of line to current position
-            self.terminal_buffer.delete(line_start, end_iter)
-        except Exception as e:
-            print(f"Error handling clear to start: {e}")
-
     ###
     ### Save button methods
     ###
@@ -720,6 +1213,15 @@ class TerminalHandler:
         )
 
         save_button.connect("clicked", self.on_save_clicked)
+
+        # Progress of a running export
+        self.export_progress = Gtk.ProgressBar()
+        self.export_progress.set_show_text(True)
+        self.export_progress.set_valign(Gtk.Align.CENTER)
+        self.export_progress.set_margin_end(6)
+        self.export_progress.set_no_show_all(True)
+
+        button_box.pack_start(self.export_progress, False, False, 0)
         button_box.pack_start(save_button, False, False, 0)
 
         # Add button_box as an overlay widget
@@ -745,104 +1247,186 @@ class TerminalHandler:
         html_filter.add_pattern("*.html")
         dialog.add_filter(html_filter)
 
+        # Raw session exports, from the bytes received (not limited by the trimmed history)
+        if self.session_log is not None:
+            for name, patterns in (("Plain text (*.txt)", ["*.txt"]),
+                                   ("ANSI log (*.log)", ["*.log"]),
+                                   ("Compressed (*.gz, *.zst)", ["*.gz", "*.zst"])):
+                file_filter = Gtk.FileFilter()
+                file_filter.set_name(name)
+                for pattern in patterns:
+                    file_filter.add_pattern(pattern)
+                dialog.add_filter(file_filter)
+
         # Suggest default filename
         dialog.set_current_name("terminal_output.html")
 
         response = dialog.run()
         if response == Gtk.ResponseType.OK:
             filepath = dialog.get_filename()
-            if not filepath.endswith('.html'):
-                filepath += '.html'
-            self.save_content_as_html(filepath)
+            if self.session_log is not None and filepath.lower().endswith(('.txt', '.log', '.gz', '.zst')):
+                self.save_session(filepath)
+            else:
+                if not filepath.endswith('.html'):
+                    filepath += '.html'
+                self.save_content_as_html(filepath)
 
         dialog.destroy()
 
-    def save_content_as_html(self, filepath):
-        buffer = self.terminal_buffer
-        start = buffer.get_start_iter()
-        end = buffer.get_end_iter()
+    def save_session(self, filepath):
+        """
+        Export the raw session log in a background thread.
 
-        # Start HTML document with style
-        html_content = """<!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {
-                background-color: #2E3436;
-                color: #FFFFFF;
-                font-family: monospace;
-                font-weight: bold;
-                font-size: 12pt;
-                white-space: pre-wrap;
-                line-height: 1.2;
-                margin: 20px;
-            }
-            .search-highlight {
-                background-color: #FFE066;
-                color: #000000;
-            }
-            .current-match {
-                background-color: #FF9933;
-                color: #000000;
-            }
-        </style>
-    </head>
-    <body>"""
+        The format comes from the file name: "*.txt" is plain text, other
+        names keep the ANSI sequences, ".gz"/".zst" compress the output.
+        """
+        if self.export_thread is not None and self.export_thread.is_alive():
+            return
 
-        current_tags = set()
-        last_pos = start.copy()
-
-        iter = start.copy()
-        while iter.compare(end) < 0:
-            # Get all tags at current position
-            tags = iter.get_tags()
-            new_tags = set(tag.get_property('name') for tag in tags if tag.get_property('name'))
-
-            # If tags changed, close previous span and start new one
-            if new_tags != current_tags:
-                # Get text up to this point
-                text = buffer.get_text(last_pos, iter, False)
-                if text:
-                    if current_tags:
-                        html_content += self.get_styled_span(text, current_tags)
-                    else:
-                        html_content += self.escape_html(text)
-
-                current_tags = new_tags
-                last_pos = iter.copy()
-
-            if not iter.forward_char():
-                break
+        fmt, compression = format_from_filename(filepath)
 
-        # Handle remaining text
-        text = buffer.get_text(last_pos, end, False)
-        if text:
-            if current_tags:
-                html_content += self.get_styled_span(text, current_tags)
-            else:
-                html_content += self.escape_html(text)
+        self.export_progress.set_fraction(0.0)
+        self.export_progress.set_text("Saving...")
+        self.export_progress.show()
 
-        # Close HTML document
-        html_content += "\n</body>\n</html>"
+        self.export_thread = threading.Thread(target=self._write_session,
+                                              args=(filepath, fmt, compression), name="SessionExport")
+        self.export_thread.daemon = True
+        self.export_thread.start()
 
-        # Save to file
+    def _write_session(self, filepath, fmt, compression):
+        """Export thread: stream the session log to the file"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            export_session(self.session_log, filepath, fmt, compression,
+                           progress=lambda fraction: GObject.idle_add(self._on_export_progress, fraction))
         except Exception as e:
-            dialog = Gtk.MessageDialog(
-                parent=None,
-                flags=0,
-                message_type=Gtk.MessageType.ERROR,
-                buttons=Gtk.ButtonsType.OK,
-                text=f"Error saving file: {str(e)}"
-            )
-            dialog.run()
-            dialog.destroy()
+            print(f"Error saving file: {e}")
+            traceback.print_exc(file=sys.stdout)
+            GObject.idle_add(self._on_export_error, str(e))
 
-    def get_styled_span(self, text, tags):
-        """Convert GTK text tags to HTML style"""
+        GObject.idle_add(self._on_export_done)
+
+    def save_content_as_html(self, filepath):
+        """
+        Export the session as HTML in a background thread.
+
+        The text is walked run by run: the style runs stored in the
+        scrollback, or the tag toggles of the TextBuffer without one. Spans
+        are streamed to the file through a buffered writer, and a progress bar
+        next to the Save button shows the advancement.
+        """
+        if self.export_thread is not None and self.export_thread.is_alive():
+            return
+
+        if self.scrollback is not None:
+            source = self._scrollback_runs(len(self.scrollback), self.scrollback.get_current())
+            total = len(self.scrollback) + 1
+        else:
+            # The TextBuffer can only be read in the main loop: collect its runs here (one step per toggle)
+            source = iter([(1, self._buffer_runs())])
+            total = 1
+
+        self.export_progress.set_fraction(0.0)
+        self.export_progress.set_text("Saving...")
+        self.export_progress.show()
+
+        self.export_thread = threading.Thread(target=self._write_html, args=(filepath, source, total),
+                                              name="HtmlExport")
+        self.export_thread.daemon = True
+        self.export_thread.start()
+
+    def _scrollback_runs(self, total, current, chunk_lines=2000):
+        """Yield (lines done, [(text, tagset_id), ...]) for the scrollback lines plus the current line"""
+        for start in range(0, total, chunk_lines):
+            runs = []
+            for line, line_runs in self.scrollback.get_lines(start, min(total, start + chunk_lines)):
+                self._line_runs(line, line_runs, runs)
+                runs.append(('\n', 0))
+            yield min(total, start + chunk_lines), runs
+
+        runs = []
+        self._line_runs(current[0], current[1], runs)
+        yield total + 1, runs
+
+    @staticmethod
+    def _line_runs(line, line_runs, runs):
+        for i, (start, tagset_id) in enumerate(line_runs):
+            end = line_runs[i + 1][0] if i + 1 < len(line_runs) else len(line)
+            if end > start:
+                runs.append((line[start:end], tagset_id))
+
+    def _buffer_runs(self):
+        """Runs of the TextBuffer, jumping from one tag toggle to the next"""
+        buffer = self.terminal_buffer
+        runs = []
+        start = buffer.get_start_iter()
+        while not start.is_end():
+            end = start.copy()
+            end.forward_to_tag_toggle(None)
+            names = [tag.get_property('name') for tag in start.get_tags()]
+            runs.append((buffer.get_text(start, end, False), intern_tagset(name for name in names if name)))
+            start = end
+        return runs
+
+    def _write_html(self, filepath, source, total):
+        """Export thread: stream the runs to the file"""
+        openers = {}  # tagset_id -> opening <span ...> ('' for plain text)
+        last_report = 0.0
+        try:
+            with open(filepath, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+                f.write(_HTML_HEADER)
+                write = f.write
+                escape = self.escape_html
+
+                for done, runs in source:
+                    for text, tagset_id in runs:
+                        opener = openers.get(tagset_id)
+                        if opener is None:
+                            attributes = self._span_attributes(tagset(tagset_id)) if tagset_id else ''
+                            opener = f'<span {attributes}>' if attributes else ''
+                            openers[tagset_id] = opener
+
+                        if opener:
+                            write(opener + escape(text) + '</span>')
+                        else:
+                            write(escape(text))
+
+                    now = time.monotonic()
+                    if now - last_report > 0.1:
+                        last_report = now
+                        GObject.idle_add(self._on_export_progress, min(1.0, done / total))
+
+                write("\n</body>\n</html>")
+        except Exception as e:
+            print(f"Error saving file: {e}")
+            traceback.print_exc(file=sys.stdout)
+            GObject.idle_add(self._on_export_error, str(e))
+
+        GObject.idle_add(self._on_export_done)
+
+    def _on_export_progress(self, fraction):
+        self.export_progress.set_fraction(fraction)
+        self.export_progress.set_text(f"Saving {int(fraction * 100)}%")
+        return False
+
+    def _on_export_done(self):
+        self.export_progress.hide()
+        return False
+
+    def _on_export_error(self, message):
+        dialog = Gtk.MessageDialog(
+            parent=None,
+            flags=0,
+            message_type=Gtk.MessageType.ERROR,
+            buttons=Gtk.ButtonsType.OK,
+            text=f"Error saving file: {message}"
+        )
+        dialog.run()
+        dialog.destroy()
+        return False
+
+    def _span_attributes(self, tags):
+        """HTML attributes (style and class) of a set of tag names, '' if none applies"""
         style = []
         classes = []
 
@@ -873,15 +1457,19 @@ class TerminalHandler:
             elif tag_name == 'dim':
                 style.append("opacity: 0.7")
 
-        escaped_text = self.escape_html(text)
+        span_attrs = []
+        if style:
+            span_attrs.append(f'style="{"; ".join(style)}"')
+        if classes:
+            span_attrs.append(f'class="{" ".join(classes)}"')
+        return " ".join(span_attrs)
 
-        if style or classes:
-            span_attrs = []
-            if style:
-                span_attrs.append(f'style="{"; ".join(style)}"')
-            if classes:
-                span_attrs.append(f'class="{" ".join(classes)}"')
-            return f'<span {" ".join(span_attrs)}>{escaped_text}</span>'
+    def get_styled_span(self, text, tags):
+        """Convert GTK text tags to HTML style"""
+        attributes = self._span_attributes(tags)
+        escaped_text = self.escape_html(text)
+        if attributes:
+            return f'<span {attributes}>{escaped_text}</span>'
         return escaped_text
 
     def escape_html(self, text):
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sys
+import traceback
+from typing import List, Optional, Tuple
+
+# Partial downloads, kept until they complete
+PARTIAL_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'helloesp', 'transfers')
+
+
+class TransferManifest:
+    """
+    Per-chunk hashes of a partial download, saved next to its data.
+
+    The data file grows one verified chunk at a time; the manifest records
+    (offset, length, md5) of every chunk, so after a failure (or a restart
+    of the application) the data on disk can be checked chunk by chunk and
+    the download continues from the last good one.
+    """
+
+    def __init__(self, filename: str, size: int = 0, directory: str = PARTIAL_DIR):
+        self.filename = filename
+        self.size = size
+        self.chunks: List[Tuple[int, int, str]] = []
+
+        name = filename.replace(os.sep, '_')
+        self.data_path = os.path.join(directory, name + '.part')
+        self.manifest_path = os.path.join(directory, name + '.manifest.json')
+
+    @property
+    def done(self) -> int:
+        """Bytes held, from the start of the file"""
+        if not self.chunks:
+            return 0
+        offset, length, _ = self.chunks[-1]
+        return offset + length
+
+    def add(self, offset: int, chunk: bytes, md5: Optional[str] = None):
+        """Append a chunk to the data file (offset must be done)"""
+        if offset != self.done:
+            raise ValueError(f"Chunk at {offset}, expected {self.done}")
+        with open(self.data_path, 'ab') as f:
+            f.write(chunk)
+        self.chunks.append((offset, len(chunk), md5 or hashlib.md5(chunk).hexdigest()))
+
+    def load(self) -> bytes:
+        """
+        Carica un download parziale, verificando i chunk.
+
+        Returns:
+            The data of the good chunks (the manifest and the data file are
+            cut after the first bad one), b'' if there is nothing to resume
+        """
+        try:
+            with open(self.manifest_path) as f:
+                saved = json.load(f)
+            with open(self.data_path, 'rb') as f:
+                data = f.read()
+        except (OSError, ValueError):
+            self.chunks = []
+            return b''
+
+        if saved.get('filename') != self.filename:
+            self.chunks = []
+            return b''
+        self.size = saved.get('size', 0)
+
+        self.chunks = []
+        for offset, length, md5 in saved.get('chunks', []):
+            chunk = data[offset:offset + length]
+            if offset != self.done or len(chunk) != length or hashlib.md5(chunk).hexdigest() != md5:
+                break
+            self.chunks.append((offset, length, md5))
+
+        done = self.done
+        if done < len(data):
+            with open(self.data_path, 'r+b') as f:
+                f.truncate(done)
+        return data[:done]
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            temp_path = self.manifest_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump({'filename': self.filename, 'size': self.size, 'chunks': self.chunks}, f)
+            os.replace(temp_path, self.manifest_path)
+        except OSError as e:
+            print("TransferManifest.save exception: ", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def reset(self, size: int = 0):
+        """Start over (the file on the device changed)"""
+        self.size = size
+        self.chunks = []
+        os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+        open(self.data_path, 'wb').close()
+        self.save()
+
+    def remove(self):
+        """Download complete: delete the partial files"""
+        for path in (self.data_path, self.manifest_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
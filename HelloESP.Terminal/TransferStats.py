@@ -0,0 +1,150 @@
+import time
+from typing import List, Optional, Tuple
+
+# Default chunk size, understood by every firmware
+DEFAULT_CHUNK_SIZE = 1024
+
+
+class ChunkSizer:
+    """
+    Chunk size of a file transfer, adapted while it runs.
+
+    The size doubles after grow_after chunks in a row go through cleanly and
+    halves on every hash failure or timeout, between minimum and maximum
+    (the latter negotiated with the device). Small chunks waste the link on
+    headers and round trips, big ones cost more to send again on a noisy
+    link: this settles on the biggest size the link gets through.
+
+    Round trip times feed the retransmission timeout, as in TCP
+    (smoothed RTT + 4 * its deviation), so a slow device isn't flooded with
+    retransmissions and a lost chunk on a fast one is noticed early.
+    """
+
+    def __init__(self, initial: int = DEFAULT_CHUNK_SIZE, minimum: int = 256, maximum: int = DEFAULT_CHUNK_SIZE,
+                 grow_after: int = 8):
+        self.minimum = min(minimum, maximum)
+        self.maximum = maximum
+        self.grow_after = grow_after
+        self.size = max(self.minimum, min(initial, maximum))
+        self.clean_run = 0
+
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+
+    def on_success(self, rtt: Optional[float] = None):
+        """A chunk went through; rtt is None for retransmitted chunks (ambiguous)"""
+        if rtt is not None:
+            self.record_rtt(rtt)
+
+        self.clean_run += 1
+        if self.clean_run >= self.grow_after and self.size < self.maximum:
+            self.size = min(self.maximum, self.size * 2)
+            self.clean_run = 0
+
+    def on_error(self):
+        """Hash failure or timeout"""
+        self.size = max(self.minimum, self.size // 2)
+        self.clean_run = 0
+
+    def record_rtt(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def timeout(self, default: float, minimum: float = 0.2) -> float:
+        """Retransmission timeout (s); default until a round trip is measured"""
+        if self.srtt is None:
+            return default
+        return max(minimum, self.srtt + 4 * self.rttvar)
+
+
+class TransferStats:
+    """
+    Statistics of one file transfer, shown in the file manager panel.
+
+    chunk_sizes is the history of the chunk size: (offset, size) every time
+    the size changes.
+    """
+
+    def __init__(self, direction: str, filename: str, size: int):
+        self.direction = direction
+        self.filename = filename
+        self.size = size
+        self.bytes = 0
+        self.chunks = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.mode = ''
+        self.success = False
+        self.resumed_from = 0  # Bytes already on the other side from an interrupted transfer
+        self.unchanged = 0  # Bytes of a delta upload copied from the old file on the device
+        self.codec = ''  # Compression of the data on the wire
+        self.wire_bytes = 0  # Bytes sent for the chunks (compressed), without headers
+        self.chunk_sizes: List[Tuple[int, int]] = []
+
+        self.start_time = time.monotonic()
+        self.end_time: Optional[float] = None
+
+    def record_chunk(self, offset: int, size: int):
+        """A chunk of size bytes at offset went through"""
+        # The last chunk is just what's left: not a change of size
+        last = offset + size >= self.size
+        if not self.chunk_sizes or (self.chunk_sizes[-1][1] != size and not last):
+            self.chunk_sizes.append((offset, size))
+        self.chunks += 1
+        self.bytes += size
+
+    def finish(self, success: bool):
+        self.success = success
+        self.end_time = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        """Original / compressed size, 1.0 without compression"""
+        return self.bytes / self.wire_bytes if self.codec and self.wire_bytes else 1.0
+
+    def summary(self) -> str:
+        sizes = '->'.join(str(size) for _, size in self.chunk_sizes[-6:])
+        if len(self.chunk_sizes) > 6:
+            sizes = '...' + sizes
+        resumed = f", resumed at {self.resumed_from / 1024:.1f} KB" if self.resumed_from else ''
+        if self.unchanged:
+            resumed += f", {self.unchanged / 1024:.1f} KB unchanged"
+        if self.codec:
+            resumed += f", {self.codec} {self.compression_ratio:.1f}x"
+        return (f"{self.direction} {self.filename}: {self.bytes / 1024:.1f} KB in {self.elapsed:.1f} s, "
+                f"{self.bytes_per_second / 1024:.1f} KB/s, {self.retries} retries, "
+                f"{self.timeouts} timeouts{resumed}, chunks {sizes or '-'}")
+
+    def to_dict(self) -> dict:
+        return {
+            'direction': self.direction,
+            'filename': self.filename,
+            'size': self.size,
+            'bytes': self.bytes,
+            'mode': self.mode,
+            'success': self.success,
+            'resumed_from': self.resumed_from,
+            'unchanged': self.unchanged,
+            'codec': self.codec,
+            'wire_bytes': self.wire_bytes,
+            'compression_ratio': self.compression_ratio,
+            'elapsed': self.elapsed,
+            'bytes_per_second': self.bytes_per_second,
+            'chunks': self.chunks,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'chunk_sizes': self.chunk_sizes,
+        }
@@ -0,0 +1,141 @@
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict
+
+from gi.repository import GLib
+
+from PipelineStats import pipeline
+from RingBuffer import RingBuffer, is_error_text
+from UiEvents import TERMINAL_TEXT, MONITOR_TEXT, CALL, COALESCED, KIND_NAMES, UiEvent
+
+
+def _event_size(event: UiEvent) -> int:
+    return len(event.value) if isinstance(event.value, (str, bytes)) else 0
+
+
+def _event_priority(event: UiEvent) -> bool:
+    """Calls, monitor updates and error lines are never dropped"""
+    return event.kind in (CALL, MONITOR_TEXT) or is_error_text(event.value)
+
+
+def _event_summary(items: int, size: int) -> UiEvent:
+    return UiEvent(TERMINAL_TEXT, f"\x1b[33m[{items} messages suppressed ({size} bytes)]\x1b[0m\n")
+
+
+class UiEventBus:
+    """
+    Typed, batched delivery of events from any thread to the GTK main loop.
+
+    Producers post (kind, value) events; the first event posted while the bus
+    is idle schedules a dispatch with GLib.idle_add, so nothing runs while
+    there is nothing to do. The dispatch hands runs of consecutive text
+    events of the same kind to their handler as a single call, and stops
+    after budget seconds: the rest is dispatched at the next idle, after
+    GTK has handled input and redraws.
+
+    Events are queued in the 'ui' stage RingBuffer, with its overflow policy.
+    """
+
+    def __init__(self, budget: float = 0.008, batch_items: int = 64):
+        """
+        Args:
+            budget: Max main loop time per dispatch (s)
+            batch_items: Events taken from the queue at once
+        """
+        self.budget = budget
+        self.batch_items = batch_items
+        self.handlers: Dict[int, Callable[[Any], None]] = {CALL: lambda function: function()}
+        self.queue = RingBuffer.for_stage('ui', size_of=_event_size, is_priority=_event_priority,
+                                          summarize=_event_summary)
+        self._wake_pending = False
+        self._wake_lock = threading.Lock()
+
+    def subscribe(self, kind: int, handler: Callable[[Any], None]):
+        """
+        Registra il gestore di un tipo di evento (uno per tipo).
+
+        Args:
+            kind: Event kind
+            handler: Called in the main loop with the value (joined, for COALESCED kinds)
+        """
+        self.handlers[kind] = handler
+
+    def post(self, kind: int, value: Any = None):
+        """Queue an event; thread safe."""
+        self.queue.put(UiEvent(kind, value))
+
+        with self._wake_lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        GLib.idle_add(self._dispatch)
+
+    def call(self, function: Callable[[], None]):
+        """Run function in the main loop, in order with the other events."""
+        self.post(CALL, function)
+
+    @property
+    def bytes(self) -> int:
+        """Bytes of text currently queued."""
+        return self.queue.bytes
+
+    def is_busy(self) -> bool:
+        """More text is queued than the UI consumes in a while (above the low watermark)."""
+        return self.queue.is_backlogged()
+
+    def clear(self):
+        self.queue.clear()
+
+    def _dispatch(self):
+        deadline = time.monotonic() + self.budget
+
+        while True:
+            # Reset before emptying the queue, so an event posted meanwhile schedules a new dispatch
+            with self._wake_lock:
+                self._wake_pending = False
+            events = self.queue.drain(self.batch_items)
+            if not events:
+                return False
+
+            self._deliver(events)
+
+            if time.monotonic() >= deadline:
+                with self._wake_lock:
+                    if self._wake_pending:
+                        return False  # A producer already scheduled the next dispatch
+                    self._wake_pending = True
+                return True  # Continue at the next idle
+
+    def _deliver(self, events):
+        i = 0
+        count = len(events)
+        while i < count:
+            kind, value = events[i]
+            i += 1
+
+            if kind in COALESCED:
+                run = [value]
+                while i < count and events[i].kind == kind:
+                    run.append(events[i].value)
+                    i += 1
+                if len(run) > 1:
+                    value = b''.join(run) if isinstance(value, bytes) else ''.join(run)
+
+            handler = self.handlers.get(kind)
+            if handler is None:
+                print("UiEventBus: no handler for ", KIND_NAMES.get(kind, kind))
+                continue
+
+            try:
+                if pipeline.enabled:
+                    started = time.monotonic()
+                    handler(value)
+                    pipeline.stage('ui:' + KIND_NAMES.get(kind, str(kind))).record_work(
+                        time.monotonic() - started, len(value) if isinstance(value, (str, bytes)) else 0, 1)
+                else:
+                    handler(value)
+            except Exception as e:
+                print(f"UiEventBus {KIND_NAMES.get(kind, kind)} handler: ", e)
+                traceback.print_exc(file=sys.stdout)
@@ -0,0 +1,31 @@
+from typing import Any, NamedTuple
+
+# Events of the UiEventBus, apart from the bus (which needs GLib): the
+# modules that post events can be imported without PyGObject
+
+# Event kinds
+TERMINAL_TEXT = 1         # Text rendered by the terminal as is
+TERMINAL_TEXT_TRACED = 2  # Same, also handed to the tracer
+APP_TEXT = 3              # Text from the application, through the stream handler (SerialInterface.append_terminal)
+SERIAL_DATA = 4           # Raw bytes from the serial port (or a replay)
+MONITOR_TEXT = 5          # Task monitor update
+CALL = 6                  # Callable run in the main loop, without arguments
+DEVICE_TEXT = 7           # Device lines read past the stream handler (file transfer): logged, then traced
+
+# Kinds whose consecutive events are merged into one handler call
+COALESCED = frozenset((TERMINAL_TEXT, TERMINAL_TEXT_TRACED, APP_TEXT, SERIAL_DATA, DEVICE_TEXT))
+
+KIND_NAMES = {
+    TERMINAL_TEXT: 'terminal_text',
+    TERMINAL_TEXT_TRACED: 'terminal_text_traced',
+    APP_TEXT: 'app_text',
+    SERIAL_DATA: 'serial_data',
+    MONITOR_TEXT: 'monitor_text',
+    CALL: 'call',
+    DEVICE_TEXT: 'device_text',
+}
+
+
+class UiEvent(NamedTuple):
+    kind: int
+    value: Any
@@ -0,0 +1,109 @@
+"""
+Benchmark of the log parsers run on every received line.
+
+- parsers.esp32_log: parse_esp32_log on plain "I (1234) TAG: msg" lines,
+  as done by SerialCommandHandler while waiting for a response
+- parsers.backtrace: ESP32BacktraceParser.read_line on the session text,
+  as fed by SerialInterface._append_terminal_traced (addr2line not
+  configured, so only the parsing is measured)
+
+Both run without PyGObject (no display); they are skipped when a module
+they import is missing.
+
+Usage: python benchmarks/bench_parsers.py [--mb 4] [--chunk 4096]
+"""
+import argparse
+import contextlib
+import logging
+import os
+import random
+
+import harness
+from generators import TAGS, backtrace, chunks, generate_session
+
+
+class _EventSink:
+    """Stands in for SerialInterface.ui_events: counts the messages of the tracer"""
+
+    def __init__(self):
+        self.events = 0
+        self.ui_events = self
+
+    def post(self, kind, value=None):
+        self.events += 1
+
+
+def _plain_lines(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        level = rng.choice('IWED')
+        message = ' '.join(f'{rng.choice(TAGS)}={rng.randint(0, 65535):#x}' for _ in range(rng.randint(1, 6)))
+        lines.append(f'{level} ({i * 17}) {rng.choice(TAGS)}: {message}')
+        if i % 50 == 0:
+            lines.append('!!!PONG!!!')  # Not a log line
+    return lines
+
+
+def bench_esp32_log(lines, repeat):
+    try:
+        from new_transfer_files import parse_esp32_log
+    except ImportError as e:
+        print(f'parsers.esp32_log skipped: {e}')
+        return None
+
+    total_bytes = sum(len(line) + 1 for line in lines)
+
+    def run():
+        return sum(1 for line in lines if parse_esp32_log(line) is not None)
+
+    return harness.measure('parsers.esp32_log', run, total_bytes, repeat)
+
+
+def bench_backtrace(pieces, total_bytes, repeat):
+    try:
+        from ESP32Tracing import ESP32BacktraceParser
+    except ImportError as e:
+        print(f'parsers.backtrace skipped: {e}')
+        return None
+
+    logging.getLogger('ESP32_Monitor').setLevel(logging.ERROR)
+
+    def run():
+        sink = _EventSink()
+        parser = ESP32BacktraceParser(serial=sink)
+        parser.set_debug_files(None, None)
+        parser.serialInterface = sink
+        # The tracer also prints what it reports: keep the cost, not the output
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for piece in pieces:
+                parser.read_line_thread(piece)  # read_line runs this in a new thread
+        return sink.events
+
+    return harness.measure('parsers.backtrace', run, total_bytes, repeat)
+
+
+def run(args):
+    results = [bench_esp32_log(_plain_lines(int(args.mb * 1024 * 1024 / 60)), args.repeat)]
+
+    # More crashes than a normal session, so the backtrace path is exercised
+    mix = {'monitor': 0.02, 'backtrace': 0.02, 'progress': 0.02, 'noise': 0.005}
+    data = generate_session(int(args.mb * 1024 * 1024), mix=mix)
+    pieces = [piece.decode('utf-8', errors='replace') for piece in chunks(data, args.chunk, seed=7)]
+    pieces.append(backtrace(random.Random(5)))
+    results.append(bench_backtrace(pieces, len(data), args.repeat))
+
+    return [result for result in results if result is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=4, help='Size of the generated input in MB')
+    parser.add_argument('--chunk', type=int, default=4096, help='Maximum bytes per read')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark (the best is reported)')
+    for result in run(parser.parse_args()):
+        harness.print_result(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark of StreamHandler: raw serial bytes split in lines and task
+monitor contexts by the processing thread.
+
+- throughput: a generated session fed as fast as possible, in random sized
+  reads, until the last line reaches the callback
+- latency: numbered lines fed at a steady rate, time from process_bytes to
+  the callback for each one
+
+Before measuring, the overflow policy of the RingBuffer between the stages
+is checked: RingBuffer.put must report the items it drops right away.
+
+Usage: python benchmarks/bench_stream.py [--mb 4] [--chunk 4096]
+"""
+import argparse
+import re
+import threading
+import time
+
+import harness
+from generators import chunks, generate_session
+
+from RingBuffer import DROP_OLDEST, RingBuffer  # noqa: E402
+from StreamHandler import StreamHandler  # noqa: E402
+
+_END = b'\n@@END@@\n'
+_SEQ = re.compile(r'seq=(\d+)')
+
+
+def _handler(on_text):
+    handler = StreamHandler(on_text, binary=True)
+    handler.add_context("!!TASKMONITOR!!", "!!TASKMONITOREND!!", lambda text: None)
+    return handler
+
+
+def check_ring_buffer():
+    """put returns False only when the overflow policy drops the item it was given"""
+    buffer = RingBuffer('check', capacity=100, policy=DROP_OLDEST,
+                        is_priority=lambda item: item.startswith(b'E ('))
+    results = [buffer.put(b'x' * 40), buffer.put(b'y' * 40)]  # Below the high watermark
+    results.append(buffer.put(b'z' * 200))  # Evicts x, y and then itself
+    results.append(buffer.put(b'E (1) ' + b'e' * 200))  # Priority: kept anyway
+    items = buffer.drain()
+    if results != [True, True, False, True] or [item[:1] for item in items] != [b'E']:
+        raise AssertionError(f"ring buffer: put returned {results}, left {[item[:8] for item in items]}")
+    if buffer.dropped_items != 3:
+        raise AssertionError(f"ring buffer: {buffer.dropped_items} items dropped, expected 3")
+
+
+def bench_throughput(data: bytes, chunk: int, repeat: int = 3):
+    pieces = chunks(data, chunk, seed=7)
+
+    def run():
+        done = threading.Event()
+        segments = [0]
+
+        def on_text(text):
+            segments[0] += 1
+            if '@@END@@' in text:
+                done.set()
+
+        handler = _handler(on_text)
+        for piece in pieces:
+            handler.process_bytes(piece)
+        handler.process_bytes(_END)
+        done.wait(60)
+        handler.stop()
+        return segments[0]
+
+    return harness.measure('stream.throughput', run, len(data), repeat)
+
+
+def bench_latency(lines: int = 2000, rate: float = 23040.0):
+    """
+    Args:
+        lines: Lines sent
+        rate: Bytes per second (default: 230400 baud)
+    """
+    sent = {}
+    latencies = []
+    done = threading.Event()
+
+    def on_text(text):
+        now = time.perf_counter()
+        for match in _SEQ.finditer(text):
+            latencies.append(now - sent[int(match.group(1))])
+        if len(latencies) >= lines:
+            done.set()
+
+    handler = _handler(on_text)
+    total = 0
+    start = time.perf_counter()
+    for i in range(lines):
+        line = f'\x1b[0;32mI ({i}) bench: seq={i} payload=0x{i:08x}\x1b[0m\n'.encode()
+        total += len(line)
+
+        # Steady pacing against the wire rate
+        wait = start + total / rate - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+
+        sent[i] = time.perf_counter()
+        handler.process_bytes(line)
+
+    done.wait(10)
+    handler.stop()
+    return harness.latency_result('stream.latency', latencies)
+
+
+def run(args):
+    data = generate_session(int(args.mb * 1024 * 1024))
+    check_ring_buffer()
+    return [bench_throughput(data, args.chunk, args.repeat),
+            bench_latency(args.lines)]
+
+
+def add_arguments(parser):
+    parser.add_argument('--lines', type=int, default=2000, help='Lines of the latency run')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=4, help='Size of the generated session in MB')
+    parser.add_argument('--chunk', type=int, default=4096, help='Maximum bytes per read')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark (the best is reported)')
+    add_arguments(parser)
+    for result in run(parser.parse_args()):
+        harness.print_result(result)
+
+
+if __name__ == '__main__':
+    main()
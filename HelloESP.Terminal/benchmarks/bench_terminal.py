@@ -0,0 +1,249 @@
+"""
+Benchmark of the terminal text path.
+
+- terminal.tokenizer: AnsiParser on the decoded session (escape sequences,
+  control characters, styles), as done by TerminalHandler.append_terminal
+- terminal.scrollback: the edit operations applied to the on-disk
+  scrollback, plus the search index update
+- terminal.search: indexed queries over the scrollback; every query is
+  also checked against a plain re.finditer over the same lines, so a
+  block skipped by mistake fails the run
+- terminal.render: the whole TerminalHandler (TextBuffer inserts included);
+  the TextBuffer must end up holding only the window around the viewport.
+  Needs GTK and a display, e.g. under Xvfb:
+
+      xvfb-run python benchmarks/bench_terminal.py
+
+  and is skipped when they are not available.
+
+Before measuring, progress bars (redrawn with CR and ESC[K) are fed in
+random reads through StreamHandler.process_bytes to the scrollback and,
+with GTK, to TerminalHandler.append_terminal: the line left must hold only
+the last value, or the run fails.
+
+Usage: python benchmarks/bench_terminal.py [--mb 4] [--chunk 4096]
+"""
+import argparse
+import random
+import threading
+
+import harness
+from generators import chunks, generate_session, progress_bar
+
+from AnsiParser import AnsiParser  # noqa: E402
+from ScrollbackStore import ScrollbackStore  # noqa: E402
+from SearchIndex import SearchIndex, compile_query  # noqa: E402
+from StreamHandler import StreamHandler  # noqa: E402
+
+# (query, regex) of terminal.search: plain text, tags and regular expressions whose
+# required literal is easy to get wrong (character codes, classes starting with ])
+SEARCH_QUERIES = [
+    ('heap_init', False), ('0x1f', False), ('tag:wifi', False), ('Guru Meditation', False),
+    (r'spi_flash=0x[0-9a-f]+', True), (r'\x45 \(\d+\)', True), (r'\u0057 \(', True),
+    (r'\N{LATIN SMALL LETTER W}ifi=', True), (r'\151pc0', True), (r'[^]a]ain:', True),
+    (r'[]E] \(', True), (r'httpd_ur\w=', True), (r'\[#+\.*\]', True), (r'httpd?_uri', True),
+]
+
+
+def _decoded_pieces(data: bytes, chunk: int):
+    return [piece.decode('utf-8', errors='replace') for piece in chunks(data, chunk, seed=7)]
+
+
+def _progress_text():
+    """
+    Progress bars split in random reads through StreamHandler.process_bytes, as the serial path does.
+
+    Returns:
+        (texts handed to the callback, line expected after each bar)
+    """
+    rng = random.Random(5)
+    data = b''.join(b'I (%d) app: step\n' % i + progress_bar(rng).encode() for i in range(3)) + b'I (9) app: done\n'
+
+    texts = []
+    done = threading.Event()
+
+    def on_text(text):
+        texts.append(text)
+        if 'done' in text:
+            done.set()
+
+    handler = StreamHandler(on_text, binary=True)
+    for piece in chunks(data, 16, seed=3):
+        handler.process_bytes(piece)
+    done.wait(10)
+    handler.stop()
+    return texts, '[' + '#' * 20 + '] 100%'
+
+
+def _check_progress(name: str, text: str, expected: str):
+    lines = [line for line in text.split('\n') if line.startswith('[')]
+    if len(lines) != 3 or any(line != expected for line in lines):
+        raise AssertionError(f"{name}: progress lines {lines!r}, expected 3 times {expected!r}")
+
+
+def check_progress_scrollback():
+    texts, expected = _progress_text()
+    parser = AnsiParser()
+    store = ScrollbackStore()
+    try:
+        for text in texts:
+            for op in parser.parse(text):
+                store.apply_op(op)
+        store.flush()
+        _check_progress('terminal.scrollback', store.get_text(), expected)
+    finally:
+        store.close()
+
+
+def bench_tokenizer(pieces, total_bytes, repeat):
+    def run():
+        parse = AnsiParser().parse
+        return sum(len(parse(piece)) for piece in pieces)
+
+    return harness.measure('terminal.tokenizer', run, total_bytes, repeat)
+
+
+def bench_scrollback(pieces, total_bytes, repeat):
+    parser = AnsiParser()
+    ops = [parser.parse(piece) for piece in pieces]
+
+    def run():
+        store = ScrollbackStore()
+        index = SearchIndex(store.get_text)
+        try:
+            for batch in ops:
+                for op in batch:
+                    store.apply_op(op)
+                store.flush()
+                index.update(len(store))
+            return len(store)
+        finally:
+            store.close()
+
+    return harness.measure('terminal.scrollback', run, total_bytes, repeat)
+
+
+def bench_search(pieces, total_bytes, repeat):
+    parser = AnsiParser()
+    store = ScrollbackStore()
+    index = SearchIndex(store.get_text)
+    try:
+        for piece in pieces:
+            for op in parser.parse(piece):
+                store.apply_op(op)
+        store.flush()
+        index.update(len(store))
+        lines = store.get_text()[:-1].split('\n')
+
+        queries = [compile_query(query, regex) for query, regex in SEARCH_QUERIES]
+        for (query, _), (pattern, literal) in zip(SEARCH_QUERIES, queries):
+            expected = SearchIndex.match_lines(pattern, 0, lines)
+            found = [match for batch in index.search(pattern, literal) for match in batch]
+            if found != expected:
+                raise AssertionError(f"terminal.search: {query!r} (literal {literal!r}) found "
+                                     f"{len(found)} matches, re.finditer {len(expected)}")
+
+        def run():
+            return sum(len(batch) for pattern, literal in queries for batch in index.search(pattern, literal))
+
+        return harness.measure('terminal.search', run, total_bytes * len(queries), repeat)
+    finally:
+        store.close()
+
+
+def bench_render(pieces, total_bytes, repeat):
+    """TerminalHandler end to end, None without GTK or a display"""
+    try:
+        import gi
+        gi.require_version('Gtk', '3.0')
+        from gi.repository import Gtk, GLib
+    except (ImportError, ValueError):
+        print('terminal.render skipped: GTK not available')
+        return None
+
+    if not Gtk.init_check(None)[0]:
+        print('terminal.render skipped: no display (run under xvfb-run)')
+        return None
+
+    from PipelineStats import pipeline
+    from TerminalHandler import TerminalHandler
+
+    context = GLib.MainContext.default()
+
+    # The TextBuffer after progress bars fed through the stream handler
+    texts, expected = _progress_text()
+    handler = TerminalHandler(name='progress')
+    window = Gtk.OffscreenWindow()
+    window.add(handler.get_widget())
+    window.show_all()
+    try:
+        for text in texts:
+            handler.append_terminal(text)
+        while handler.update_pending or context.pending():
+            context.iteration(False)
+        buffer = handler.terminal_buffer
+        _check_progress('terminal.render', buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), False),
+                        expected)
+    finally:
+        window.destroy()
+        if handler.scrollback is not None:
+            handler.scrollback.close()
+
+    pipeline.enable()
+
+    def run():
+        handler = TerminalHandler(name='bench')
+        window = Gtk.OffscreenWindow()
+        window.add(handler.get_widget())
+        window.show_all()
+        try:
+            for piece in pieces:
+                handler.append_terminal(piece)
+                while context.pending():
+                    context.iteration(False)
+            while handler.update_pending or context.pending():
+                context.iteration(False)
+            lines = handler.terminal_buffer.get_line_count()
+            if lines > handler._window_lines():
+                raise AssertionError(f"terminal.render: {lines} lines in the TextBuffer, "
+                                     f"window of {handler._window_lines()}")
+            return lines
+        finally:
+            window.destroy()
+            if handler.scrollback is not None:
+                handler.scrollback.close()
+
+    result = harness.measure('terminal.render', run, total_bytes, repeat)
+
+    # Time of the render batches, from the pipeline instrumentation
+    work = pipeline.stage('insert:bench').work
+    result.update({'batch_p50_us': work.percentile(50) * 1000000, 'batch_p99_us': work.percentile(99) * 1000000})
+    pipeline.enable(False)
+    return result
+
+
+def run(args):
+    data = generate_session(int(args.mb * 1024 * 1024))
+    pieces = _decoded_pieces(data, args.chunk)
+    check_progress_scrollback()
+
+    results = [bench_tokenizer(pieces, len(data), args.repeat),
+               bench_scrollback(pieces, len(data), args.repeat),
+               bench_search(pieces, len(data), args.repeat)]
+    render = bench_render(pieces, len(data), args.repeat)
+    if render is not None:
+        results.append(render)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=4, help='Size of the generated session in MB')
+    parser.add_argument('--chunk', type=int, default=4096, help='Maximum bytes per read')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark (the best is reported)')
+    for result in run(parser.parse_args()):
+        harness.print_result(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of the terminal text tokenizer.
+
+Compares the cost per MB of ESP-IDF style log text of the old
+append_terminal pipeline (normalize_ansi, control sequence loop, sanitize,
+SGR split with copied tag sets) with the single pass AnsiParser.
+
+Usage: python benchmarks/bench_tokenizer.py [--mb 4] [--chunk 4096]
+"""
+import argparse
+import re
+
+import harness
+from generators import chunks, generate_log
+
+from AnsiParser import AnsiParser, sgr_code_tags  # noqa: E402
+from generalFunctions import contains_alphanumeric  # noqa: E402
+
+
+class LegacyTokenizer:
+    """The text passes of the previous TerminalHandler.append_terminal, without the TextBuffer."""
+
+    def __init__(self):
+        self.ansi_pattern = re.compile(r'(?:\\x1b|\x1b)\[([0-9;]*)m')
+
+    def normalize_ansi(self, text):
+        return self.ansi_pattern.sub(lambda match: f"\x1b[{match.group(1)}m", text)
+
+    def _handle_control_sequences(self, text):
+        control_chars = ['\x08', '\r', '\x1b[K', '\x1b[2K', '\x1b[1K']
+        result = []
+        i = 0
+        while i < len(text):
+            handled = False
+            for seq in control_chars:
+                if text[i:].startswith(seq):
+                    i += len(seq)
+                    handled = True
+                    break
+            if not handled:
+                result.append(text[i])
+                i += 1
+        return ''.join(result)
+
+    def _sanitize_text(self, text):
+        text = self._handle_control_sequences(text)
+        parts = []
+        current_pos = 0
+        for match in re.finditer(r'\x1b\[[0-9;]*m', text):
+            start, end = match.span()
+            parts.append(''.join(char for char in text[current_pos:start]
+                                 if char in '\n\t' or (32 <= ord(char) <= 126) or ord(char) > 159))
+            parts.append(text[start:end])
+            current_pos = end
+        parts.append(''.join(char for char in text[current_pos:]
+                             if char in '\n\t' or (32 <= ord(char) <= 126) or ord(char) > 159))
+        return ''.join(parts)
+
+    @staticmethod
+    def _update_tags(codes, current_tags):
+        for code in codes:
+            if code == '0':
+                current_tags.clear()
+            else:
+                new_tags = set(sgr_code_tags(code))
+                if new_tags:
+                    if any(tag.startswith('fg_') for tag in new_tags):
+                        current_tags = {tag for tag in current_tags if not tag.startswith('fg_')}
+                    if any(tag.startswith('bg_') for tag in new_tags):
+                        current_tags = {tag for tag in current_tags if not tag.startswith('bg_')}
+                    current_tags.update(new_tags)
+        return current_tags
+
+    def parse(self, text):
+        if not text or not contains_alphanumeric(text):
+            return []
+        text = self.normalize_ansi(text)
+        text = self._sanitize_text(text)
+
+        segments = []
+        last_position = 0
+        current_tags = set()
+        for match in self.ansi_pattern.finditer(text):
+            start, end = match.span()
+            if start > last_position:
+                segments.append((text[last_position:start], current_tags.copy()))
+            codes = match.group(1).split(';') if match.group(1) else ['0']
+            current_tags = self._update_tags(codes, current_tags)
+            last_position = end
+        if last_position < len(text):
+            segments.append((text[last_position:], current_tags.copy()))
+        return segments
+
+
+def run(args):
+    text = generate_log(int(args.mb * 1024 * 1024))
+    pieces = chunks(text, args.chunk)
+    total_bytes = len(text.encode('utf-8'))
+
+    legacy = LegacyTokenizer().parse
+    current = AnsiParser().parse
+    return [harness.measure('tokenizer.legacy', lambda: sum(len(legacy(piece)) for piece in pieces),
+                            total_bytes, args.repeat),
+            harness.measure('tokenizer.one_pass', lambda: sum(len(current(piece)) for piece in pieces),
+                            total_bytes, args.repeat)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=4, help='Size of the generated log in MB')
+    parser.add_argument('--chunk', type=int, default=4096, help='Characters per append_terminal call')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per tokenizer (the best is reported)')
+    legacy, current = run(parser.parse_args())
+
+    harness.print_result(legacy)
+    harness.print_result(current)
+    print(f"speedup    {legacy['seconds'] / current['seconds']:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+End-to-end benchmark of the file transfer and command protocol, against
+the virtual device on a pty (no board needed).
+
+- transfer.upload / transfer.download: SerialCommandHandler.write_file and
+  read_file of a random file; the result also reports the share of the
+  link rate achieved (wire efficiency); --window 0 measures the
+  stop-and-wait upload instead of the windowed one. Both also report the
+  retries and the chunk sizes the transfer adapted to; --max-chunk 0
+  emulates firmware without chunk size negotiation. --payload log sends
+  a generated ESP-IDF log (compressible) instead of random bytes, to
+  measure the compressed upload (--no-compress: without)
+- transfer.command: round trip of execute_command
+
+Needs pyserial (for the pty), no PyGObject nor display.
+
+Usage: python benchmarks/bench_transfer.py [--kb 64] [--baud 230400] [--latency 0.002] [--window 8]
+"""
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+
+import harness
+from generators import generate_session
+from virtual_device import VirtualDevice
+
+import serial  # noqa: E402
+
+from StreamHandler import StreamHandler  # noqa: E402
+
+
+class _Host:
+    """The parts of SerialInterface used by SerialCommandHandler, without the UI"""
+
+    def __init__(self, port: str, baudrate: int):
+        self.serial_conn = serial.Serial(port, baudrate, timeout=2)
+        self.block_serial = False
+        self.redirect_serial = False
+        self.last_serial_output = None
+        self.stream_handler = StreamHandler(lambda text: None, binary=True)
+        self.ui_events = self
+
+    def post(self, kind, value=None):
+        pass
+
+    def close(self):
+        self.stream_handler.stop()
+        self.serial_conn.close()
+
+
+def _quiet():
+    """The transfer code prints every line it receives"""
+    devnull = open(os.devnull, 'w')
+    stack = contextlib.ExitStack()
+    stack.enter_context(devnull)
+    stack.enter_context(contextlib.redirect_stdout(devnull))
+    return stack
+
+
+def run(args):
+    try:
+        from new_transfer_files import SerialCommandError, SerialCommandHandler
+    except ImportError as e:
+        print(f'transfer skipped: {e}')
+        return []
+
+    if args.payload == 'log':
+        data = generate_session(int(args.kb * 1024), seed=11)
+    else:
+        data = random.Random(11).randbytes(int(args.kb * 1024))
+    wire_rate = args.baud / 10 if args.baud else 0.0
+
+    device = VirtualDevice(args.baud, args.latency, args.jitter, args.corrupt, args.drop,
+                           max_chunk=args.max_chunk, seed=1)
+    host = _Host(device.start(), args.baud or 230400)
+    handler = SerialCommandHandler(host)
+    handler.windowed_transfers = args.window > 0
+    handler.window_size = max(args.window, 1)
+    handler.compression = not args.no_compress
+    results = []
+    try:
+        with _quiet(), tempfile.TemporaryDirectory() as partial_dir:
+            handler.partial_dir = partial_dir  # Not the user's partial downloads
+            start = time.perf_counter()
+            ok, message = handler.write_file('bench.bin', data)
+            upload = time.perf_counter() - start
+            upload_stats = handler.last_transfer
+
+            start = time.perf_counter()
+            try:
+                downloaded = handler.read_file('bench.bin')
+            except SerialCommandError as e:
+                downloaded = str(e)  # READ_FILE has no retransmission: a lost response ends it
+            download = time.perf_counter() - start
+            download_stats = handler.last_transfer
+
+            latencies = []
+            lost = 0
+            for _ in range(args.commands):
+                start = time.perf_counter()
+                try:
+                    handler.execute_command('version')
+                except SerialCommandError:
+                    lost += 1  # Answer lost (--drop): not a round trip
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        if not ok:
+            print(f'upload failed: {message}')
+        if downloaded != data:
+            print(f"download failed: {downloaded if isinstance(downloaded, str) else 'mismatch'}")
+
+        for name, elapsed, stats in (('transfer.upload', upload, upload_stats),
+                                     ('transfer.download', download, download_stats)):
+            result = harness.throughput_result(name, elapsed, len(data))
+            if wire_rate:
+                result['wire_efficiency'] = len(data) / elapsed / wire_rate
+            result.update({'mode': stats.mode, 'retries': stats.retries, 'timeouts': stats.timeouts,
+                           'chunk_sizes': [size for _, size in stats.chunk_sizes],
+                           'compression_ratio': stats.compression_ratio})
+            results.append(result)
+        results.append(harness.latency_result('transfer.command', latencies))
+        if lost:
+            print(f'{lost} commands lost')
+    finally:
+        host.close()
+        device.stop()
+
+    for result in results:
+        if 'wire_efficiency' in result:
+            print(f"{result['name']:<32} {result['wire_efficiency']:.1%} of the link rate ({result['mode']}), "
+                  f"{result['retries']} retries, chunks {result['chunk_sizes']}, "
+                  f"compression {result['compression_ratio']:.1f}x")
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('--kb', type=float, default=64, help='Size of the transferred file in KB')
+    parser.add_argument('--baud', type=int, default=230400, help='Simulated baud rate (0: unthrottled)')
+    parser.add_argument('--latency', type=float, default=0.002, help='Device response delay (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra response delay (s)')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='Probability of a corrupted KB of chunk data')
+    parser.add_argument('--drop', type=float, default=0.0, help='Probability of a lost response')
+    parser.add_argument('--window', type=int, default=8, help='Upload chunks in flight (0: stop-and-wait)')
+    parser.add_argument('--max-chunk', type=int, default=4096, help='Biggest chunk of the device (0: not negotiated)')
+    parser.add_argument('--payload', choices=('random', 'log'), default='random', help='Content of the transferred file')
+    parser.add_argument('--no-compress', action='store_true', help="Don't compress the upload")
+    parser.add_argument('--commands', type=int, default=20, help='Command round trips measured')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    for result in run(parser.parse_args()):
+        harness.print_result(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Synthetic ESP-IDF serial traffic for the benchmarks.
+
+Every generator is deterministic for a given seed, so two runs (or two
+commits) measure the same input.
+"""
+import random
+from typing import Dict, Optional
+
+LEVELS = [('I', '\x1b[0;32m'), ('W', '\x1b[0;33m'), ('E', '\x1b[0;31m'), ('D', '')]
+TAGS = ['wifi', 'esp_netif_handler', 'main', 'httpd_uri', 'heap_init', 'spi_flash']
+TASKS = ['IDLE0', 'IDLE1', 'main', 'tiT', 'wifi', 'esp_timer', 'ipc0', 'ipc1', 'sys_evt']
+
+# Share of each kind of traffic in generate_session (the rest is log lines)
+DEFAULT_MIX = {
+    'monitor': 0.02,    # !!TASKMONITOR!! blocks
+    'backtrace': 0.002,  # Guru Meditation + backtrace
+    'progress': 0.02,   # Progress bar redrawn with \r and ESC[K
+    'noise': 0.005,     # Binary garbage (baud mismatch, boot ROM)
+}
+
+
+def log_line(rng: random.Random, ms: int) -> str:
+    """A colored "I (1234) TAG: msg" line."""
+    level, color = rng.choice(LEVELS)
+    tag = rng.choice(TAGS)
+    message = ' '.join(f'{rng.choice(TAGS)}={rng.randint(0, 65535):#x}' for _ in range(rng.randint(1, 6)))
+    reset = '\x1b[0m' if color else ''
+    return f'{color}{level} ({ms}) {tag}: {message}{reset}\n'
+
+
+def monitor_block(rng: random.Random) -> str:
+    """A task monitor report, as printed between the !!TASKMONITOR!! tags."""
+    rows = [f'{task:<16}{rng.randint(0, 10 ** 7):>10}{rng.randint(0, 100):>5}%\n' for task in TASKS]
+    return '!!TASKMONITOR!!!!clear!!' + 'Task            Runtime  CPU\n' + ''.join(rows) + '!!end!!!!TASKMONITOREND!!\n'
+
+
+def backtrace(rng: random.Random) -> str:
+    """A panic with its compressed backtrace line."""
+    frames = ' '.join(f'0x400{rng.randint(0, 0xfffff):05x}:0x3ffb{rng.randint(0, 0xffff):04x}'
+                      for _ in range(rng.randint(4, 12)))
+    return ("Guru Meditation Error: Core  0 panic'ed (LoadProhibited). Exception was unhandled.\n"
+            f"Core  0 register dump:\nPC      : 0x400{rng.randint(0, 0xfffff):05x}\n\n"
+            f"Backtrace: {frames}\n\nELF file SHA256: {rng.getrandbits(64):016x}\n\nRebooting...\n")
+
+
+def progress_bar(rng: random.Random, steps: int = 10) -> str:
+    """A progress bar redrawn in place."""
+    parts = []
+    for i in range(steps + 1):
+        done = i * 20 // steps
+        parts.append(f'\r[{"#" * done}{"." * (20 - done)}] {i * 100 // steps}%\x1b[K')
+    return ''.join(parts) + '\n'
+
+
+def binary_noise(rng: random.Random, size: int = 64) -> bytes:
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def generate_log(size: int, seed: int = 1) -> str:
+    """ESP-IDF like colored log lines, with a few progress lines (CR, ESC[K) and control characters."""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    ms = 0
+    while total < size:
+        ms += rng.randint(1, 50)
+        line = log_line(rng, ms)
+
+        roll = rng.random()
+        if roll < 0.02:
+            line = f'\rprogress {rng.randint(0, 100)}%\x1b[K' + line
+        elif roll < 0.03:
+            line = '\\x1b[0;36m' + line  # Escaped sequence, as echoed by some scripts
+        elif roll < 0.04:
+            line = line.replace(' ', '\x00', 1)
+
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines)
+
+
+def generate_session(size: int, seed: int = 1, mix: Optional[Dict[str, float]] = None) -> bytes:
+    """
+    Raw bytes of a serial session: log lines mixed with monitor blocks,
+    backtraces, progress bars and binary noise.
+
+    Args:
+        size: Approximate size in bytes
+        seed: Random seed
+        mix: Share of each kind of traffic (default: DEFAULT_MIX)
+    """
+    mix = DEFAULT_MIX if mix is None else mix
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    ms = 0
+    while total < size:
+        ms += rng.randint(1, 50)
+        roll = rng.random()
+        if roll < mix.get('monitor', 0):
+            data = monitor_block(rng).encode()
+        elif roll < mix.get('monitor', 0) + mix.get('backtrace', 0):
+            data = backtrace(rng).encode()
+        elif roll < mix.get('monitor', 0) + mix.get('backtrace', 0) + mix.get('progress', 0):
+            data = progress_bar(rng).encode()
+        elif roll < sum(mix.values()):
+            data = binary_noise(rng, rng.randint(8, 128))
+        else:
+            data = log_line(rng, ms).encode()
+        parts.append(data)
+        total += len(data)
+    return b''.join(parts)
+
+
+def chunks(data, size: int, seed: Optional[int] = None):
+    """
+    Split data in chunks of size, or of random size up to size when a seed
+    is given (reads of a serial port are rarely aligned).
+    """
+    if seed is None:
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    rng = random.Random(seed)
+    pieces = []
+    i = 0
+    while i < len(data):
+        n = rng.randint(1, size)
+        pieces.append(data[i:i + n])
+        i += n
+    return pieces
@@ -0,0 +1,132 @@
+"""
+Timing helpers and result files shared by the benchmarks.
+
+A result is a flat dict (name, MB/s, ms per MB, latency percentiles); a
+run is saved as JSON together with the commit it was measured on, and
+can be compared with a previous run.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def measure(name: str, function: Callable[[], int], total_bytes: int, repeat: int = 3) -> Dict:
+    """
+    Best of repeat runs of function, which returns a count of produced items.
+
+    Returns:
+        Result dict
+    """
+    best = None
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return throughput_result(name, best, total_bytes, items)
+
+
+def throughput_result(name: str, elapsed: float, total_bytes: int, items: int = 0) -> Dict:
+    mb = total_bytes / (1024 * 1024)
+    return {
+        'name': name,
+        'bytes': total_bytes,
+        'items': items,
+        'seconds': elapsed,
+        'mb_per_s': mb / elapsed if elapsed > 0 else 0.0,
+        'ms_per_mb': elapsed / mb * 1000 if mb > 0 else 0.0,
+    }
+
+
+def latency_result(name: str, latencies: List[float]) -> Dict:
+    """Result of a paced run: per-item latencies in seconds."""
+    return {
+        'name': name,
+        'samples': len(latencies),
+        'p50_us': percentile(latencies, 50) * 1000000,
+        'p99_us': percentile(latencies, 99) * 1000000,
+        'max_us': max(latencies) * 1000000 if latencies else 0.0,
+    }
+
+
+def print_result(result: Dict):
+    line = f"{result['name']:<32}"
+    if 'mb_per_s' in result:
+        line += f" {result['ms_per_mb']:9.1f} ms/MB {result['mb_per_s']:8.2f} MB/s"
+    if 'p50_us' in result:
+        line += f"  p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us"
+    print(line)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def save_results(results: List[Dict], filepath: str, params: Dict):
+    data = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': params,
+        'results': results,
+    }
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def compare_results(results: List[Dict], baseline_path: str, threshold: float = 0.10) -> int:
+    """
+    Confronta i risultati con una run precedente.
+
+    Args:
+        results: Current results
+        baseline_path: JSON saved by save_results
+        threshold: Relative slowdown reported as a regression
+
+    Returns:
+        Number of regressions
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result['name']: result for result in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\n{'compared with ' + baseline_path:<32}")
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            continue
+
+        # Lower is better for both metrics
+        for key in ('ms_per_mb', 'p99_us'):
+            if key in result and old.get(key):
+                change = result[key] / old[key] - 1
+                flag = ''
+                if change > threshold:
+                    flag = '  REGRESSION'
+                    regressions += 1
+                print(f"{result['name']:<32} {key:<10} {old[key]:10.1f} -> {result[key]:10.1f} ({change:+.1%}){flag}")
+    return regressions
@@ -0,0 +1,66 @@
+"""
+Runs the whole benchmark suite and saves the results, to compare commits.
+
+    python benchmarks/run_all.py --output results.json
+    git checkout other-branch
+    python benchmarks/run_all.py --baseline results.json
+
+With --baseline the exit status is 1 when a result is slower than the
+baseline by more than --threshold (ms per MB, or p99 latency).
+
+The file transfer benchmark against the virtual device is slow (it runs at
+the simulated baud rate) and only runs when asked: --only transfer
+
+Usage: python benchmarks/run_all.py [--mb 4] [--only stream,terminal]
+"""
+import argparse
+import sys
+
+import harness
+import bench_parsers
+import bench_stream
+import bench_terminal
+import bench_tokenizer
+import bench_transfer
+
+SUITES = {
+    'tokenizer': bench_tokenizer,
+    'stream': bench_stream,
+    'terminal': bench_terminal,
+    'parsers': bench_parsers,
+    'transfer': bench_transfer,  # Slow (runs at the simulated baud rate): only with --only
+}
+DEFAULT_SUITES = 'tokenizer,stream,terminal,parsers'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=4, help='Size of the generated input in MB')
+    parser.add_argument('--chunk', type=int, default=4096, help='Maximum bytes per read')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark (the best is reported)')
+    parser.add_argument('--only', default=DEFAULT_SUITES, help=f"Comma separated suites to run ({', '.join(SUITES)})")
+    parser.add_argument('--output', help='Save the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with the results saved in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Slowdown reported as a regression')
+    bench_stream.add_arguments(parser)
+    bench_transfer.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for name in args.only.split(','):
+        for result in SUITES[name].run(args):
+            harness.print_result(result)
+            results.append(result)
+
+    if args.output:
+        harness.save_results(results, args.output,
+                             {'mb': args.mb, 'chunk': args.chunk, 'repeat': args.repeat, 'lines': args.lines,
+                              'kb': args.kb, 'baud': args.baud, 'latency': args.latency, 'window': args.window,
+                              'max_chunk': args.max_chunk, 'payload': args.payload, 'no_compress': args.no_compress})
+
+    if args.baseline and harness.compare_results(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,674 @@
+"""
+Virtual HelloESP device on a local pseudo-terminal.
+
+Implements the serial protocol spoken by SerialCommandHandler, so file
+transfers and commands can be exercised without a board:
+
+    $$$PING$$$                      -> !!OK!!:!!!PONG!!!
+    $$$SILENCE_ON$$$ / _OFF$$$      stop / resume the background log
+    $$$WRITE_FILE$$$name,size,md5   -> !!OK!!:READY: Wait for chunks
+    $$$CHUNK$$$len,md5 + len bytes  -> !!OK!!:READY: Ready for chunk, then !!OK!!:Chunk received
+    $$$WRITE_FILE_W$$$name,size,md5,chunk,window -> !!OK!!:READY: Window N
+    $$$WCHUNK$$$seq,len,md5 + len bytes -> !!OK!!:ACK:next or !!ERROR!!:NACK:seq,
+                                    then !!OK!!:File written after the last one
+    $$$CHECK_FILE$$$name            -> !!OK!!:size:...
+    $$$READ_FILE$$$name             -> !!OK!!:size,md5, chunks acknowledged by "OK", !!OK!!:File sent
+    $$$READ_CHUNK$$$name,offset,len -> !!OK!!:offset,len,md5,size + len bytes
+    $$$TRANSFER_CAPS$$$             -> !!OK!!:max_chunk=N,window=N,read_chunk=1,resume=1
+    $$$RESUME_INFO$$$name,size,md5  -> !!OK!!:offset,md5 of the partial upload of that file
+    $$$HASH_RANGE$$$name,offset,len -> !!OK!!:md5,size
+    $$$BLOCK_SUMS$$$name,block      -> !!OK!!:!!SUMS!!, !!OK!!:weak:md5[:16];... (8 per line), !!OK!!:!!END!!
+    $$$DELTA_FILE$$$name,size,md5,block -> !!OK!!:READY, then
+    $$$DCOPY$$$first,count / $$$DDATA$$$len,md5 + len bytes (no answer),
+    $$$DEND$$$                      -> !!OK!!:File written
+    $$$LIST_FILES$$$                -> !!OK!!:!!LIST!!, !!OK!!:name,size..., !!OK!!:!!END!!
+    $$$DELETE_FILE$$$name           -> !!OK!!:File deleted
+    $$$CMD$$$command                -> !!OK!!:output
+
+Responses are ESP-IDF log lines ("I (1234) HELLOESP: !!OK!!:..."). The link
+is throttled to the baud rate (10 bits per byte) in both directions, each
+one full duplex on its own schedule: bytes are delivered in small slices,
+each only once its last bit would be on the other side. Every response
+waits latency +- jitter, and errors can be injected: corrupted
+bytes (the device reports a hash mismatch on uploads, the host sees one on
+downloads; the rate is per KB, so bigger chunks fail more often) and lost
+responses (the host times out). With window=0 the device behaves like
+firmware without the windowed upload (WRITE_FILE_W is an unknown command),
+with max_chunk=0 like firmware without TRANSFER_CAPS and READ_CHUNK.
+An upload that doesn't complete stays as a partial file that a later
+WRITE_FILE_W of the same file can resume (name,size,md5,chunk,window,offset).
+With a seventh argument "deflate" the WCHUNK payloads are one raw deflate
+stream, decompressed chunk by chunk in sequence order.
+With delta=False the device doesn't offer the delta upload, with
+deflate=False the compressed one.
+
+Usage: python benchmarks/virtual_device.py [--baud 230400] [--latency 0.002]
+       prints the pty to connect to and runs until Ctrl+C
+"""
+import argparse
+import hashlib
+import os
+import queue
+import random
+import select
+import sys
+import threading
+import time
+import traceback
+import tty
+import zlib
+from typing import Dict, Optional
+
+_COMMAND_PREFIX = b'$$$'
+_LOG_TAGS = ['wifi', 'main', 'httpd', 'heap_init']
+
+
+class VirtualDevice:
+    """
+    HelloESP firmware emulator behind a pty.
+
+    The host side opens port (a /dev/pts/N path) with pyserial like a real
+    board; the device runs in a background thread.
+    """
+
+    def __init__(self, baudrate: int = 230400, latency: float = 0.0, jitter: float = 0.0,
+                 corrupt_rate: float = 0.0, drop_rate: float = 0.0,
+                 log_interval: float = 0.0, chunk_size: int = 1024, window: int = 16,
+                 max_chunk: int = 4096, delta: bool = True, deflate: bool = True,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            baudrate: Simulated link speed (0: unthrottled)
+            latency: Delay before each response (s)
+            jitter: Random extra delay, uniform in [0, jitter] (s)
+            corrupt_rate: Probability that a KB of chunk data gets a flipped byte
+            drop_rate: Probability that a response is never sent
+            log_interval: Period of the background log lines (0: none)
+            chunk_size: Size of the chunks sent by READ_FILE
+            window: Chunks accepted in flight by WRITE_FILE_W (0: not supported)
+            max_chunk: Biggest chunk accepted (0: TRANSFER_CAPS not supported, 1 KB)
+            delta: Offer the delta upload (BLOCK_SUMS, DELTA_FILE)
+            deflate: Accept compressed WRITE_FILE_W
+            seed: Random seed of jitter and error injection
+        """
+        self.baudrate = baudrate
+        self.latency = latency
+        self.jitter = jitter
+        self.corrupt_rate = corrupt_rate
+        self.drop_rate = drop_rate
+        self.log_interval = log_interval
+        self.chunk_size = chunk_size
+        self.window = window
+        self.max_chunk = max_chunk
+        self.delta = delta
+        self.deflate = deflate
+        self.rng = random.Random(seed)
+
+        self.files: Dict[str, bytes] = {}
+        self.partials: Dict[str, list] = {}  # name -> [size, md5, received] of interrupted uploads
+        self.commands = {'version': 'HelloESP virtual device 1.0', 'free': '262144'}
+
+        # Statistics
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.responses = 0
+        self.corrupted = 0
+        self.dropped = 0
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._buffer = bytearray()
+        self._silent = False
+        self._upload = None  # [name, size, md5, received bytearray] of the file being written
+        self._windowed = None  # [chunk size, next expected seq, {seq: out of order chunk}, decompressor] of WRITE_FILE_W
+        self._chunk = None  # (length, md5, seq) of the chunk expected next, seq None for CHUNK, 'delta' for DDATA
+        self._delta = None  # [name, size, md5, block size, old data, new data, failed] of DELTA_FILE
+        self._download = None  # [data, offset] of the file being read
+        self._last_upload = None
+        self._boot = time.monotonic()
+
+        # Link schedule: time.monotonic() when the bytes already sent in each direction are all through
+        self._slice = max(16, int(baudrate / 10 * 0.005)) if baudrate else 65536  # ~5 ms of link
+        self._rx_time = 0.0
+        self._tx_time = 0.0
+        self._received = queue.Queue()  # (delivery time, bytes) from the receive thread, None at stop
+
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread = None
+        self._receive_thread = None
+
+    ###
+    ### Lifecycle
+    ###
+
+    def start(self) -> str:
+        """Start the device thread; returns the port to open."""
+        if self._thread is None:
+            self._receive_thread = threading.Thread(target=self._receive, name="VirtualDeviceRx")
+            self._receive_thread.daemon = True
+            self._receive_thread.start()
+            self._thread = threading.Thread(target=self._run, name="VirtualDevice")
+            self._thread.daemon = True
+            self._thread.start()
+        return self.port
+
+    def stop(self):
+        if self._thread is not None:
+            os.write(self._stop_w, b'x')
+            self._receive_thread.join(timeout=2.0)
+            self._thread.join(timeout=2.0)
+            self._thread = self._receive_thread = None
+        for fd in (self._master, self._slave, self._stop_r, self._stop_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    ###
+    ### Link
+    ###
+
+    def _wire_time(self, size: int) -> float:
+        return size * 10 / self.baudrate if self.baudrate else 0.0
+
+    def _write(self, data: bytes):
+        """Send data at the link rate: each slice is written when it would be through the wire"""
+        view = memoryview(data)
+        self._tx_time = max(time.monotonic(), self._tx_time)
+        for start in range(0, len(view), self._slice):
+            piece = view[start:start + self._slice]
+            self._tx_time += self._wire_time(len(piece))
+            delay = self._tx_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            while piece:
+                written = os.write(self._master, piece)
+                piece = piece[written:]
+        self.bytes_out += len(data)
+
+    def _respond(self, message: str, ok: bool = True):
+        """Send a protocol response after the configured latency (unless it gets lost)"""
+        if self.drop_rate and self.rng.random() < self.drop_rate:
+            self.dropped += 1
+            return
+
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        status = '!!OK!!:' if ok else '!!ERROR!!:'
+        self._write(f"{'I' if ok else 'E'} ({self._millis()}) HELLOESP: {status}{message}\n".encode())
+        self.responses += 1
+
+    def _corrupt(self, chunk: bytes) -> bytes:
+        """Flip a byte with probability corrupt_rate per KB"""
+        if not self.corrupt_rate or not chunk:
+            return chunk
+        if self.rng.random() >= 1 - (1 - self.corrupt_rate) ** (len(chunk) / 1024):
+            return chunk
+        self.corrupted += 1
+        position = self.rng.randrange(len(chunk))
+        return chunk[:position] + bytes([chunk[position] ^ 0xFF]) + chunk[position + 1:]
+
+    def _millis(self) -> int:
+        return int((time.monotonic() - self._boot) * 1000)
+
+    def _log_line(self):
+        tag = self.rng.choice(_LOG_TAGS)
+        self._write(f"\x1b[0;32mI ({self._millis()}) {tag}: heartbeat free={self.rng.randint(100000, 200000)}\x1b[0m\n".encode())
+
+    def _receive(self):
+        """
+        Read what the host writes as soon as it is written, and schedule its
+        delivery at the link rate (the device may be busy sending meanwhile).
+        """
+        try:
+            while True:
+                ready, _, _ = select.select([self._master, self._stop_r], [], [])
+                if self._stop_r in ready:
+                    return
+                data = os.read(self._master, 65536)
+                if not data:
+                    return
+                self.bytes_in += len(data)
+
+                self._rx_time = max(time.monotonic(), self._rx_time)
+                for start in range(0, len(data), self._slice):
+                    piece = data[start:start + self._slice]
+                    self._rx_time += self._wire_time(len(piece))
+                    self._received.put((self._rx_time, piece))
+        except OSError:
+            return
+        finally:
+            self._received.put(None)
+
+    def _run(self):
+        next_log = time.monotonic() + self.log_interval if self.log_interval else None
+        while True:
+            try:
+                timeout = None if next_log is None else max(0.0, next_log - time.monotonic())
+                try:
+                    item = self._received.get(timeout=timeout)
+                except queue.Empty:
+                    item = ()
+
+                if item is None:
+                    return
+                if item:
+                    delivery, data = item
+                    delay = delivery - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self._feed(data)
+
+                if next_log is not None and time.monotonic() >= next_log:
+                    next_log += self.log_interval
+                    if not self._silent and self._upload is None and self._download is None:
+                        self._log_line()
+            except OSError:
+                return
+            except Exception as e:
+                print("VirtualDevice exception: ", e)
+                traceback.print_exc(file=sys.stdout)
+
+    ###
+    ### Protocol
+    ###
+
+    def _feed(self, data: bytes):
+        self._buffer += data
+        while self._buffer:
+            if self._chunk is not None:
+                # Raw chunk data of a WRITE_FILE
+                length = self._chunk[0]
+                if len(self._buffer) < length:
+                    return
+                chunk = bytes(self._buffer[:length])
+                del self._buffer[:length]
+                self._on_chunk_data(chunk)
+                continue
+
+            end = self._buffer.find(b'\n')
+            if end < 0:
+                return
+            line = bytes(self._buffer[:end]).rstrip(b'\r')
+            del self._buffer[:end + 1]
+            self._on_line(line)
+
+    def _on_line(self, line: bytes):
+        if self._download is not None and line == b'OK':
+            self._send_next_chunk()
+            return
+
+        if not line.startswith(_COMMAND_PREFIX):
+            return
+        end = line.find(_COMMAND_PREFIX, len(_COMMAND_PREFIX))
+        if end < 0:
+            return
+
+        name = line[len(_COMMAND_PREFIX):end].decode('ascii', 'replace')
+        args = line[end + len(_COMMAND_PREFIX):].decode('utf-8', 'replace')
+
+        handler = getattr(self, '_cmd_' + name.lower(), None)
+        if handler is None:
+            self._respond(f"Unknown command {name}", ok=False)
+        else:
+            handler(args)
+
+    def _cmd_ping(self, args):
+        self._respond('!!!PONG!!!')
+
+    def _cmd_silence_on(self, args):
+        self._silent = True
+
+    def _cmd_silence_off(self, args):
+        self._silent = False
+
+    def _cmd_write_file(self, args):
+        try:
+            name, size, md5 = args.rsplit(',', 2)
+            size = int(size)
+        except ValueError:
+            self._respond("Invalid WRITE_FILE arguments", ok=False)
+            return
+        self._upload = [name, size, md5, bytearray()]
+        self._respond("READY: Wait for chunks")
+
+    def _cmd_chunk(self, args):
+        if self._upload is None:
+            self._respond("Chunk out of context", ok=False)
+            return
+        try:
+            length, md5 = args.split(',')
+            self._chunk = (int(length), md5, None)
+            self._check_length(self._chunk[0])
+        except ValueError:
+            self._respond("Invalid CHUNK arguments", ok=False)
+            return
+        self._respond("READY: Ready for chunk")
+
+    def _check_length(self, length: int):
+        if length > (self.max_chunk or 1024):
+            # A real device would overflow its buffer: the data is read and dropped
+            self._chunk = (length, '', self._chunk[2])
+
+    def _cmd_transfer_caps(self, args):
+        if not self.max_chunk:
+            self._respond("Unknown command TRANSFER_CAPS", ok=False)
+            return
+        self._respond(f"max_chunk={self.max_chunk},window={self.window},read_chunk=1,resume=1,delta={int(self.delta)},"
+                      f"deflate={int(self.deflate)}")
+
+    def _cmd_resume_info(self, args):
+        try:
+            name, size, md5 = args.rsplit(',', 2)
+            size = int(size)
+        except ValueError:
+            self._respond("Invalid RESUME_INFO arguments", ok=False)
+            return
+        received = self._partial(name, size, md5)
+        self._respond(f"{len(received)},{hashlib.md5(received).hexdigest()}")
+
+    def _partial(self, name: str, size: int, md5: str) -> bytes:
+        """Bytes held of an interrupted upload of exactly this file"""
+        if self._upload is not None and self._upload[0] == name:
+            # Interrupted without notice: what arrived in order is kept
+            self.partials[name] = [self._upload[1], self._upload[2], bytes(self._upload[3])]
+            self._upload = None
+            self._windowed = None
+        partial = self.partials.get(name)
+        if partial is None or partial[0] != size or partial[1] != md5:
+            return b''
+        return partial[2]
+
+    def _cmd_hash_range(self, args):
+        try:
+            name, offset, length = args.rsplit(',', 2)
+            offset, length = int(offset), int(length)
+        except ValueError:
+            self._respond("Invalid HASH_RANGE arguments", ok=False)
+            return
+        data = self.files.get(name)
+        if data is None:
+            self._respond("File not found", ok=False)
+            return
+        self._respond(f"{hashlib.md5(data[offset:offset + length]).hexdigest()},{len(data)}")
+
+    def _cmd_write_file_w(self, args):
+        if not self.window:
+            self._respond("Unknown command WRITE_FILE_W", ok=False)
+            return
+        try:
+            name, size, md5, chunk_size, window, *extra = args.split(',')
+            size, chunk_size, window = int(size), int(chunk_size), int(window)
+            offset = int(extra[0]) if extra else 0
+            codec = extra[1] if len(extra) > 1 else ''
+        except ValueError:
+            self._respond("Invalid WRITE_FILE_W arguments", ok=False)
+            return
+        if codec and (codec != 'deflate' or not self.deflate):
+            self._respond(f"Unsupported codec {codec}", ok=False)
+            return
+
+        received = self._partial(name, size, md5)
+        if offset > len(received):
+            self._respond(f"Cannot resume at {offset}, {len(received)} bytes held", ok=False)
+            return
+        self.partials.pop(name, None)
+        self._upload = [name, size, md5, bytearray(received[:offset])]
+        self._windowed = [chunk_size, 0, {}, zlib.decompressobj(-15) if codec else None]
+        self._respond(f"READY: Window {min(window, self.window)}")
+
+    def _cmd_wchunk(self, args):
+        try:
+            seq, length, md5 = args.split(',')
+            self._chunk = (int(length), md5, int(seq))
+            self._check_length(self._chunk[0])
+        except ValueError:
+            self._respond("Invalid WCHUNK arguments", ok=False)
+
+    def _on_chunk_data(self, chunk: bytes):
+        length, md5, seq = self._chunk
+        self._chunk = None
+
+        chunk = self._corrupt(chunk)
+        if seq == 'delta':
+            self._on_delta_data(chunk, md5)
+            return
+        if seq is not None:
+            self._on_window_chunk(seq, chunk, md5)
+            return
+
+        if hashlib.md5(chunk).hexdigest() != md5:
+            self._respond("Chunk hash mismatch", ok=False)
+            return
+
+        self._upload[3] += chunk
+        if len(self._upload[3]) < self._upload[1]:
+            self._respond(f"Chunk received {len(self._upload[3])}/{self._upload[1]}")
+            return
+        self._finish_upload()
+
+    def _on_window_chunk(self, seq: int, chunk: bytes, md5: str):
+        if self._upload is None:
+            # Retransmission after the end (the final answer got lost)
+            self._respond(f"File written {len(self.files.get(self._last_upload, b''))}")
+            return
+        if hashlib.md5(chunk).hexdigest() != md5:
+            self._respond(f"NACK:{seq}", ok=False)
+            return
+
+        chunk_size, expected, pending, decompressor = self._windowed
+        if seq >= expected:
+            pending[seq] = chunk
+        while expected in pending:
+            chunk = pending.pop(expected)
+            self._upload[3] += decompressor.decompress(chunk) if decompressor is not None else chunk
+            expected += 1
+        self._windowed[1] = expected
+
+        # Cumulative: duplicates get the same ACK again
+        self._respond(f"ACK:{expected}")
+        if len(self._upload[3]) >= self._upload[1]:
+            self._windowed = None
+            self._finish_upload()
+
+    def _cmd_block_sums(self, args):
+        if not self.delta:
+            self._respond("Unknown command BLOCK_SUMS", ok=False)
+            return
+        try:
+            name, block_size = args.rsplit(',', 1)
+            block_size = int(block_size)
+        except ValueError:
+            self._respond("Invalid BLOCK_SUMS arguments", ok=False)
+            return
+        data = self.files.get(name)
+        if data is None or block_size <= 0:
+            self._respond("File not found", ok=False)
+            return
+
+        sums = []
+        for offset in range(0, len(data), block_size):
+            block = data[offset:offset + block_size]
+            # rsync weak checksum: a = sum of the bytes, b = sum of the partial sums
+            a = sum(block) & 0xFFFF
+            b = sum((len(block) - i) * x for i, x in enumerate(block)) & 0xFFFF
+            sums.append(f"{(b << 16) | a:08x}:{hashlib.md5(block).hexdigest()[:16]}")
+
+        self._respond('!!SUMS!!')
+        for i in range(0, len(sums), 8):
+            self._respond(';'.join(sums[i:i + 8]))
+        self._respond('!!END!!')
+
+    def _cmd_delta_file(self, args):
+        if not self.delta:
+            self._respond("Unknown command DELTA_FILE", ok=False)
+            return
+        try:
+            name, size, md5, block_size = args.rsplit(',', 3)
+            size, block_size = int(size), int(block_size)
+        except ValueError:
+            self._respond("Invalid DELTA_FILE arguments", ok=False)
+            return
+        if name not in self.files:
+            self._respond("File not found", ok=False)
+            return
+        self._delta = [name, size, md5, block_size, self.files[name], bytearray(), False]
+        self._respond("READY")
+
+    def _cmd_dcopy(self, args):
+        if self._delta is None:
+            return
+        try:
+            first, count = (int(value) for value in args.split(','))
+        except ValueError:
+            self._delta[6] = True
+            return
+        block_size, old = self._delta[3], self._delta[4]
+        self._delta[5] += old[first * block_size:(first + count) * block_size]
+
+    def _cmd_ddata(self, args):
+        try:
+            length, md5 = args.split(',')
+            self._chunk = (int(length), md5, 'delta')
+            self._check_length(self._chunk[0])
+        except ValueError:
+            if self._delta is not None:
+                self._delta[6] = True
+
+    def _on_delta_data(self, chunk: bytes, md5: str):
+        if self._delta is None:
+            return
+        if hashlib.md5(chunk).hexdigest() != md5:
+            self._delta[6] = True
+        self._delta[5] += chunk
+
+    def _cmd_dend(self, args):
+        if self._delta is None:
+            self._respond("Delta out of context", ok=False)
+            return
+        name, size, md5, _, _, data, failed = self._delta
+        self._delta = None
+        if failed:
+            self._respond("Delta data hash mismatch", ok=False)
+        elif len(data) != size or hashlib.md5(data).hexdigest() != md5:
+            self._respond("File hash mismatch", ok=False)
+        else:
+            self.files[name] = bytes(data)
+            self._respond(f"File written {size}")
+
+    def _finish_upload(self):
+        name, size, file_md5, received = self._upload
+        self._upload = None
+        if hashlib.md5(received).hexdigest() != file_md5:
+            self._respond("File hash mismatch", ok=False)
+            return
+        self.files[name] = bytes(received)
+        self._last_upload = name
+        self._respond(f"File written {size}")
+
+    def _cmd_check_file(self, args):
+        if args in self.files:
+            self._respond(f"{len(self.files[args])}:{hashlib.md5(self.files[args]).hexdigest()}")
+        else:
+            self._respond("File not found", ok=False)
+
+    def _cmd_read_file(self, args):
+        data = self.files.get(args)
+        if data is None:
+            self._respond("File not found", ok=False)
+            return
+        self._respond(f"{len(data)},{hashlib.md5(data).hexdigest()}")
+        self._download = [data, 0]
+        self._send_next_chunk()
+
+    def _cmd_read_chunk(self, args):
+        if not self.max_chunk:
+            self._respond("Unknown command READ_CHUNK", ok=False)
+            return
+        try:
+            name, offset, length = args.rsplit(',', 2)
+            offset, length = int(offset), min(int(length), self.max_chunk)
+        except ValueError:
+            self._respond("Invalid READ_CHUNK arguments", ok=False)
+            return
+        data = self.files.get(name)
+        if data is None:
+            self._respond("File not found", ok=False)
+            return
+        chunk = data[offset:offset + length]
+        self._respond(f"{offset},{len(chunk)},{hashlib.md5(chunk).hexdigest()},{len(data)}")
+        self._write(self._corrupt(chunk))
+
+    def _send_next_chunk(self):
+        data, offset = self._download
+        if offset >= len(data):
+            self._download = None
+            self._respond("File sent")
+            return
+        chunk = data[offset:offset + self.chunk_size]
+        self._download[1] = offset + len(chunk)
+        self._write(chunk)
+
+    def _cmd_list_files(self, args):
+        self._respond('!!LIST!!')
+        for name, data in sorted(self.files.items()):
+            self._respond(f"{name},{len(data)}")
+        self._respond('!!END!!')
+
+    def _cmd_delete_file(self, args):
+        if self.files.pop(args, None) is None:
+            self._respond("File not found", ok=False)
+        else:
+            self._respond("File deleted")
+
+    def _cmd_cmd(self, args):
+        output = self.commands.get(args.strip())
+        if output is None:
+            self._respond(f"Unknown command: {args}", ok=False)
+        else:
+            self._respond(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baud', type=int, default=230400, help='Simulated baud rate (0: unthrottled)')
+    parser.add_argument('--latency', type=float, default=0.002, help='Delay of each response (s)')
+    parser.add_argument('--jitter', type=float, default=0.001, help='Random extra delay (s)')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='Probability of a corrupted KB of chunk data')
+    parser.add_argument('--drop', type=float, default=0.0, help='Probability of a lost response')
+    parser.add_argument('--window', type=int, default=16, help='Chunks in flight of WRITE_FILE_W (0: not supported)')
+    parser.add_argument('--max-chunk', type=int, default=4096, help='Biggest chunk accepted (0: no TRANSFER_CAPS)')
+    parser.add_argument('--no-delta', action='store_true', help="Don't offer the delta upload")
+    parser.add_argument('--no-deflate', action='store_true', help="Don't accept compressed uploads")
+    parser.add_argument('--log-interval', type=float, default=1.0, help='Background log period (s, 0: none)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+    args = parser.parse_args()
+
+    device = VirtualDevice(args.baud, args.latency, args.jitter, args.corrupt, args.drop,
+                           args.log_interval, window=args.window, max_chunk=args.max_chunk,
+                           delta=not args.no_delta, deflate=not args.no_deflate, seed=args.seed)
+    print(f"Virtual device on {device.start()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+        print(f"in {device.bytes_in} B, out {device.bytes_out} B, {device.responses} responses, "
+              f"{device.corrupted} corrupted, {device.dropped} dropped")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,14 @@ from pathlib import Path
 import gi
 
 from MonitorWidget import MonitorWidget
+from PipelineStats import pipeline
+from RingBuffer import all_buffers
+from SerialReader import SerialReader
+from SessionExport import SessionLog, SessionRecorder, format_from_filename
+from SessionReplay import CaptureWriter, ReplayReader, CAPTURE_EXTENSION
 from StreamHandler import StreamHandler
-from transfer_file import *
+from UiEventBus import UiEventBus
+from UiEvents import TERMINAL_TEXT, TERMINAL_TEXT_TRACED, APP_TEXT, SERIAL_DATA, MONITOR_TEXT, DEVICE_TEXT
 
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, GLib, Pango
@@ -41,7 +47,8 @@ class SerialInterface(Gtk.Window):
 
         self._espressif_path = None
 
-        self.main_thread_queue = Queue()
+        # Events from the worker threads to the main loop (handlers subscribed once the UI exists)
+        self.ui_events = UiEventBus()
 
         self.is_building = False
         self.backtrace_loaded = False
@@ -58,6 +65,8 @@ class SerialInterface(Gtk.Window):
 
         # Serial connection variable
         self.serial_conn = None
+        self.serial_reader = None
+        self.serial_batch_items = 64  # Chunks moved from the reader to the UI per read_serial call
         self.tracer = None
 
         # Main layout with expandable panel
@@ -100,10 +109,55 @@ class SerialInterface(Gtk.Window):
         self.files_toggle.connect("toggled", self.on_files_toggle)
         controls_box.pack_start(self.files_toggle, False, False, 0)
 
+        # Continuous recording of the session to file
+        self.record_toggle = Gtk.ToggleButton(label="Record")
+        self.record_toggle.connect("toggled", self.on_record_toggle)
+        controls_box.pack_start(self.record_toggle, False, False, 0)
+
+        # Replay of a timestamped capture (.hcap) through the whole pipeline
+        self.replay_speed_combo = Gtk.ComboBoxText()
+        for label in ("1x", "2x", "10x", "100x", "Max"):
+            self.replay_speed_combo.append_text(label)
+        self.replay_speed_combo.set_active(0)
+        controls_box.pack_start(self.replay_speed_combo, False, False, 0)
+
+        self.replay_button = Gtk.Button(label="Replay")
+        self.replay_button.connect("clicked", self.on_replay_clicked)
+        controls_box.pack_start(self.replay_button, False, False, 0)
+
         self.dev_restart_button = Gtk.Button(label="Restart Device")
         self.dev_restart_button.connect("clicked", self.on_dev_reset_clicked)
         controls_box.pack_start(self.dev_restart_button, False, False, 0)
 
+        # Serial read rate and backlog
+        self.serial_stats_label = Gtk.Label(label="")
+        controls_box.pack_start(self.serial_stats_label, False, False, 0)
+
+        # Per-stage latency/throughput of the serial -> screen path (off by default)
+        self.stats_toggle = Gtk.ToggleButton(label="Stats")
+        self.stats_toggle.connect("toggled", self.on_stats_toggle)
+        controls_box.pack_start(self.stats_toggle, False, False, 0)
+
+        self.stats_box = Gtk.Box(spacing=6)
+        self.stats_box.set_no_show_all(True)
+        vbox.pack_start(self.stats_box, False, False, 0)
+
+        self.stats_label = Gtk.Label(label="")
+        self.stats_label.set_xalign(0)
+        self.stats_label.set_selectable(True)
+        self.stats_label.override_font(Pango.FontDescription("Monospace 9"))
+        self.stats_label.show()
+        self.stats_box.pack_start(self.stats_label, True, True, 0)
+
+        stats_dump_button = Gtk.Button(label="Save JSON")
+        stats_dump_button.set_valign(Gtk.Align.START)
+        stats_dump_button.connect("clicked", self.on_stats_dump_clicked)
+        stats_dump_button.show()
+        self.stats_box.pack_start(stats_dump_button, False, False, 0)
+
+        # HELLOESP_STATS=<file.json> enables the statistics and saves them at exit (regression runs)
+        self.stats_dump_path = os.getenv('HELLOESP_STATS')
+
         # Terminal area
         self.terminal_handler = TerminalHandler()
         terminal_box = self.terminal_handler.get_widget()
@@ -113,6 +167,18 @@ class SerialInterface(Gtk.Window):
 
         self.terminal_handler.add_save_button()
 
+        # Raw bytes of the session, for the exports and the recording
+        self.session_log = SessionLog()
+        self.terminal_handler.session_log = self.session_log
+        self.recorder = None
+        self.recorder_lock = threading.Lock()  # log_session runs in the worker threads too
+        self.capture = None  # Timestamped binary recording of the serial port
+        self.replaying = False
+        self.record_max_bytes = 64 * 1024 * 1024  # Rotate the recording every 64 MB...
+        self.record_max_seconds = 3600  # ...or every hour
+        self.connect("destroy", lambda *args: self.stop_recording())
+        self.connect("destroy", lambda *args: self.dump_stats_at_exit())
+
         # Input area
         input_box = Gtk.Box(spacing=6)
         vbox.pack_start(input_box, False, False, 0)
@@ -159,7 +225,10 @@ class SerialInterface(Gtk.Window):
 
         self._load_project_path()
 
-        GLib.timeout_add(10, self.check_main_thread_queue)
+        self._subscribe_ui_events()
+
+        if self.stats_dump_path:
+            self.stats_toggle.set_active(True)
 
     def setup_backtrace_zone(self, parent_box=None):
         if parent_box is not None:
@@ -286,46 +355,40 @@ class SerialInterface(Gtk.Window):
         self.status_bar = Gtk.Statusbar()
         file_box.pack_start(self.status_bar, False, False, 0)
 
+        # Statistics of the last transfer
+        self.transfer_label = Gtk.Label(label="")
+        self.transfer_label.set_line_wrap(True)
+        self.transfer_label.set_xalign(0)
+        file_box.pack_start(self.transfer_label, False, False, 0)
+
         ###
         ###
         ###
 
-    def check_main_thread_queue(self):
-        while not self.main_thread_queue.empty():
-            try:
-                msg_type, value = self.main_thread_queue.get()
-
-                if msg_type in ["terminal_append", "append_terminal"]:  # don't you worry about the dislexy
-                    self.terminal_handler.append_terminal(value)
-
-                    if self.tracer is not None:
-                        self.tracer.read_line(value)
-                elif msg_type == "self.append_terminal_notrace":
-                    self.append_terminal_notrace(value)
-                elif msg_type == "terminal_append_notrace":
-                    self.terminal_handler.append_terminal(value)
-                elif msg_type == "self.append_terminal":
-                    self.append_terminal(value)
-                elif msg_type == "monitor_append":
-                    self.monitor_widget.append_text(value)
-                elif msg_type == "self.on_connect_clicked":
-                    self.on_connect_clicked(None)
-                else:
-                    print("msg_type not found: ", msg_type)
+    def _subscribe_ui_events(self):
+        """Handlers of the events posted to the main loop"""
+        self.ui_events.subscribe(TERMINAL_TEXT, self.terminal_handler.append_terminal)
+        self.ui_events.subscribe(TERMINAL_TEXT_TRACED, self._append_terminal_traced)
+        self.ui_events.subscribe(APP_TEXT, self.append_terminal)
+        self.ui_events.subscribe(SERIAL_DATA, self.append_serial)
+        self.ui_events.subscribe(DEVICE_TEXT, self.append_device_text)
+        self.ui_events.subscribe(MONITOR_TEXT, self.monitor_widget.append_text)
 
-            except Exception as e:
-                print("check_main_thread_queue: ", e)
+    def _append_terminal_traced(self, text):
+        self.terminal_handler.append_terminal(text)
 
-        return True
+        if self.tracer is not None:
+            self.tracer.read_line(text)
 
     def init_receiver(self):
         def on_received_normal(text):
-            self.main_thread_queue.put(("terminal_append_notrace", text))
+            # Decoded and split at line ends by the stream handler: the tracer gets whole lines
+            self.ui_events.post(TERMINAL_TEXT_TRACED, text)
 
         def on_received_monitor(text):
-            self.main_thread_queue.put(("monitor_append", text))
+            self.ui_events.post(MONITOR_TEXT, text.replace('\r', ''))
 
-        self.stream_handler = StreamHandler(on_received_normal)
+        self.stream_handler = StreamHandler(on_received_normal, binary=True)
         self.stream_handler.add_context("!!TASKMONITOR!!", "!!TASKMONITOREND!!", on_received_monitor)
 
 
@@ -479,7 +542,7 @@ class SerialInterface(Gtk.Window):
             try:
                 print("on_build completion: ", res)
                 if res == 0:
-                    self.main_thread_queue.put(("self.on_connect_clicked", None))
+                    self.ui_events.call(lambda: self.on_connect_clicked(None))
                 else:
                     print("execute_script completion: ", res)
 
@@ -505,9 +568,9 @@ class SerialInterface(Gtk.Window):
         try:
             success, response = self.files.execute_command(command)
             if success:
-                self.main_thread_queue.put(("append_terminal", f"Command successful ({command}): {response}\n"))
+                self.ui_events.post(TERMINAL_TEXT_TRACED, f"Command successful ({command}): {response}\n")
             else:
-                self.main_thread_queue.put(("append_terminal", f"Command error ({command}): {response}\n"))
+                self.ui_events.post(TERMINAL_TEXT_TRACED, f"Command error ({command}): {response}\n")
         except Exception as e:
             print("thread_execute_command: ", e)
 
@@ -515,7 +578,7 @@ class SerialInterface(Gtk.Window):
         command = self.cmd_entry.get_text()
 
         if command:
-            self.terminal_handler.scrollDown = True
+            self.terminal_handler.scroll_to_tail()
 
         if command == "clear":
             self.on_reset_clicked(button)
@@ -559,6 +622,9 @@ class SerialInterface(Gtk.Window):
     def upload_file(self, base_name, data):
         try:
             success, msg = self.files.write_file(base_name, data)
+            stats = self.files.last_transfer
+            if stats is not None:
+                self.ui_events.call(lambda: self.show_transfer_stats(stats))
             if success:
                 self.show_status(f"File {base_name} successfully loaded")
                 self.append_terminal(f"File loaded: {base_name}\n")
@@ -600,12 +666,32 @@ class SerialInterface(Gtk.Window):
 
         dialog.destroy()
 
-    def on_download_file(self, button):
-        """Handler download file"""
+    def download_file(self, filename, save_path):
+        # An interrupted download is resumed by read_file, from the partial data in files.partial_dir
+        held = self.files.partial_download(filename)
+        if held:
+            self.append_terminal(f"Resuming download of {filename}: {held / 1024:.1f} KB already downloaded\n")
+
+        try:
+            data = self.files.read_file(filename)
+            with open(save_path, 'wb') as f:
+                f.write(data)
+            message = f"File {filename} successfully downloaded"
+            self.append_terminal(f"File downloaded: {filename}\n")
+        except Exception as e:
+            message = f"Error download: {str(e)}"
+            self.append_terminal(f"Error download: {str(e)}\n")
+            held = self.files.partial_download(filename)
+            if held:
+                message += f" ({held / 1024:.1f} KB kept, download again to resume)"
 
-        self.append_terminal("\033[93mDownload file not implemented\033[0m")
-        return
+        stats = self.files.last_transfer
+        if stats is not None:
+            self.ui_events.call(lambda: self.show_transfer_stats(stats))
+        self.ui_events.call(lambda: self.show_status(message))
 
+    def on_download_file(self, button):
+        """Handler download file"""
         selection = self.files_view.get_selection()
         model, treeiter = selection.get_selected()
         if not treeiter:
@@ -632,15 +718,7 @@ class SerialInterface(Gtk.Window):
         response = dialog.run()
         if response == Gtk.ResponseType.OK:
             save_path = dialog.get_filename()
-            try:
-                data = read_file(self, filename)
-                with open(save_path, 'wb') as f:
-                    f.write(data)
-                self.show_status(f"File {filename} succesfully downloaded")
-                self.append_terminal(f"File downloadedd: {filename}\n")
-            except Exception as e:
-                self.show_status(f"Error download: {str(e)}")
-                self.append_terminal(f"Error download: {str(e)}\n")
+            threading.Thread(target=self.download_file, args=(filename, save_path,)).start()
 
         dialog.destroy()
 
@@ -686,6 +764,15 @@ class SerialInterface(Gtk.Window):
 
         dialog.destroy()
 
+    def show_transfer_stats(self, stats):
+        """Statistics of a file transfer under the file list"""
+        self.transfer_label.set_text(stats.summary())
+        self.transfer_label.set_tooltip_text(
+            f"Mode: {stats.mode}\n"
+            f"Chunks: {stats.chunks}\n"
+            "Chunk size history (offset: size):\n" +
+            '\n'.join(f"  {offset}: {size}" for offset, size in stats.chunk_sizes))
+
     def show_status(self, message):
         """Mostra un messaggio nella status bar"""
         context_id = self.status_bar.get_context_id("file_ops")
@@ -931,6 +1018,9 @@ class SerialInterface(Gtk.Window):
             self.serial_conn.setDTR(True)
 
     def on_connect_clicked(self, button):
+        if self.replaying:
+            self.stop_replay()
+
         if self.serial_conn is None:
             try:
                 port = self.port_combo.get_active_text()
@@ -943,13 +1033,15 @@ class SerialInterface(Gtk.Window):
                     self.append_terminal("Connect to " + port + "\n")
                     if self.files_toggle.get_active():
                         self.refresh_file_list()
-                    GLib.timeout_add(100, self.read_serial)
+
+                    self.start_serial_reader()
 
                     self.init_tracing()
             except serial.SerialException as e:
                 self.append_terminal(f"Connection error: {str(e)}\n")
                 self.serial_conn = None
         else:
+            self.stop_serial_reader()
             self.serial_conn.close()
             self.serial_conn = None
             self.connect_button.set_label("Connect")
@@ -957,6 +1049,37 @@ class SerialInterface(Gtk.Window):
             self.files_store.clear()
             self.stop_tracing()
 
+    def start_serial_reader(self):
+        def on_data():
+            GLib.idle_add(self.read_serial)
+
+        self.serial_reader = SerialReader(self.serial_conn, on_data=on_data,
+                                          is_paused=lambda: self.block_serial)
+        self.serial_reader.capture = self.capture
+        self.serial_reader.start()
+
+        GLib.timeout_add(1000, self.update_serial_stats)
+
+    def stop_serial_reader(self):
+        if self.serial_reader is not None:
+            self.serial_reader.stop()
+            self.serial_reader = None
+        self.serial_stats_label.set_text("")
+
+    def update_serial_stats(self):
+        if self.serial_reader is None:
+            return False
+
+        rate, backlog = self.serial_reader.get_stats()
+        text = f"RX {rate / 1024:.1f} KB/s | backlog {backlog} B"
+
+        dropped = [f"{buf.name} {buf.dropped_bytes} B" for buf in all_buffers() if buf.dropped_bytes]
+        if dropped:
+            text += " | dropped " + ", ".join(dropped)
+
+        self.serial_stats_label.set_text(text)
+        return True
+
     def on_send_clicked(self, button):
         if self.serial_conn and self.serial_conn.is_open:
             text = self.input_entry.get_text()
@@ -970,70 +1093,317 @@ class SerialInterface(Gtk.Window):
                     self.append_terminal(f"Send error: {str(e)}\n")
 
     def on_reset_clicked(self, button):
-        buffer = self.terminal.get_buffer()
-        buffer.set_text("")
+        self.terminal_handler.clear()
+        self.session_log.clear()
 
         self.stream_handler.clear()
         self.init_receiver()
 
     def read_serial(self):
+        """Consume the chunks queued by the serial reader thread (main loop)"""
+        reader = self.serial_reader
+        if reader is None or not (self.serial_conn or self.replaying):
+            return False
+
+        if self.stream_handler.input_queue.is_backlogged() or (self.replaying and self._replay_backlogged()):
+            # The stream handler (or the screen, for a replay) is behind: leave the data in the
+            # 'serial' buffer, whose BLOCK policy stalls the reader, and look again later
+            GLib.timeout_add(10, self.read_serial)
+            return False
+
+        def send(data):
+            # Raw bytes: lines split across reads are reassembled by the stream handler
+            if not self.redirect_serial:
+                self.ui_events.post(SERIAL_DATA, data)
+            else:
+                if self.last_serial_output is None:
+                    self.last_serial_output = data
+                else:
+                    self.last_serial_output += data
 
-        if self.serial_conn and self.serial_conn.is_open:
-            def send(text):
-                if not contains_alphanumeric(text):
-                    return
-
-                if text:
-                    if not self.redirect_serial:
-                        self.main_thread_queue.put(('self.append_terminal', text+'\n'))
-                        #self.last_serial_output = text.encode() # ?? why
-                    else:
-                        if self.last_serial_output is None:
-                            self.last_serial_output = text.encode()
-                        else:
-                            self.last_serial_output += text.encode()
+        try:
+            chunks = reader.drain(self.serial_batch_items)
+            if len(chunks) >= self.serial_batch_items:
+                GLib.idle_add(self.read_serial)  # More queued: continue after GTK had its turn
 
-            try:
-                while self.serial_conn.in_waiting:
-                    if self.block_serial:
-                        time.sleep(0.01)
-                        continue
-                    else:
-                        if len(self.files.wfr_thisLine) > 0:
-                            for line in self.files.wfr_thisLine.split('\n'):
-                                self.main_thread_queue.put(('append_terminal', line+'\n'))
-                            self.files.wfr_thisLine = ''
-
-                    text = self.serial_conn.read(self.serial_conn.in_waiting).decode('utf-8', errors='replace')
-                    send(text)
+            if chunks and len(self.files.wfr_thisLine) > 0:
+                for line in self.files.wfr_thisLine.split('\n'):
+                    self.ui_events.post(DEVICE_TEXT, line+'\n')
+                self.files.wfr_thisLine = ''
 
-            except serial.SerialException as e:
-                self.append_terminal(f"Reading error: {str(e)}\n")
-                self.serial_conn.close()
-                self.serial_conn = None
-                self.connect_button.set_label("Connect")
+            for data in chunks:
+                send(data)
+
+            if reader.error is not None:
+                raise reader.error
+
+            if self.replaying and reader.is_done():
+                self.stop_replay()
+
+        except (serial.SerialException, OSError, ValueError) as e:
+            self.append_terminal(f"Reading error: {str(e)}\n")
+            if self.replaying:
+                self.stop_replay()
                 return False
-            except Exception as e:
-                print("read_serial exception: ", e)
-                print("Exception type : ", type(e).__name__)
-                traceback.print_exc(file=sys.stdout)
-                #self.append_terminal(self.buffer)
-                #raise e
+            self.stop_serial_reader()
+            self.serial_conn.close()
+            self.serial_conn = None
+            self.connect_button.set_label("Connect")
+        except Exception as e:
+            print("read_serial exception: ", e)
+            print("Exception type : ", type(e).__name__)
+            traceback.print_exc(file=sys.stdout)
 
-            return True
         return False
 
+    def _replay_backlogged(self):
+        """
+        A replay is ahead of the screen: more text on its way (UI events, stream
+        handler, render queue) than the render stage takes below its low watermark.
+
+        Data on its way is never checked again, so a replay waits until all of it
+        fits in the render stage: it is slowed down to the drawing speed instead
+        of being summarized.
+        """
+        render = self.terminal_handler.pending_updates
+        in_flight = self.ui_events.bytes + self.stream_handler.input_queue.bytes + render.bytes
+        return in_flight > render.low_bytes
+
     def append_terminal(self, text):
         #text += '\n'
+        self.log_session(text.encode('utf-8'))
+        self.stream_handler.process_string(text)
 
-        if self.tracer is not None:
-            self.tracer.read_line(text)
+    def append_serial(self, data):
+        """Feed raw serial bytes to the stream handler, decoded only at callback boundaries"""
+        self.log_session(data)
+        self.stream_handler.process_bytes(data)
 
-        self.stream_handler.process_string(text)
+    def append_device_text(self, text):
+        """Device lines the file transfer read past the stream handler: logged like the rest of the serial data"""
+        self.log_session(text.encode('utf-8'))
+        self._append_terminal_traced(text)
 
     def append_terminal_notrace(self, text):
         #text += '\n'
-        self.stream_handler.process_string(text)
+        # Everything out of the stream handler is traced: go straight to the terminal
+        self.log_session(text.encode('utf-8'))
+        self.terminal_handler.append_terminal(text)
+
+    ###
+    ### Session log and recording
+    ###
+
+    def log_session(self, data):
+        """Keep the raw bytes entering the terminal, and record them if enabled"""
+        self.session_log.append(data)
+
+        with self.recorder_lock:
+            if self.recorder is None:
+                return
+            try:
+                self.recorder.write(data)
+                return
+            except Exception as e:
+                print("Recording error: ", e)
+                traceback.print_exc(file=sys.stdout)
+                error = str(e)
+                self._close_recorder()
+
+        def on_error():
+            self.record_toggle.set_active(False)
+            self.show_status(f"Recording stopped: {error}")
+        self.ui_events.call(on_error)
+
+    def on_record_toggle(self, button):
+        if not button.get_active():
+            self.stop_recording()
+            return
+        if self.recorder is not None or self.capture is not None:
+            return
+
+        dialog = SmartFileChooserDialog(
+            title="Record Session To",
+            parent=self,
+            action=Gtk.FileChooserAction.SAVE,
+            buttons=("Cancel", Gtk.ResponseType.CANCEL, "Record", Gtk.ResponseType.OK)
+        )
+        # The format follows the extension: .txt plain text, .log ANSI, .gz/.zst compressed,
+        # .hcap timestamped binary capture (for Replay)
+        dialog.set_current_name("session.log")
+
+        response = dialog.run()
+        filepath = dialog.get_filename() if response == Gtk.ResponseType.OK else None
+        dialog.destroy()
+
+        if filepath is None:
+            button.set_active(False)
+            return
+
+        if filepath.lower().endswith(CAPTURE_EXTENSION):
+            self.start_capture(filepath)
+            return
+
+        try:
+            fmt, compression = format_from_filename(filepath)
+            recorder = SessionRecorder(filepath, fmt, compression,
+                                       max_bytes=self.record_max_bytes,
+                                       max_seconds=self.record_max_seconds)
+            with self.recorder_lock:
+                self.recorder = recorder
+            button.set_tooltip_text(f"Recording to {recorder.current_path}")
+        except Exception as e:
+            self.recorder = None
+            button.set_active(False)
+            self.show_status(f"Recording error: {str(e)}")
+
+    def stop_recording(self):
+        self.stop_capture()
+        with self.recorder_lock:
+            self._close_recorder()
+        self.record_toggle.set_tooltip_text(None)
+
+    def _close_recorder(self):
+        """Close the recording (recorder_lock held)"""
+        if self.recorder is not None:
+            try:
+                self.recorder.close()
+            except Exception as e:
+                print("Recording error: ", e)
+            self.recorder = None
+
+    def start_capture(self, filepath):
+        """Record the serial chunks with their reception time, from the reader thread"""
+        try:
+            self.capture = CaptureWriter(filepath)
+        except OSError as e:
+            self.record_toggle.set_active(False)
+            self.show_status(f"Recording error: {str(e)}")
+            return
+
+        if self.serial_reader is not None and not self.replaying:
+            self.serial_reader.capture = self.capture
+        self.record_toggle.set_tooltip_text(f"Recording to {filepath}")
+
+    def stop_capture(self):
+        if self.capture is None:
+            return
+        if self.serial_reader is not None and not self.replaying:
+            self.serial_reader.capture = None
+        self.capture.close()
+        self.capture = None
+
+    ###
+    ### Replay
+    ###
+
+    def on_replay_clicked(self, button):
+        if self.replaying:
+            self.stop_replay()
+            return
+
+        if self.serial_conn is not None:
+            self.append_terminal("Disconnect before replaying a capture\n")
+            return
+
+        dialog = SmartFileChooserDialog(
+            title="Replay Capture",
+            parent=self,
+            action=Gtk.FileChooserAction.OPEN,
+            buttons=("Cancel", Gtk.ResponseType.CANCEL, "Replay", Gtk.ResponseType.OK)
+        )
+        capture_filter = Gtk.FileFilter()
+        capture_filter.set_name("HelloESP captures")
+        capture_filter.add_pattern("*" + CAPTURE_EXTENSION)
+        dialog.add_filter(capture_filter)
+
+        response = dialog.run()
+        filepath = dialog.get_filename() if response == Gtk.ResponseType.OK else None
+        dialog.destroy()
+
+        if filepath is not None:
+            label = self.replay_speed_combo.get_active_text()
+            self.start_replay(filepath, 0 if label == "Max" else float(label.rstrip('x')))
+
+    def start_replay(self, filepath, speed=1.0):
+        """
+        Play a capture back through read_serial, as if it came from the port.
+
+        Args:
+            filepath: Capture file (.hcap)
+            speed: Timing multiplier, 0 for as fast as possible
+        """
+        def on_data():
+            GLib.idle_add(self.read_serial)
+
+        self.replaying = True
+        self.serial_reader = ReplayReader(filepath, speed, on_data=on_data)
+        self.serial_reader.start()
+        self.replay_button.set_label("Stop Replay")
+        self.append_terminal(f"Replay of {os.path.basename(filepath)} ({'max' if not speed else f'{speed:g}x'})\n")
+
+        GLib.timeout_add(1000, self.update_serial_stats)
+
+    def stop_replay(self):
+        if not self.replaying:
+            return
+        reader = self.serial_reader
+        self.serial_reader = None
+        self.replaying = False
+        reader.stop()
+        self.replay_button.set_label("Replay")
+        self.serial_stats_label.set_text("")
+        # Queued after the last frames, so it shows up after them
+        self.ui_events.post(APP_TEXT, f"Replay ended: {reader.frames_read} frames, {reader.bytes_read} bytes\n")
+
+    ###
+    ### Pipeline statistics
+    ###
+
+    def on_stats_toggle(self, button):
+        enabled = button.get_active()
+        pipeline.enable(enabled)
+        if enabled:
+            self.stats_label.set_text("Collecting...")
+            self.stats_box.show()
+            GLib.timeout_add(1000, self.update_pipeline_stats)
+        else:
+            self.stats_box.hide()
+
+    def update_pipeline_stats(self):
+        if not pipeline.enabled:
+            return False
+
+        pipeline.update_rates()
+        self.stats_label.set_text(pipeline.summary())
+        return True
+
+    def on_stats_dump_clicked(self, button):
+        dialog = SmartFileChooserDialog(
+            title="Save Statistics",
+            parent=self,
+            action=Gtk.FileChooserAction.SAVE,
+            buttons=("Cancel", Gtk.ResponseType.CANCEL, "Save", Gtk.ResponseType.OK)
+        )
+        dialog.set_current_name("pipeline_stats.json")
+
+        response = dialog.run()
+        if response == Gtk.ResponseType.OK:
+            try:
+                pipeline.update_rates()
+                pipeline.dump(dialog.get_filename())
+            except OSError as e:
+                self.append_terminal(f"Error saving statistics: {str(e)}\n")
+
+        dialog.destroy()
+
+    def dump_stats_at_exit(self):
+        if self.stats_dump_path and pipeline.enabled:
+            try:
+                pipeline.update_rates()
+                pipeline.dump(self.stats_dump_path)
+            except OSError as e:
+                print("Error saving statistics: ", e)
 
 def main():
     win = SerialInterface()
@@ -1042,4 +1412,4 @@ def main():
     Gtk.main()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,19 +6,45 @@ import hashlib
 from threading import Thread
 from queue import Queue
 import re
+import zlib
 
 from generalFunctions import contains_alphanumeric, safe_decode, print_err
+from UiEvents import TERMINAL_TEXT_TRACED, DEVICE_TEXT
+from TransferStats import DEFAULT_CHUNK_SIZE, ChunkSizer, TransferStats
+from TransferManifest import PARTIAL_DIR, TransferManifest
+from DeltaSync import block_size_for, compute_delta, delta_size
 
 MAX_FILENAME_LENGTH = 255
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 
 DEBUG_ON_TERMINAL = False
 
+# Compression of windowed uploads: raw deflate (RFC 1951, what miniz/tinfl
+# in the ESP32 ROM decodes), tried first on a sample of the data
+COMPRESS_SAMPLE_SIZE = 16 * 1024
+COMPRESS_SAMPLES = 4
+
 ###
 ###
 ###
 
 
+def sample_compression_ratio(data: bytes, level: int = 6) -> float:
+    """
+    Compressed / original size of a few slices of data (start, middle, end),
+    to tell whether compressing the whole file is worth it.
+    """
+    if len(data) <= COMPRESS_SAMPLE_SIZE * COMPRESS_SAMPLES:
+        sample = data
+    else:
+        step = (len(data) - COMPRESS_SAMPLE_SIZE) // (COMPRESS_SAMPLES - 1)
+        sample = b''.join(data[i * step:i * step + COMPRESS_SAMPLE_SIZE] for i in range(COMPRESS_SAMPLES))
+    if not sample:
+        return 1.0
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return len(compressor.compress(sample) + compressor.flush()) / len(sample)
+
+
 class SerialCommandError(Exception):
     """Custom exception for serial command errors"""
     pass
@@ -83,12 +109,161 @@ def parse_esp32_log(line: str) -> dict:
 
 PONG_BACK='!!!PONG!!!'
 
+###
+### Windowed transfer
+###
+
+class ResponseReader:
+    """
+    Reads the device responses straight from the port while the host keeps
+    sending (the serial reader is paused by SILENCE_ON).
+
+    Lines with '!!OK!!:' or '!!ERROR!!:' are returned as (ok, message); any
+    other line is device log and goes to the terminal.
+    """
+
+    def __init__(self, serial_interface):
+        self.serial_interface = serial_interface
+        self.buffer = bytearray()
+
+    def read(self, timeout: float) -> List[Tuple[bool, str]]:
+        """
+        Legge le risposte disponibili, aspettando al massimo timeout secondi la prima.
+
+        Returns:
+            List of (ok, message), empty on timeout
+        """
+        ser = self.serial_interface.serial_conn
+        deadline = time.monotonic() + timeout
+        responses = []
+
+        while True:
+            waiting = ser.in_waiting
+            if waiting:
+                self.buffer += ser.read(waiting)
+                responses.extend(self._parse_lines())
+                if responses:
+                    return responses
+
+            if time.monotonic() >= deadline:
+                return responses
+            time.sleep(0.0005)
+
+    def read_response(self, timeout: float) -> Optional[Tuple[bool, str]]:
+        """
+        First response only: what follows stays in the buffer (e.g. the raw
+        data of a READ_CHUNK).
+
+        Returns:
+            (ok, message), None on timeout
+        """
+        ser = self.serial_interface.serial_conn
+        deadline = time.monotonic() + timeout
+
+        while True:
+            responses = self._parse_lines(first_only=True)
+            if responses:
+                return responses[0]
+            if time.monotonic() >= deadline:
+                return None
+
+            waiting = ser.in_waiting
+            if waiting:
+                self.buffer += ser.read(waiting)
+            else:
+                time.sleep(0.0005)
+
+    def read_data(self, size: int, timeout: float) -> Optional[bytes]:
+        """Exactly size raw bytes, None on timeout"""
+        ser = self.serial_interface.serial_conn
+        deadline = time.monotonic() + timeout
+
+        while len(self.buffer) < size:
+            if time.monotonic() >= deadline:
+                return None
+            waiting = ser.in_waiting
+            if waiting:
+                self.buffer += ser.read(waiting)
+            else:
+                time.sleep(0.0005)
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def discard(self, quiet: float = 0.05):
+        """Drop what's buffered and what arrives until the line is quiet (after a timeout)"""
+        ser = self.serial_interface.serial_conn
+        self.buffer.clear()
+        last = time.monotonic()
+        while time.monotonic() - last < quiet:
+            waiting = ser.in_waiting
+            if waiting:
+                ser.read(waiting)
+                last = time.monotonic()
+            else:
+                time.sleep(0.001)
+
+    def _parse_lines(self, first_only: bool = False) -> List[Tuple[bool, str]]:
+        responses = []
+        while not (first_only and responses):
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                return responses
+            line = safe_decode(bytes(self.buffer[:end]))
+            del self.buffer[:end + 1]
+
+            ok = line.find('!!OK!!:')
+            error = line.find('!!ERROR!!:')
+            if ok >= 0:
+                responses.append((True, line[ok + 7:].strip()))
+            elif error >= 0:
+                responses.append((False, line[error + 10:].strip()))
+            elif contains_alphanumeric(line):
+                self.serial_interface.ui_events.post(DEVICE_TEXT, line + '\n')
+        return responses
+
+
 class SerialCommandHandler:
     def __init__(self, serial_interface):
         self.serial_interface = serial_interface
         self.wait_for_response_in_use = False
         self.wfr_thisLine = ""
 
+        # Windowed upload: chunks in flight without waiting for each answer
+        # (falls back to stop-and-wait on firmware without WRITE_FILE_W)
+        self.windowed_transfers = True
+        self.window_size = 8
+        self.ack_timeout = 2.0  # Until the round trip time is measured (s)
+        self.max_retries = 10
+
+        # Chunk size: starts at 1 KB, adapted between min and the maximum
+        # negotiated with the device (TRANSFER_CAPS, 1 KB on older firmware)
+        self.min_chunk_size = 256
+        self.max_chunk_size = 8192
+        self.device_caps = None
+        self._caps_conn = None
+
+        # Resumable transfers (devices with resume=1 in TRANSFER_CAPS): a failed
+        # upload is resumed from what the device holds, downloads keep their
+        # partial data in partial_dir
+        self.resume_attempts = 3
+        self.partial_dir = PARTIAL_DIR
+
+        # Compressed windowed upload (deflate=1 in TRANSFER_CAPS), when a
+        # sample of the data shrinks below compress_max_ratio
+        self.compression = True
+        self.compress_level = 6
+        self.compress_max_ratio = 0.9
+
+        # Delta upload of a file already on the device (delta=1 in TRANSFER_CAPS):
+        # worth it while the changed bytes are at most delta_max_ratio of the file
+        self.delta_transfers = True
+        self.delta_max_ratio = 0.5
+
+        # Statistics of the last write_file / read_file, for the file manager panel
+        self.last_transfer: Optional[TransferStats] = None
+
     def parse_esp32_log(self, line: str) -> dict:
         """
         Analizza una linea di log ESP32 e separa il timestamp, il tag e il messaggio.
@@ -147,7 +322,7 @@ class SerialCommandHandler:
 
             #print("wait_for_response on_received_normal (", len(line), ") bytes")
 
-            self.wfr_thisLine += line
+            self.wfr_thisLine += line.replace('\r', '')  # CRLF from the device: match plain lines
 
             while len(self.wfr_thisLine) > 0:
                 spl = self.wfr_thisLine.split('\n')
@@ -231,7 +406,7 @@ class SerialCommandHandler:
                 else:
                     if line:
                         print("append_terminal: ", line)
-                        self.serial_interface.main_thread_queue.put(("append_terminal", line + '\n'))
+                        self.serial_interface.ui_events.post(DEVICE_TEXT, line + '\n')
 
                 if not waitEnd:
                     if res is not None:
@@ -309,7 +484,7 @@ class SerialCommandHandler:
                     done()
                     print("end receive result: ", value)
                     if DEBUG_ON_TERMINAL:
-                        self.serial_interface.main_thread_queue.put(("append_terminal", "wait_for_response: " + str(value)+"\n"))
+                        self.serial_interface.ui_events.post(TERMINAL_TEXT_TRACED, "wait_for_response: " + str(value)+"\n")
 
                     if 'OK:READY: Ready for chunk' in value[1]:
                         print("debug")
@@ -355,7 +530,7 @@ class SerialCommandHandler:
 
         if DEBUG_ON_TERMINAL:
             print("send_buffer: ", buffer)
-            self.serial_interface.main_thread_queue.put(("append_terminal", "send_buffer: "+ buffer.decode() +"\n"))
+            self.serial_interface.ui_events.post(TERMINAL_TEXT_TRACED, "send_buffer: "+ buffer.decode() +"\n")
 
         ser.write(buffer)
         ser.flush()
@@ -387,12 +562,55 @@ class SerialCommandHandler:
     ###
     ###
 
+    def get_device_caps(self) -> dict:
+        """
+        Transfer parameters of the device, asked once per connection.
+
+        $$$TRANSFER_CAPS$$$ -> !!OK!!:max_chunk=4096,window=16,read_chunk=1,resume=1,delta=1,deflate=1
+        Firmware without the command gets {} (1 KB chunks, as always).
+        A lost answer is asked again once; without any, {} is used for this
+        transfer only, so the next one asks again.
+        Call between cmd_start and cmd_end.
+        """
+        conn = self.serial_interface.serial_conn
+        if self.device_caps is not None and self._caps_conn is conn:
+            return self.device_caps
+
+        caps = {}
+        for _ in range(2):
+            self.send_buffer("$$$TRANSFER_CAPS$$$\n", ping=False)
+            success, message = self.wait_for_response(timeout=self.ack_timeout)
+            if success or message != "Timeout receive cycle":
+                break
+        else:
+            print("get_device_caps: no answer")
+            return caps
+
+        if success:
+            for item in message.split(','):
+                key, _, value = item.partition('=')
+                try:
+                    caps[key.strip()] = int(value)
+                except ValueError:
+                    pass
+        elif 'Unknown command' not in message:
+            print("get_device_caps: ", message)
+
+        self.device_caps = caps
+        self._caps_conn = conn
+        return caps
+
+    def _chunk_sizer(self) -> ChunkSizer:
+        maximum = min(self.max_chunk_size, self.get_device_caps().get('max_chunk', DEFAULT_CHUNK_SIZE))
+        return ChunkSizer(DEFAULT_CHUNK_SIZE, self.min_chunk_size, maximum)
+
     def write_file(self, filename: str, data: bytes) -> Tuple[bool, str]:
         """Write data to device with chunk verification."""
 
         self.cmd_start()
 
         ser = self.serial_interface.serial_conn
+        stats = self.last_transfer = TransferStats('upload', filename, len(data))
 
         try:
             validate_filename(filename)
@@ -401,11 +619,46 @@ class SerialCommandHandler:
                 return False, f"Invalid file size (max {MAX_FILE_SIZE} bytes)"
 
             file_hash = hashlib.md5(data).hexdigest()
-            if self.check_existing_file(filename) == len(data):
+            existing_size = self.check_existing_file(filename)
+            sizer = self._chunk_sizer()
+
+            if existing_size >= 0 and self.delta_transfers and self.get_device_caps().get('delta'):
+                result = self._write_file_delta(filename, data, file_hash, existing_size, sizer, stats)
+                if result is not None:
+                    stats.finish(result[0])
+                    print("write_file: ", stats.summary())
+                    self.cmd_end()
+                    return result
+                print("write_file: file too different for a delta, full upload")
+            elif existing_size == len(data):
                 self.cmd_end()
                 return False, "File exists with same size"
 
+            if self.windowed_transfers:
+                attempt = 0
+                while True:
+                    offset = self._resume_offset(filename, data, file_hash)
+                    if offset is None:
+                        result = False, "No answer to RESUME_INFO"
+                    else:
+                        result = self._write_file_windowed(filename, data, file_hash, sizer, stats, offset)
+                    if result is None or result[0] or attempt >= self.resume_attempts \
+                            or not self.get_device_caps().get('resume'):
+                        break
+                    attempt += 1
+                    print(f"write_file: {result[1]}, resuming ({attempt}/{self.resume_attempts})")
+                    time.sleep(self.ack_timeout)  # Give the link time to recover
+                    ResponseReader(self.serial_interface).discard(quiet=0.2)
+
+                if result is not None:
+                    stats.finish(result[0])
+                    print("write_file: ", stats.summary())
+                    self.cmd_end()
+                    return result
+                print("write_file: windowed transfer not supported, using stop-and-wait")
+
             """Send initial write command."""
+            stats.mode = 'stop-and-wait'
             size = len(data)
             command = f"$$$WRITE_FILE$$${filename},{size},{file_hash}\n"
             print("sending write command: ", command)
@@ -419,14 +672,12 @@ class SerialCommandHandler:
             print("Ready for chunks: ", message)
 
             # Suddividi in chunk e verifica
-            chunk_size = 1024
-            total_chunks = (len(data) + chunk_size - 1) // chunk_size
-
-            for chunk_num in range(total_chunks):
-                print("Writing chunk n " + str(chunk_num))
-                start = chunk_num * chunk_size
-                end = min(start + chunk_size, len(data))
+            start = 0
+            while start < len(data):
+                end = min(start + sizer.size, len(data))
                 chunk = data[start:end]
+                print(f"Writing chunk at {start} ({len(chunk)} bytes)")
+                sent_time = time.monotonic()
 
                 # Calcola hash del chunk
                 chunk_hash = hashlib.md5(chunk).hexdigest()
@@ -441,8 +692,6 @@ class SerialCommandHandler:
                     self.cmd_end()
                     return False, f"Chunk prep failed: {message}"
 
-                print("write_file: Ready for chunk: ", message)
-
                 # Invia chunk
                 ser.write(chunk)
                 ser.flush()
@@ -456,6 +705,10 @@ class SerialCommandHandler:
                 else:
                     print("Chunk sent: ", message)
 
+                stats.record_chunk(start, len(chunk))
+                sizer.on_success(time.monotonic() - sent_time)
+                start = end
+
             check_file = self.check_existing_file(filename)
             if check_file == -1:
                 self.cmd_end()
@@ -465,6 +718,8 @@ class SerialCommandHandler:
                 self.cmd_end()
                 return False, "File has the wrong size: result is "+str(check_file)+", excepted: "+str(len(data))
 
+            stats.finish(True)
+            print("write_file: ", stats.summary())
             self.cmd_end()
             return True, "File uploaded"
 
@@ -473,6 +728,252 @@ class SerialCommandHandler:
             print_err("Transfer error: ", e)
             return False, f"Transfer error: {str(e)}"
 
+    def _write_file_delta(self, filename: str, data: bytes, file_hash: str, existing_size: int,
+                          sizer: ChunkSizer, stats: TransferStats) -> Optional[Tuple[bool, str]]:
+        """
+        Upload only what changed from the file already on the device (rsync).
+
+        $$$HASH_RANGE$$$name,0,size -> md5,size: nothing to do if it matches
+        $$$BLOCK_SUMS$$$name,block -> !!SUMS!!, lines of up to 8 "weak:strong"
+            separated by ';' (see DeltaSync), !!END!!
+        $$$DELTA_FILE$$$name,size,md5,block -> READY, then the script is
+            streamed without waiting: $$$DCOPY$$$first,count copies blocks of
+            the old file, $$$DDATA$$$len,md5 + len bytes adds new data;
+            $$$DEND$$$ -> File written once the md5 of the result matches
+
+        Returns:
+            (success, message), or None to do a full upload instead (file too
+            different, or the delta failed)
+        """
+        if existing_size == len(data):
+            self.send_buffer(f"$$$HASH_RANGE$$${filename},0,{existing_size}\n", ping=False)
+            success, message = self.wait_for_response()
+            if success and message == f"{file_hash},{existing_size}":
+                stats.mode = 'delta'
+                stats.unchanged = existing_size
+                return True, "File already up to date"
+
+        block_size = block_size_for(existing_size)
+        self.send_buffer(f"$$$BLOCK_SUMS$$${filename},{block_size}\n", ping=False)
+        # ~30 bytes per block (10 bits per byte on the wire), twice for margin
+        baudrate = getattr(self.serial_interface.serial_conn, 'baudrate', 0) or 115200
+        sums_time = existing_size / block_size * 30 * 10 / baudrate * 2
+        success, resp = self.wait_for_response(timeout=5 + sums_time, waitEnd=True)
+        if not success or not resp or '!!SUMS!!' not in resp[0]:
+            print("write_file: no block sums: ", resp)
+            return None
+
+        sums = []
+        try:
+            for line in resp[1:]:
+                for item in line.split(';'):
+                    weak, strong = item.split(':')
+                    sums.append((int(weak, 16), strong))
+        except ValueError:
+            print_err("_write_file_delta", f"Invalid block sums: {line}")
+            return None
+
+        ops = compute_delta(data, sums, block_size)
+        literal = delta_size(ops)
+        if literal > len(data) * self.delta_max_ratio:
+            return None
+
+        self.send_buffer(f"$$$DELTA_FILE$$${filename},{len(data)},{file_hash},{block_size}\n", ping=False)
+        success, message = self.wait_for_response()
+        if not success:
+            print("write_file: delta refused: ", message)
+            return None
+
+        stats.mode = 'delta'
+        stats.unchanged = len(data) - literal
+        ser = self.serial_interface.serial_conn
+        offset = 0
+        for op in ops:
+            if op[0] == 'copy':
+                ser.write(f"$$$DCOPY$$${op[1]},{op[2]}\n".encode())
+                offset += op[2] * block_size
+                continue
+            for start in range(0, len(op[1]), sizer.maximum):
+                piece = op[1][start:start + sizer.maximum]
+                ser.write(f"$$$DDATA$$${len(piece)},{hashlib.md5(piece).hexdigest()}\n".encode() + piece)
+                stats.record_chunk(offset, len(piece))
+                offset += len(piece)
+        ser.write(b"$$$DEND$$$\n")
+        ser.flush()
+
+        success, message = self.wait_for_response(timeout=5 + len(data) / 100000)
+        if not success:
+            print("write_file: delta failed: ", message)
+            stats.unchanged = 0
+            return None
+        return True, f"File uploaded ({literal} of {len(data)} bytes sent)"
+
+    def _resume_offset(self, filename: str, data: bytes, file_hash: str) -> Optional[int]:
+        """
+        Bytes of this very file the device holds from an interrupted upload.
+
+        $$$RESUME_INFO$$$name,size,md5 -> !!OK!!:offset,md5 of the bytes held
+        The bytes count only if their hash matches the same bytes of data.
+
+        Returns:
+            Offset to resume from, None if the device doesn't answer
+        """
+        if not self.get_device_caps().get('resume'):
+            return 0
+
+        self.send_buffer(f"$$$RESUME_INFO$$${filename},{len(data)},{file_hash}\n", ping=False)
+        success, message = self.wait_for_response()
+        if not success:
+            return None if message == "Timeout receive cycle" else 0
+        try:
+            offset, prefix_hash = message.split(',')
+            offset = int(offset)
+        except ValueError:
+            print_err("_resume_offset", message)
+            return 0
+
+        if 0 < offset <= len(data) and hashlib.md5(data[:offset]).hexdigest() == prefix_hash:
+            print(f"write_file: device holds {offset} bytes, resuming")
+            return offset
+        return 0
+
+    def _write_file_windowed(self, filename: str, data: bytes, file_hash: str,
+                             sizer: ChunkSizer, stats: TransferStats, offset: int = 0) -> Optional[Tuple[bool, str]]:
+        """
+        Upload with up to window_size chunks in flight.
+
+        Every chunk carries a sequence number; the device answers "ACK:n"
+        (all chunks before n received, cumulative) or "NACK:n" (chunk n failed
+        its hash), and only the failed chunk is sent again. If nothing is
+        acknowledged within the retransmission timeout the oldest
+        unacknowledged chunk is sent again (lost chunk or lost ACK). The device
+        acknowledges the whole file with "File written" once its hash matches.
+
+        New chunks take the current size of sizer; a chunk sent again keeps
+        its boundaries, since the device may already hold it. With offset the
+        device keeps that many bytes of its partial upload and the chunks
+        start from there.
+
+        With compression the data goes through one deflate stream, flushed
+        (Z_SYNC_FLUSH) at the end of every chunk: the device decompresses
+        each chunk as soon as the ones before it arrived, and a chunk sent
+        again is the same compressed payload. Offset and sizes stay in
+        uncompressed bytes.
+
+        Returns:
+            (success, message), or None if the device doesn't support it
+        """
+        ser = self.serial_interface.serial_conn
+        size = len(data)
+
+        codec = ''
+        if self.compression and self.get_device_caps().get('deflate'):
+            ratio = sample_compression_ratio(data[offset:], self.compress_level)
+            if ratio < self.compress_max_ratio:
+                codec = 'deflate'
+            else:
+                print(f"write_file: data doesn't compress (ratio {ratio:.2f}), sent as is")
+
+        command = f"$$$WRITE_FILE_W$$${filename},{size},{file_hash},{sizer.maximum},{self.window_size}"
+        if offset or codec:
+            command += f",{offset}"
+        if codec:
+            command += f",{codec}"
+        self.send_buffer(command + "\n", ping=False)
+
+        success, message = self.wait_for_response()
+        if not success:
+            if 'Unknown command' in message:
+                return None
+            return False, "Not ready for write: " + message
+
+        stats.mode = 'windowed'
+        stats.resumed_from = offset
+        stats.codec = codec
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -15) if codec else None
+
+        # "READY: Window N": the device may accept fewer chunks in flight
+        window = self.window_size
+        try:
+            window = max(1, min(window, int(message.rsplit(' ', 1)[1])))
+        except (IndexError, ValueError):
+            pass
+
+        chunks = []  # (offset, length, payload sent) of every sequence number
+        sent_times = {}  # seq -> first send time, dropped when sent again (ambiguous RTT)
+
+        def new_chunk(offset):
+            length = sizer.size
+            if compressor is not None:
+                # Room for the deflate overhead of data that doesn't compress
+                length -= length // 1000 + 16
+            length = min(length, size - offset)
+            payload = data[offset:offset + length]
+            if compressor is not None:
+                last = offset + length >= size
+                payload = compressor.compress(payload) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+            chunks.append((offset, length, payload))
+            return length
+
+        def send_chunk(seq):
+            payload = chunks[seq][2]
+            ser.write(f"$$$WCHUNK$$${seq},{len(payload)},{hashlib.md5(payload).hexdigest()}\n".encode() + payload)
+
+        def retransmit(seq):
+            stats.retries += 1
+            if stats.retries > self.max_retries * max(len(chunks), 1):
+                return False
+            sent_times.pop(seq, None)
+            send_chunk(seq)
+            return True
+
+        reader = ResponseReader(self.serial_interface)
+        base = 0  # First chunk not acknowledged
+        next_offset = offset  # First byte never sent
+        last_progress = time.monotonic()
+        timeouts_in_row = 0  # The link is gone after max_retries
+
+        while True:
+            while next_offset < size and len(chunks) - base < window:
+                next_offset += new_chunk(next_offset)
+                sent_times[len(chunks) - 1] = time.monotonic()
+                send_chunk(len(chunks) - 1)
+            ser.flush()
+
+            for ok, message in reader.read(timeout=0.05):
+                if ok and message.startswith('ACK:'):
+                    acked = int(message[4:])
+                    now = time.monotonic()
+                    while base < min(acked, len(chunks)):
+                        sent_time = sent_times.pop(base, None)
+                        sizer.on_success(None if sent_time is None else now - sent_time)
+                        chunk_offset, length, payload = chunks[base]
+                        stats.record_chunk(chunk_offset, length)
+                        stats.wire_bytes += len(payload)
+                        if chunk_offset + length < size:
+                            # Never sent again (the last one is, if the final answer gets lost)
+                            chunks[base] = (chunk_offset, length, None)
+                        base += 1
+                        last_progress = now
+                        timeouts_in_row = 0
+                elif ok and message.startswith('File written'):
+                    return True, "File uploaded"
+                elif not ok and message.startswith('NACK:'):
+                    sizer.on_error()
+                    if not retransmit(int(message[5:])):
+                        return False, "Too many retransmissions"
+                elif not ok:
+                    return False, f"Upload failed: {message}"
+
+            if time.monotonic() - last_progress > sizer.timeout(self.ack_timeout):
+                stats.timeouts += 1
+                timeouts_in_row += 1
+                sizer.on_error()
+                # Oldest chunk (or its ACK) lost; after the last one, a lost final answer
+                if timeouts_in_row > self.max_retries or not retransmit(min(base, len(chunks) - 1)):
+                    return False, "Transfer timed out"
+                last_progress = time.monotonic()
+
     def validate_file_size(self, data: bytes) -> bool:
         """Validate file size constraints."""
         return 0 < len(data) <= MAX_FILE_SIZE
@@ -505,11 +1006,21 @@ class SerialCommandHandler:
         Returns:
             File contents as bytes
         """
+        stats = self.last_transfer = TransferStats('download', filename, 0)
+
         try:
             self.cmd_start()
 
             validate_filename(filename)
 
+            if self.get_device_caps().get('read_chunk'):
+                data = self._read_file_chunked(filename, self._chunk_sizer(), stats)
+                stats.finish(True)
+                print("read_file: ", stats.summary())
+                self.cmd_end()
+                return data
+
+            stats.mode = 'stream'
             command = f"$$$READ_FILE$$${filename}\n"
             self.send_buffer(command)
 
@@ -526,15 +1037,17 @@ class SerialCommandHandler:
 
             if file_size > MAX_FILE_SIZE:
                 raise SerialCommandError(f"File too large ({file_size} bytes)")
+            stats.size = file_size
 
-            # Read the file data in chunks
+            # Read the file data in chunks (the size chosen by the firmware)
             data = bytearray()
-            chunk_size = 1024
+            chunk_size = DEFAULT_CHUNK_SIZE
 
             while len(data) < file_size:
                 chunk = self.serial_interface.serial_conn.read(min(chunk_size, file_size - len(data)))
                 if not chunk:
                     raise SerialCommandError("Timeout reading file data")
+                stats.record_chunk(len(data), len(chunk))
                 data.extend(chunk)
 
                 # Send chunk acknowledgment
@@ -552,16 +1065,136 @@ class SerialCommandHandler:
             if not success:
                 raise SerialCommandError(f"Error after reading file: {message}")
 
+            stats.finish(True)
+            print("read_file: ", stats.summary())
             self.cmd_end()
             return bytes(data)
 
         except (serial.SerialException, FileValidationError) as e:
+            stats.finish(False)
             self.cmd_end()
             raise SerialCommandError(str(e))
         except Exception as e:
+            stats.finish(False)
             self.cmd_end()
             raise SerialCommandError(f"Error reading file: {str(e)}")
 
+    def partial_download(self, filename: str) -> int:
+        """Bytes of an interrupted download of filename kept in partial_dir (0: none)"""
+        manifest = TransferManifest(filename, directory=self.partial_dir)
+        if not os.path.exists(manifest.manifest_path):
+            return 0
+        try:
+            return os.path.getsize(manifest.data_path)
+        except OSError:
+            return 0
+
+    def _read_file_chunked(self, filename: str, sizer: ChunkSizer, stats: TransferStats) -> bytes:
+        """
+        Download pulling one chunk at a time, each of the current size of sizer.
+
+        $$$READ_CHUNK$$$name,offset,length -> !!OK!!:offset,length,md5,file_size
+        followed by length raw bytes. A chunk failing its hash or not arriving
+        is asked again (smaller), instead of failing the whole download.
+
+        On devices with resume the good chunks go to a partial file with their
+        hashes (TransferManifest): a download that fails, even in a previous
+        run, continues from there once the device confirms the hash of the
+        bytes already held ($$$HASH_RANGE$$$name,offset,length -> md5,size).
+        """
+        stats.mode = 'chunked'
+        data = bytearray()
+        file_size = None
+        failures = 0
+
+        manifest = None
+        if self.get_device_caps().get('resume'):
+            manifest = TransferManifest(filename, directory=self.partial_dir)
+            data = bytearray(manifest.load())
+            if data:
+                self.send_buffer(f"$$$HASH_RANGE$$${filename},0,{len(data)}\n", ping=False)
+                success, message = self.wait_for_response()
+                if success and message == f"{hashlib.md5(data).hexdigest()},{manifest.size}":
+                    print(f"read_file: {len(data)} bytes already downloaded, resuming")
+                    stats.resumed_from = len(data)
+                else:
+                    data = bytearray()
+            if not data:
+                manifest.reset()
+
+        reader = ResponseReader(self.serial_interface)
+        try:
+            while file_size is None or len(data) < file_size:
+                offset = len(data)
+                chunk = self._read_chunk(reader, filename, offset, sizer, stats)
+                if chunk is None:
+                    failures += 1
+                    if failures > self.max_retries:
+                        raise SerialCommandError(f"Too many failures at offset {offset}")
+                    continue
+                failures = 0
+
+                chunk, chunk_hash, file_size = chunk
+                data += chunk
+                if manifest is not None:
+                    manifest.size = file_size
+                    manifest.add(offset, chunk, chunk_hash)
+                    if len(manifest.chunks) % 16 == 0:
+                        manifest.save()
+        except Exception:
+            if manifest is not None:
+                manifest.save()
+            raise
+
+        if manifest is not None:
+            manifest.remove()
+        return bytes(data)
+
+    def _read_chunk(self, reader: ResponseReader, filename: str, offset: int, sizer: ChunkSizer,
+                    stats: TransferStats) -> Optional[Tuple[bytes, str, int]]:
+        """
+        Ask one chunk at offset.
+
+        Returns:
+            (data, md5, file size), None if it didn't arrive intact
+        """
+        ser = self.serial_interface.serial_conn
+
+        sent_time = time.monotonic()
+        ser.write(f"$$$READ_CHUNK$$${filename},{offset},{sizer.size}\n".encode())
+        ser.flush()
+
+        timeout = sizer.timeout(self.ack_timeout)
+        response = reader.read_response(timeout)
+        if response is None:
+            stats.timeouts += 1
+            sizer.on_error()
+            reader.discard()
+            return None
+
+        ok, message = response
+        if not ok:
+            raise SerialCommandError(message)
+        try:
+            chunk_offset, length, chunk_hash, size = message.split(',')
+            length, size = int(length), int(size)
+        except ValueError:
+            raise SerialCommandError(f"Invalid chunk info received: {message}")
+        if size > MAX_FILE_SIZE:
+            raise SerialCommandError(f"File too large ({size} bytes)")
+        stats.size = size
+
+        chunk = reader.read_data(length, timeout)
+        if chunk is None or int(chunk_offset) != offset or hashlib.md5(chunk).hexdigest() != chunk_hash:
+            stats.retries += 1
+            sizer.on_error()
+            reader.discard()
+            return None
+
+        sizer.on_success(time.monotonic() - sent_time)
+        stats.record_chunk(offset, len(chunk))
+        return chunk, chunk_hash, size
+
     def list_files(self) -> List[Tuple[str, int]]:
         """
         Get list of files and their sizes on the device.